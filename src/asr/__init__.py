@@ -1,7 +1,61 @@
-"""ASR 文本识别模块"""
+"""ASR 文本识别模块
 
-from .config import asr_dict, get_models
-from .fasterwhisper_asr import execute_asr as fasterwhisper_asr
-from .funasr_asr import execute_asr as funasr_asr
+识别引擎（torch、faster_whisper、funasr）在第一次用到时才导入，只做切片或只导入配置时不会加载。
+"""
 
-__all__ = ["asr_dict", "get_models", "fasterwhisper_asr", "funasr_asr"]
+import importlib
+import sys
+import types
+
+from .config import asr_dict, check_fw_local_models, fw_local_model_path, get_models
+from .registry import ModelRegistry, model_registry
+
+# 名称 -> (子模块, 属性)
+_LAZY = {
+    "fasterwhisper_asr": (".fasterwhisper_asr", "execute_asr"),
+    "fasterwhisper_asr_on_slices": (".fasterwhisper_asr", "execute_asr_on_slices"),
+    "load_fasterwhisper_model": (".fasterwhisper_asr", "load_model"),
+    "funasr_asr": (".funasr_asr", "execute_asr"),
+    "funasr_asr_on_slices": (".funasr_asr", "execute_asr_on_slices"),
+    "load_funasr_model": (".funasr_asr", "create_model"),
+}
+
+__all__ = [
+    "asr_dict",
+    "get_models",
+    "check_fw_local_models",
+    "fw_local_model_path",
+    "fasterwhisper_asr",
+    "fasterwhisper_asr_on_slices",
+    "load_fasterwhisper_model",
+    "funasr_asr",
+    "funasr_asr_on_slices",
+    "load_funasr_model",
+    "ModelRegistry",
+    "model_registry",
+]
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _LAZY[name]
+    value = getattr(importlib.import_module(module, __name__), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+class _AsrModule(types.ModuleType):
+    def __setattr__(self, name, value):
+        # 导入子模块时 Python 会把包的同名属性设为子模块，
+        # fasterwhisper_asr、funasr_asr 在这里是识别函数，不被子模块覆盖
+        if name in _LAZY and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _AsrModule
@@ -0,0 +1,252 @@
+"""Faster Whisper 识别参数自动调优：在本机测出满足准确率要求的最快参数，写入主机配置
+
+用法：
+    python -m src.asr.autotune <参考切片文件夹> --model-size large-v3 --max-cer 0.02
+"""
+
+import gc
+import itertools
+import os
+import time
+import unicodedata
+from typing import List, Optional
+
+import typer
+from faster_whisper import WhisperModel, decode_audio
+
+from ..slicer.manifest import folder_slices
+from .fasterwhisper_asr import (
+    SAMPLE_RATE,
+    _device,
+    _LanguageRouter,
+    _ResultCollector,
+    _transcribe_batched,
+    _transcribe_sequential,
+    download_model,
+)
+from .host_profile import HOST_PROFILE_PATH, save_host_profile
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac")
+
+
+def autotune(
+    reference_folder,
+    model_size="large-v3",
+    language="auto",
+    precisions=None,
+    cpu_threads=None,
+    beam_sizes=None,
+    batch_sizes=None,
+    max_cer=0.02,
+    limit=50,
+    offline=False,
+    profile_path=None,
+):
+    """
+    测试各组识别参数的速度和准确率，把满足准确率要求的最快参数写入主机配置
+
+    每组参数识别同一组参考切片，记录实时率（RTF）和进程内存。准确率以字错误率（CER）衡量：
+    参考切片都有同名 .txt 标注时以标注为准，否则以第一组参数（最高精度、束宽最大、逐条识别）的结果为准。
+    中文切片也由 Whisper 识别（不交给 FunASR），测的是 Whisper 本身。
+
+    Args:
+        reference_folder: 参考切片文件夹
+        model_size: 模型尺寸
+        language: 语言代码，"auto" 表示自动检测
+        precisions: 候选计算精度，默认 GPU 为 float16、int8_float16，CPU 为 float32、int8
+        cpu_threads: 候选线程数（仅 CPU），默认为全部核心和一半核心
+        beam_sizes: 候选束搜索宽度，默认 5 和 1
+        batch_sizes: 候选批量大小，默认 0（逐条）和 8
+        max_cer: 允许的最大字错误率
+        limit: 最多使用的参考切片数
+        offline: 离线模式，只使用本地模型，不访问网络
+        profile_path: 主机配置文件路径，默认为 models/asr/host_profile.json
+
+    Returns:
+        dict: 选中的参数（precision、beam_size、batch_size、cpu_threads、rtf、cer 等）；
+            没有满足准确率要求的参数时为 None，主机配置不变
+    """
+    device = _device()
+    cores = os.cpu_count() or 1
+    if precisions is None:
+        precisions = ["float16", "int8_float16"] if device == "cuda" else ["float32", "int8"]
+    if cpu_threads is None:
+        cpu_threads = [0] if device == "cuda" else sorted({cores, max(1, cores // 2)}, reverse=True)
+    beam_sizes = sorted(beam_sizes or [5, 1], reverse=True)
+    batch_sizes = sorted(batch_sizes or [0, 8])
+    language = None if language == "auto" else language
+
+    clips, references = _load_reference(reference_folder, limit)
+    if not clips:
+        raise ValueError(f"参考文件夹中没有音频文件: {reference_folder}")
+    audio_seconds = sum(audio.shape[0] for _, audio in clips) / SAMPLE_RATE
+    print(f"参考切片 {len(clips)} 个，共 {audio_seconds:.1f} 秒，设备 {device}")
+
+    model_path = download_model(model_size, offline=offline)
+    results = []
+    baseline = None
+    for precision, threads in itertools.product(precisions, cpu_threads):
+        rss_before = _rss_mb()
+        try:
+            model = WhisperModel(model_path, device=device, compute_type=precision, cpu_threads=threads)
+        except Exception as e:
+            print(f"跳过 {precision}（{device} 不支持）: {e}")
+            continue
+        for beam_size, batch_size in itertools.product(beam_sizes, batch_sizes):
+            router = _LanguageRouter(model_size, precision, language, None, beam_size=beam_size)
+            router._model = model
+            router.funasr_zh = False
+            collector = _ResultCollector()
+            started = time.perf_counter()
+            if batch_size > 1:
+                _transcribe_batched(router, iter(clips), collector, batch_size)
+            else:
+                _transcribe_sequential(router, iter(clips), collector)
+            elapsed = time.perf_counter() - started
+
+            texts = {name: text for name, (_, text, _) in collector.results.items()}
+            if baseline is None:
+                baseline = texts
+            result = {
+                "precision": precision,
+                "cpu_threads": threads,
+                "beam_size": beam_size,
+                "batch_size": batch_size,
+                "rtf": round(elapsed / audio_seconds, 4),
+                "cer": round(_corpus_cer(references or baseline, texts), 4),
+                "rss_mb": round(_rss_mb() - rss_before, 1),
+            }
+            results.append(result)
+            print(
+                f"{precision} 线程={threads} 束宽={beam_size} 批量={batch_size}："
+                f"RTF {result['rtf']:.3f}，CER {result['cer']:.2%}，内存 +{result['rss_mb']:.0f} MB"
+            )
+        del model
+        gc.collect()
+
+    passed = [result for result in results if result["cer"] <= max_cer]
+    if not passed:
+        print(f"没有字错误率不超过 {max_cer:.2%} 的参数，主机配置未修改")
+        return None
+    best = dict(min(passed, key=lambda result: result["rtf"]))
+    best.update(
+        {
+            "model_size": model_size,
+            "device": device,
+            "max_cer": max_cer,
+            "reference": "txt" if references else "baseline",
+            "benchmarked_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "candidates": results,
+        }
+    )
+    path = save_host_profile(model_size, device, best, profile_path)
+    print(
+        f"最快参数：{best['precision']} 线程={best['cpu_threads']} 束宽={best['beam_size']} "
+        f"批量={best['batch_size']}（RTF {best['rtf']:.3f}，CER {best['cer']:.2%}），已写入 {path}"
+    )
+    return best
+
+
+def _load_reference(folder, limit):
+    """
+    读取参考切片，全部解码到内存，计时时只包含识别
+
+    Returns:
+        ([(文件路径, 16kHz 音频)], {文件名: 标注文本}（不是每个切片都有标注时为空字典）)
+    """
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(AUDIO_EXTENSIONS))[: int(limit)]
+    clips = []
+    for file_path, audio in folder_slices(folder, names, sr=SAMPLE_RATE):
+        if audio is None:
+            audio = decode_audio(file_path, sampling_rate=SAMPLE_RATE)
+        clips.append((file_path, audio))
+
+    references = {}
+    for name in names:
+        txt_path = os.path.join(folder, os.path.splitext(name)[0] + ".txt")
+        if not os.path.exists(txt_path):
+            return clips, {}
+        with open(txt_path, "r", encoding="utf-8") as f:
+            references[name] = f.read()
+    return clips, references
+
+
+def _normalize(text):
+    """去掉空白和标点并转为小写，只比较文字本身"""
+    return [
+        char
+        for char in text.lower()
+        if not char.isspace() and not unicodedata.category(char).startswith("P")
+    ]
+
+
+def _edit_distance(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    for i, ref_char in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_char in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char)))
+        previous = current
+    return previous[-1]
+
+
+def _corpus_cer(references, texts):
+    """整体字错误率：编辑距离之和 / 参考文本字数之和（识别失败的切片按全部错误计算）"""
+    errors = 0
+    total = 0
+    for name, reference in references.items():
+        ref = _normalize(reference)
+        errors += _edit_distance(ref, _normalize(texts.get(name, "")))
+        total += len(ref)
+    return errors / total if total else 0.0
+
+
+def _rss_mb():
+    """当前进程的常驻内存（MB），无法读取时为 0"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command()
+def main(
+    reference_folder: str = typer.Argument(..., help="参考切片文件夹（可带同名 .txt 标注）"),
+    model_size: str = typer.Option("large-v3", help="模型尺寸"),
+    language: str = typer.Option("auto", help="语言代码，auto 表示自动检测"),
+    precision: Optional[List[str]] = typer.Option(None, help="候选计算精度，可重复指定"),
+    threads: Optional[List[int]] = typer.Option(None, help="候选线程数（仅 CPU），可重复指定"),
+    beam_size: Optional[List[int]] = typer.Option(None, help="候选束搜索宽度，可重复指定"),
+    batch_size: Optional[List[int]] = typer.Option(None, help="候选批量大小，可重复指定"),
+    max_cer: float = typer.Option(0.02, help="允许的最大字错误率"),
+    limit: int = typer.Option(50, help="最多使用的参考切片数"),
+    offline: bool = typer.Option(False, help="离线模式，只使用本地模型"),
+    profile_path: str = typer.Option(HOST_PROFILE_PATH, help="主机配置文件路径"),
+):
+    """测出本机最快的 Faster Whisper 识别参数，写入主机配置（识别精度选 auto 时使用）"""
+    best = autotune(
+        reference_folder,
+        model_size=model_size,
+        language=language,
+        precisions=precision or None,
+        cpu_threads=threads or None,
+        beam_sizes=beam_size or None,
+        batch_sizes=batch_size or None,
+        max_cer=max_cer,
+        limit=limit,
+        offline=offline,
+        profile_path=profile_path,
+    )
+    if best is None:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -3,6 +3,54 @@
 import os
 
 
+def fw_repo_id(model_size):
+    """
+    获取 Faster Whisper 模型在 Hugging Face 上的仓库名
+
+    Args:
+        model_size: 模型尺寸（可带 "-local" 后缀）
+
+    Returns:
+        仓库名，如 "Systran/faster-whisper-large-v3"
+    """
+    model_size = model_size.removesuffix("-local")
+    if "distil" in model_size:
+        return "Systran/faster-{}-whisper-{}".format(*model_size.split("-", maxsplit=1))
+    return f"Systran/faster-whisper-{model_size}"
+
+
+def fw_model_files(model_size):
+    """Faster Whisper 模型目录中必需的文件"""
+    model_size = model_size.removesuffix("-local")
+    files = ["config.json", "model.bin", "tokenizer.json"]
+    if model_size == "large-v3" or "distil" in model_size:
+        files += ["preprocessor_config.json", "vocabulary.json"]
+    else:
+        files.append("vocabulary.txt")
+    return files
+
+
+def fw_local_model_path(model_size, base_path=None):
+    """
+    查找本地已完整下载的 Faster Whisper 模型（只检查文件，不访问网络）
+
+    Args:
+        model_size: 模型尺寸（可带 "-local" 后缀）
+        base_path: 模型存储基础路径，默认为 models/asr
+
+    Returns:
+        模型目录路径，必需文件缺失或为空时返回 None
+    """
+    if base_path is None:
+        base_path = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr")
+    model_path = os.path.join(base_path, fw_repo_id(model_size).split("/", 1)[1])
+    for name in fw_model_files(model_size):
+        file_path = os.path.join(model_path, name)
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) == 0:
+            return None
+    return model_path
+
+
 def check_fw_local_models():
     """
     启动时检查本地是否有 Faster Whisper 模型.
@@ -16,9 +64,8 @@ def check_fw_local_models():
         "large-v2",
         "large-v3",
     ]
-    base_path = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr")
     for i, size in enumerate(model_size_list):
-        if os.path.exists(os.path.join(base_path, f"faster-whisper-{size}")):
+        if fw_local_model_path(size) is not None:
             model_size_list[i] = size + "-local"
     return model_size_list
 
@@ -48,6 +95,6 @@ asr_dict = {
         "lang": ["auto", "zh", "en", "ja", "ko", "yue"],
         "size": get_models(),
         "path": "fasterwhisper_asr",
-        "precision": ["float32", "float16", "int8"],
+        "precision": ["auto", "float32", "float16", "int8"],
     },
 }
@@ -1,13 +1,19 @@
-"""Faster Whisper ASR 实现"""
+"""Faster Whisper ASR 实现
 
-import json
+torch 和 faster_whisper 在用到时才导入：识别循环本身（语种路由、逐条/批量识别、结果写出）
+不依赖识别引擎，可以交给替身模型运行（见 src/benchmark.py）。
+"""
+
+import bisect
+import multiprocessing
 import os
+import re
 import time
 import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
-import torch
-from faster_whisper import WhisperModel
+import numpy as np
 from huggingface_hub import snapshot_download
 from tqdm import tqdm
 
@@ -18,9 +24,16 @@ except ImportError:
     # 旧版本可能没有这个错误类，使用通用异常
     LocalEntryNotFoundError = Exception
 
-from .config import get_models
+from ..slicer.manifest import folder_slices, manifest_durations, manifest_sources
+from ..utils.pipeline import track_progress
+from ..utils.tracing import attach, span, traced
+from ..utils.tracing import trace_path as active_trace_path
+from .config import fw_local_model_path, fw_model_files, fw_repo_id, get_models
+from .funasr_asr import execute_asr_on_slices as funasr_asr_on_slices
 from .funasr_asr import only_asr
-from ..utils.audio_utils import get_audio_duration
+from .host_profile import resolve_settings
+from .output import AsrResultWriter
+from .registry import model_registry
 
 # fmt: off
 language_code_list = [
@@ -47,38 +60,42 @@ language_code_list = [
     "auto"] 
 # fmt: on
 
+SAMPLE_RATE = 16000
+# Whisper 一次处理 30 秒音频，更长的切片不能放进批量识别
+MAX_BATCH_CLIP_SECONDS = 30
+
 
-def download_model(model_size: str, base_path: str = None):
+def download_model(model_size: str, base_path: str = None, offline: bool = False):
     """
-    下载 Faster Whisper 模型
-    
+    获取 Faster Whisper 模型，本地已完整下载时直接返回，不访问网络
+
     Args:
-        model_size: 模型尺寸
+        model_size: 模型尺寸（可带 "-local" 后缀）
         base_path: 模型存储基础路径
-        
+        offline: 离线模式，本地没有完整的模型时只查找 Hugging Face 缓存，不发起网络请求
+
     Returns:
         模型本地路径
     """
     if base_path is None:
         base_path = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr")
+
+    local_path = fw_local_model_path(model_size, base_path)
+    if local_path is not None:
+        return local_path
+
     os.makedirs(base_path, exist_ok=True)
-    
-    if "distil" in model_size:
-        repo_id = "Systran/faster-{}-whisper-{}".format(*model_size.split("-", maxsplit=1))
-    else:
-        repo_id = f"Systran/faster-whisper-{model_size}"
-    model_path = os.path.join(base_path, repo_id.strip("Systran/"))
-
-    files: list[str] = [
-        "config.json",
-        "model.bin",
-        "tokenizer.json",
-        "vocabulary.txt",
-    ]
-    if model_size == "large-v3" or "distil" in model_size:
-        files.append("preprocessor_config.json")
-        files.append("vocabulary.json")
-        files.remove("vocabulary.txt")
+    repo_id = fw_repo_id(model_size)
+    model_path = os.path.join(base_path, repo_id.split("/", 1)[1])
+    files = fw_model_files(model_size)
+
+    if offline:
+        try:
+            return snapshot_download(repo_id=repo_id, allow_patterns=files, local_files_only=True)
+        except Exception:
+            raise FileNotFoundError(
+                f"离线模式下未找到模型 {model_size}：请把 {', '.join(files)} 放到 {os.path.abspath(model_path)}"
+            ) from None
 
     for attempt in range(2):
         try:
@@ -104,7 +121,45 @@ def download_model(model_size: str, base_path: str = None):
     return model_path
 
 
-def execute_asr(input_folder, output_folder, model_size="large-v3", language="auto", precision="float16", output_mode=None):
+def load_model(model_size="large-v3", precision="float16", offline=False, cpu_threads=0):
+    """
+    获取 Faster Whisper 模型，已加载过的模型直接从进程内的模型注册表返回
+
+    Args:
+        model_size: 模型尺寸
+        precision: 计算精度（float16, float32, int8），"auto" 表示使用主机配置
+        offline: 离线模式，只使用本地模型，不访问网络
+        cpu_threads: CPU 推理线程数，0 表示与识别任务相同地由 resolve_settings 决定（精度为 auto 时取主机配置，
+            仍为 0 时使用 CTranslate2 的默认值）
+
+    Returns:
+        WhisperModel 实例（模型尺寸、精度、设备和线程数都相同时共享同一个）
+    """
+    device = _device()
+    # 预加载和识别任务按同样的规则确定精度和线程数，得到同一个注册表键，不会各加载一份
+    settings = resolve_settings(model_size, device, precision, cpu_threads=cpu_threads)
+    precision, cpu_threads = settings["precision"], settings["cpu_threads"]
+    model_path = {}
+
+    def loader():
+        from faster_whisper import WhisperModel
+
+        base_path = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr")
+        model_path["path"] = download_model(model_size, base_path, offline=offline)
+        print(f"Loading faster whisper model: {model_path['path']}")
+        return WhisperModel(model_path["path"], device=device, compute_type=precision, cpu_threads=cpu_threads)
+
+    def size_mb(model):
+        # 以权重文件大小估算占用
+        weights = os.path.join(model_path["path"], "model.bin")
+        return os.path.getsize(weights) / (1 << 20) if os.path.exists(weights) else 0.0
+
+    # 线程数在创建模型时确定，不同线程数的模型分别缓存
+    key = ("faster-whisper", model_size, precision, device, f"threads={int(cpu_threads)}")
+    return model_registry.get(key, loader, size_mb)
+
+
+def execute_asr(input_folder, output_folder, model_size="large-v3", language="auto", precision="float16", output_mode=None, resume=False, batch_size=0, offline=False, replicas=1, cpu_threads=0, beam_size=None, trace_path=None, on_file=None):
     """
     执行 Faster Whisper ASR 识别
     
@@ -113,108 +168,659 @@ def execute_asr(input_folder, output_folder, model_size="large-v3", language="au
         output_folder: 输出文件夹
         model_size: 模型尺寸
         language: 语言代码，"auto" 表示自动检测
-        precision: 计算精度（float16, float32, int8）
+        precision: 计算精度（float16, float32, int8），"auto" 表示使用 autotune 测得的主机配置
         output_mode: 输出方式列表，可选值：["list"], ["txt"], ["list", "txt"]，默认为 ["list"]
+        resume: 是否续跑，跳过输出文件夹任务账本中已识别且未改动的切片
+        batch_size: 批量识别的切片数，小于等于 1 时逐条识别
+        offline: 离线模式，只使用本地模型，不访问网络
+        replicas: CPU 上的模型副本（进程）数。大于 1 时文件列表按顺序切分给各副本并行识别，
+            结果按文件名顺序合并；有 GPU 或指定语种为 zh 时不使用
+        cpu_threads: 每个副本的推理线程数，0 表示 CPU 核心数平均分给各副本
+        beam_size: 束搜索宽度，None 表示使用主机配置或默认值 5
+        trace_path: 性能追踪文件路径（.json），给出时记录各阶段耗时并写出 Chrome Trace 文件和汇总表
+        on_file: 每识别完一个切片调用一次 on_file(已完成切片数, 切片总数)。on_file 抛出异常（如任务被取消）时
+            不再开始新的切片，异常继续向外抛出；已识别的结果留在输出目录的 .part 文件中（开启续跑时也记在任务账本中，重新运行即可继续）
         
+    Returns:
+        输出文件路径（如果output_mode包含"list"则返回list文件路径，否则返回None）
+    """
+    input_file_names = [f for f in os.listdir(input_folder) if f.lower().endswith(('.wav', '.mp3', '.m4a', '.flac'))]
+    input_file_names.sort()
+    settings = resolve_settings(model_size, _device(), precision, beam_size, batch_size, cpu_threads)
+    if int(replicas) > 1 and language != "zh":
+        if _device() == "cpu":
+            return _execute_asr_replicas(
+                input_folder,
+                output_folder,
+                input_file_names,
+                model_size=model_size,
+                language=language,
+                precision=settings["precision"],
+                output_mode=output_mode,
+                resume=resume,
+                batch_size=settings["batch_size"],
+                offline=offline,
+                replicas=int(replicas),
+                cpu_threads=settings["cpu_threads"],
+                beam_size=settings["beam_size"],
+                trace_path=trace_path,
+                on_file=on_file,
+            )
+        print("多副本识别只用于 CPU，检测到 GPU，使用单个模型识别")
+    # 切片清单记录为 16kHz 的切片直接读入内存，跳过重采样
+    slices = folder_slices(input_folder, input_file_names, sr=16000)
+    slices = track_progress(slices, on_file, len(input_file_names))
+    return execute_asr_on_slices(
+        slices,
+        output_folder,
+        os.path.basename(input_folder),
+        model_size=model_size,
+        language=language,
+        precision=settings["precision"],
+        output_mode=output_mode,
+        resume=resume,
+        durations=manifest_durations(input_folder),
+        batch_size=settings["batch_size"],
+        sources=manifest_sources(input_folder),
+        offline=offline,
+        cpu_threads=settings["cpu_threads"],
+        beam_size=settings["beam_size"],
+        trace_path=trace_path,
+    )
+
+
+def execute_asr_on_slices(
+    slices,
+    output_folder,
+    output_name,
+    model_size="large-v3",
+    language="auto",
+    precision="float16",
+    output_mode=None,
+    resume=False,
+    durations=None,
+    batch_size=0,
+    sources=None,
+    offline=False,
+    cpu_threads=0,
+    beam_size=None,
+    trace_path=None,
+    on_file=None,
+):
+    """
+    对内存中的切片执行 Faster Whisper ASR 识别（不需要先把切片写到磁盘再读回）
+    
+    语种按源录音检测：每个源录音只在第一个切片上检测一次，之后的切片直接使用该语种；
+    中文源录音的切片直接交给 FunASR 识别，不再先用 Whisper 识别一遍。指定语种为 zh 时不加载 Whisper。
+    
+    Args:
+        slices: (文件路径, 音频) 的可迭代对象；音频为 16kHz float32 单声道数组，
+            为 None 时从文件路径读取。文件路径用于输出文件中的音频路径和 txt 位置
+        output_folder: 输出文件夹
+        output_name: 输出文件名（不含扩展名）
+        model_size: 模型尺寸
+        language: 语言代码，"auto" 表示自动检测
+        precision: 计算精度（float16, float32, int8），"auto" 表示使用 autotune 测得的主机配置
+        output_mode: 输出方式列表，默认为 ["list"]
+        resume: 是否续跑，每条结果立即记入任务账本，重新运行时跳过已识别且未改动的切片
+        durations: 已知的切片时长 {文件名: 秒}，jsonl 输出时不需要再读取切片文件
+        batch_size: 批量识别的切片数。大于 1 时把多个短切片拼成一批交给 faster-whisper 的批量推理
+            （切片已按静音切好，批量模式不再做 VAD），输出顺序和格式不变；小于等于 1 时逐条识别
+        sources: 切片所属的源录音 {文件名: 源文件路径}（如来自切片清单），
+            未给出时按 "<源文件名>_<起点>_<终点>" 的切片文件名推断
+        offline: 离线模式，只使用本地模型，不访问网络
+        cpu_threads: CPU 推理线程数，0 表示使用主机配置或 CTranslate2 的默认值
+        beam_size: 束搜索宽度，None 表示使用主机配置或默认值 5
+        trace_path: 性能追踪文件路径（.json），给出时记录各阶段耗时并写出 Chrome Trace 文件和汇总表
+        on_file: 每识别完一个切片调用一次 on_file(已完成切片数, None)，抛出异常时不再开始新的切片，见 execute_asr
+    
     Returns:
         输出文件路径（如果output_mode包含"list"则返回list文件路径，否则返回None）
     """
     if output_mode is None:
         output_mode = ["list"]
+    if language == "zh":
+        # 中文由 FunASR 识别，不需要加载 Whisper
+        print("指定语种为中文，使用 FunASR 识别")
+        return funasr_asr_on_slices(
+            slices,
+            output_folder,
+            output_name,
+            language="zh",
+            output_mode=output_mode,
+            resume=resume,
+            durations=durations,
+            batch_size=batch_size,
+            trace_path=trace_path,
+            on_file=on_file,
+        )
+    slices = track_progress(slices, on_file)
     if language == "auto":
         language = None  # 不设置语种由模型自动输出概率最高的语种
-    
-    base_path = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr")
-    model_path = download_model(model_size, base_path)
-    
-    print(f"Loading faster whisper model: {model_path}")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = WhisperModel(model_path, device=device, compute_type=precision)
 
-    input_file_names = [f for f in os.listdir(input_folder) if f.lower().endswith(('.wav', '.mp3', '.m4a', '.flac'))]
-    input_file_names.sort()
+    settings = resolve_settings(model_size, _device(), precision, beam_size, batch_size, cpu_threads)
+    precision, batch_size = settings["precision"], settings["batch_size"]
+    router = _LanguageRouter(
+        model_size, precision, language, sources, offline, settings["cpu_threads"], settings["beam_size"]
+    )
+
+    writer = AsrResultWriter(
+        output_folder,
+        output_name,
+        output_mode,
+        resume=resume,
+        durations=durations,
+        params=_ledger_params(model_size, language, precision, batch_size, settings["beam_size"]),
+    )
+
+    try:
+        with traced(trace_path, "asr", engine="faster-whisper") as job:
+            started = time.perf_counter()
+            if batch_size > 1:
+                audio_seconds = _transcribe_batched(router, slices, writer, batch_size)
+            else:
+                audio_seconds = _transcribe_sequential(router, slices, writer)
+            _report_rtf(audio_seconds, time.perf_counter() - started)
+            job["audio_seconds"] = writer.audio_seconds
+            return writer.close()
+    finally:
+        writer.abort()
+
+
+def _device():
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _ledger_params(model_size, language, precision, batch_size, beam_size):
+    """影响识别结果的参数，记入任务账本"""
+    return {
+        "engine": "faster-whisper",
+        "model_size": model_size,
+        "language": language,
+        "precision": precision,
+        "batched": int(batch_size) > 1,
+        "beam_size": beam_size,
+    }
+
+
+def _execute_asr_replicas(
+    input_folder,
+    output_folder,
+    input_file_names,
+    model_size,
+    language,
+    precision,
+    output_mode,
+    resume,
+    batch_size,
+    offline,
+    replicas,
+    cpu_threads,
+    beam_size,
+    trace_path=None,
+    on_file=None,
+):
+    """
+    多副本识别：每个子进程加载一个模型副本，识别文件列表中连续的一段
+
+    连续切分使同一源录音的切片大多落在同一副本上，语种检测次数与单进程接近。
+    每个副本完成后，主进程立即按文件名顺序写出排在所有未完成副本之前的结果（同时记入任务账本），
+    输出与单进程识别相同。副本进程出错时，该副本的切片记为识别失败（见 AsrResultWriter.fail）。
+    各副本识别完的切片数汇总到共享计数器，主进程据此调用 on_file；on_file 抛出异常时通知各副本
+    在当前切片识别完后停止。
+
+    Returns:
+        输出文件路径（如果output_mode包含"list"则返回list文件路径，否则返回None）
+    """
+    if output_mode is None:
+        output_mode = ["list"]
+    if language == "auto":
+        language = None
+
+    writer = AsrResultWriter(
+        output_folder,
+        os.path.basename(input_folder),
+        output_mode,
+        resume=resume,
+        durations=manifest_durations(input_folder),
+        params=_ledger_params(model_size, language, precision, batch_size, beam_size),
+    )
+
+    try:
+        done = {}
+        if resume:
+            # 与单进程识别相同的方式计算切片哈希，两种方式的任务账本可以互相续跑
+            for file_path, audio in folder_slices(input_folder, input_file_names, sr=SAMPLE_RATE):
+                result = writer.lookup(file_path, audio)
+                if result is not None:
+                    done[os.path.basename(file_path)] = result
+        pending = [name for name in input_file_names if name not in done]
+
+        replicas = max(1, min(replicas, len(pending)))
+        if cpu_threads <= 0:
+            cpu_threads = max(1, (os.cpu_count() or 1) // replicas)
+        shards = [pending[len(pending) * i // replicas : len(pending) * (i + 1) // replicas] for i in range(replicas)]
+
+        with traced(trace_path, "asr", engine="faster-whisper", replicas=replicas) as job:
+            output = _ShardOutput(writer, input_folder, input_file_names, done, shards)
+            audio_seconds = 0.0
+            started = time.perf_counter()
+            futures = []
+            try:
+                if pending:
+                    print(f"使用 {replicas} 个模型副本识别 {len(pending)} 个切片，每个副本 {cpu_threads} 个线程")
+                    sources = manifest_sources(input_folder)
+                    # 父进程可能已加载模型并启动了推理线程，fork 出的子进程会继承这些状态，使用 spawn 启动副本
+                    context = multiprocessing.get_context("spawn")
+                    stop = context.Event()
+                    progress = context.Value("i", 0)
+                    with ProcessPoolExecutor(
+                        max_workers=replicas,
+                        mp_context=context,
+                        initializer=_init_replica,
+                        initargs=(stop, progress),
+                    ) as executor:
+                        futures = [
+                            executor.submit(
+                                _replica_worker,
+                                input_folder,
+                                shard,
+                                model_size,
+                                language,
+                                precision,
+                                batch_size,
+                                sources,
+                                offline,
+                                cpu_threads,
+                                beam_size,
+                                active_trace_path(),
+                            )
+                            for shard in shards
+                        ]
+                        running = set(futures)
+                        reported = None
+                        try:
+                            while running:
+                                finished, running = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                                for future in finished:
+                                    audio_seconds += output.collect(futures.index(future), future)
+                                output.flush()
+                                if on_file is not None and progress.value != reported:
+                                    reported = progress.value
+                                    on_file(len(done) + reported, len(input_file_names))
+                        except BaseException:
+                            stop.set()
+                            raise
+            except BaseException:
+                # 取消或出错：各副本识别完当前切片后停止，已完成的副本和已停止副本识别完的部分照常写出
+                for index, future in enumerate(futures):
+                    if index not in output.completed and future.done() and not future.cancelled():
+                        output.collect(index, future)
+                output.flush(final=True)
+                raise
+            output.flush(final=True)
+            _report_rtf(audio_seconds, time.perf_counter() - started)
+            job["audio_seconds"] = writer.audio_seconds
+            return writer.close()
+    finally:
+        writer.abort()
+
 
-    output = []
-    jsonl_output = []
-    output_file_name = os.path.basename(input_folder)
+class _ShardOutput:
+    """按文件名顺序写出各副本的结果：某个副本完成后，写出排在所有未完成副本之前的全部结果"""
 
-    for file_name in tqdm(input_file_names, desc="Transcribing"):
+    def __init__(self, writer, input_folder, file_names, done, shards):
+        """
+        Args:
+            writer: 结果写出器
+            input_folder: 切片文件夹
+            file_names: 全部切片文件名（按输出顺序）
+            done: 续跑时任务账本中已有的结果 {文件名: 结果}
+            shards: 各副本的切片文件名列表
+        """
+        self.writer = writer
+        self.input_folder = input_folder
+        self.file_names = file_names
+        self.done = done
+        self.shards = shards
+        self.shard_of = {name: index for index, shard in enumerate(shards) for name in shard}
+        self.completed = {}  # 副本序号 -> (结果, 错误信息或 None)
+        self.position = 0
+
+    def collect(self, index, future):
+        """
+        取回一个副本的结果
+
+        Returns:
+            该副本识别的音频总时长（秒），副本出错时为 0
+        """
         try:
-            file_path = os.path.join(input_folder, file_name)
+            results, audio_seconds = future.result()
+        except Exception as e:
+            print(f"模型副本 {index} 出错，其 {len(self.shards[index])} 个切片记为识别失败: {e}")
+            traceback.print_exc()
+            self.completed[index] = ({}, f"模型副本出错: {e}")
+            return 0.0
+        self.completed[index] = (results, None)
+        return audio_seconds
+
+    def flush(self, final=False):
+        """
+        写出已就绪的结果
+
+        Args:
+            final: 为 True 时（全部结束、取消或出错）不再等待未完成的副本，跳过其切片，写出其余全部结果
+        """
+        while self.position < len(self.file_names):
+            name = self.file_names[self.position]
+            file_path = os.path.join(self.input_folder, name)
+            if name in self.done:
+                result = self.done[name]
+                self.writer.add(file_path, result["language"], result["text"], duration=result["duration"])
+                self.writer.restored += 1
+            elif self.shard_of[name] in self.completed:
+                results, error = self.completed[self.shard_of[name]]
+                if error is not None:
+                    self.writer.fail(file_path, error)
+                elif name in results:
+                    language, text, duration = results[name]
+                    self.writer.add(file_path, language, text, duration=duration)
+            elif not final:
+                break
+            self.position += 1
+
+
+def _replica_worker(
+    input_folder,
+    file_names,
+    model_size,
+    language,
+    precision,
+    batch_size,
+    sources,
+    offline,
+    cpu_threads,
+    beam_size,
+    trace_path=None,
+):
+    """
+    在子进程中加载一个模型副本，识别一组切片
+
+    Returns:
+        ({文件名: (语言, 文本, 时长)}, 识别的音频总时长（秒）)
+    """
+    if trace_path is not None:
+        attach(trace_path)
+    import torch
+
+    torch.set_num_threads(cpu_threads)  # FunASR 识别中文切片时同样限制线程数
+    router = _LanguageRouter(model_size, precision, language, sources, offline, cpu_threads, beam_size)
+    collector = _ResultCollector()
+    slices = _replica_slices(folder_slices(input_folder, file_names, sr=SAMPLE_RATE))
+    if int(batch_size) > 1:
+        audio_seconds = _transcribe_batched(router, slices, collector, int(batch_size))
+    else:
+        audio_seconds = _transcribe_sequential(router, slices, collector)
+    return collector.results, audio_seconds
+
+
+_replica_stop = None
+_replica_progress = None
+
+
+def _init_replica(stop, progress):
+    """副本进程的初始化：保存主进程的停止信号和进度计数器（同步对象只能在启动进程时传入）"""
+    global _replica_stop, _replica_progress
+    _replica_stop, _replica_progress = stop, progress
+
+
+def _replica_slices(slices):
+    """逐个产出切片并计数，主进程要求停止后不再开始新的切片"""
+    for item in slices:
+        if _replica_stop is not None and _replica_stop.is_set():
+            return
+        yield item
+        if _replica_progress is not None:
+            with _replica_progress.get_lock():
+                _replica_progress.value += 1
+
+
+class _ResultCollector:
+    """在副本进程中收集识别结果，由主进程统一写出"""
+
+    def __init__(self):
+        self.results = {}
+
+    def restore(self, file_path, audio=None):
+        return False  # 已完成的切片在分配给副本前已经排除
+
+    def add(self, file_path, language, text, duration=None):
+        self.results[os.path.basename(file_path)] = (language, text, duration)
+
+
+def source_key(file_path, sources=None):
+    """
+    获取切片所属的源录音
+
+    Args:
+        file_path: 切片文件路径
+        sources: {切片文件名: 源文件路径}，优先使用
+
+    Returns:
+        源录音标识（源文件路径，或从切片文件名推断的源文件名）
+    """
+    name = os.path.basename(file_path)
+    if sources and name in sources:
+        return sources[name]
+    stem = os.path.splitext(name)[0]
+    match = re.match(r"(.+)_\d+_\d+$", stem)
+    return match.group(1) if match else stem
+
+
+class _LanguageRouter:
+    """按需加载 Whisper 模型，并按源录音缓存检测到的语种"""
+
+    def __init__(self, model_size, precision, language, sources, offline=False, cpu_threads=0, beam_size=5):
+        self.model_size = model_size
+        self.precision = precision
+        self.offline = offline
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+        self.funasr_zh = True  # 中文切片交给 FunASR 识别
+        self.language = language
+        self.sources = sources
+        self.source_languages = {}
+        self._model = None
+
+    @property
+    def model(self):
+        """Whisper 模型（第一次使用时从模型注册表获取）"""
+        if self._model is None:
+            self._model = load_model(self.model_size, self.precision, offline=self.offline, cpu_threads=self.cpu_threads)
+        return self._model
+
+    def language_of(self, file_path, audio):
+        """
+        获取切片的语种：指定了语种时直接使用，否则每个源录音只检测一次
+
+        Args:
+            file_path: 切片文件路径
+            audio: 16kHz 音频数据，为 None 时从文件读取
+
+        Returns:
+            语言代码
+        """
+        if self.language is not None:
+            return self.language
+        key = source_key(file_path, self.sources)
+        if key not in self.source_languages:
+            if audio is None:
+                from faster_whisper import decode_audio
+
+                audio = decode_audio(file_path, sampling_rate=SAMPLE_RATE)
+            with span("detect_language", source=os.path.basename(str(key))):
+                language = self.model.detect_language(audio=audio)[0]
+            print(f"源录音 {os.path.basename(str(key))} 检测为语种: {language}")
+            self.source_languages[key] = language
+        return self.source_languages[key]
+
+
+def _transcribe_one(router, file_path, audio, writer):
+    """
+    逐条识别一个切片
+
+    Returns:
+        切片时长（秒），识别失败时为 0
+    """
+    file_name = os.path.basename(file_path)
+    try:
+        language = router.language_of(file_path, audio)
+        text = ""
+        if language == "zh" and router.funasr_zh:
+            text = only_asr(file_path if audio is None else audio, language=language)
+            if text != "":
+                # 从文件读取时不探测时长，由 writer 使用清单中的时长
+                duration = None if audio is None else audio.shape[0] / SAMPLE_RATE
+                writer.add(file_path, language, text, duration=duration)
+                return duration if duration is not None else writer.durations.get(file_name, 0.0)
+
+        # FunASR 未识别出文本时仍由 Whisper 识别
+        model = router.model
+        with span("whisper_transcribe", file=file_name):
             segments, info = model.transcribe(
-                audio=file_path,
-                beam_size=5,
+                audio=file_path if audio is None else audio,
+                beam_size=router.beam_size,
                 vad_filter=True,
                 vad_parameters=dict(min_silence_duration_ms=700),
                 language=language,
             )
-            text = ""
+            for segment in segments:  # 识别在迭代 segments 时进行
+                text += segment.text
 
-            if info.language == "zh":
-                print(f"检测为中文文本, 转 FunASR 处理: {file_name}")
-                text = only_asr(file_path, language=info.language.lower())
+        duration = None if audio is None else audio.shape[0] / SAMPLE_RATE
+        writer.add(file_path, info.language, text, duration=duration)
+        return info.duration
+    except Exception as e:
+        print(f"Error processing {file_name}: {e}")
+        traceback.print_exc()
+        return 0.0
 
-            if text == "":
-                for segment in segments:
-                    text += segment.text
-            
-            # 如果选择了list输出方式，添加到输出列表
-            if "list" in output_mode:
-                output.append(f"{file_path}|{output_file_name}|{info.language.upper()}|{text}")
-            
-            # 如果选择了jsonl输出方式，添加到jsonl输出列表
-            if "jsonl" in output_mode:
-                try:
-                    duration = get_audio_duration(file_path)
-                    jsonl_output.append({
-                        "audio": file_path,
-                        "text": text,
-                        "duration": round(duration, 1)
-                    })
-                except Exception as e:
-                    print(f"Error getting duration for {file_name}: {e}")
-                    traceback.print_exc()
-            
-            # 如果选择了txt输出方式，在音频文件同目录生成同名txt文件
-            if "txt" in output_mode:
-                try:
-                    audio_dir = os.path.dirname(file_path)
-                    audio_name_without_ext = os.path.splitext(file_name)[0]
-                    txt_file_path = os.path.join(audio_dir, f"{audio_name_without_ext}.txt")
-                    
-                    with open(txt_file_path, "w", encoding="utf-8") as txt_f:
-                        txt_f.write(text)
-                except Exception as e:
-                    print(f"Error writing txt file for {file_name}: {e}")
-                    traceback.print_exc()
+
+def _transcribe_sequential(router, slices, writer):
+    """逐条识别，返回识别的音频总时长（秒）"""
+    audio_seconds = 0.0
+    for file_path, audio in tqdm(slices, desc="Transcribing"):
+        if writer.restore(file_path, audio):
+            continue
+        audio_seconds += _transcribe_one(router, file_path, audio, writer)
+    return audio_seconds
+
+
+def _transcribe_batched(router, slices, writer, batch_size):
+    """
+    批量识别：每凑够 batch_size 个切片识别一次，超过 30 秒的切片逐条识别
+
+    Returns:
+        识别的音频总时长（秒）
+    """
+    audio_seconds = 0.0
+    batch = []
+    for file_path, audio in tqdm(slices, desc="Transcribing"):
+        if writer.restore(file_path, audio):
+            continue
+        try:
+            if audio is None:
+                from faster_whisper import decode_audio
+
+                audio = decode_audio(file_path, sampling_rate=SAMPLE_RATE)
+            language = router.language_of(file_path, audio)
         except Exception as e:
-            print(f"Error processing {file_name}: {e}")
+            print(f"Error processing {os.path.basename(file_path)}: {e}")
             traceback.print_exc()
+            continue
+        if audio.shape[0] > MAX_BATCH_CLIP_SECONDS * SAMPLE_RATE:
+            # 先识别已排队的切片，保持输出顺序
+            audio_seconds += _flush_batch(router, batch, writer, batch_size)
+            batch = []
+            audio_seconds += _transcribe_one(router, file_path, audio, writer)
+            continue
+        batch.append((file_path, audio, language))
+        if len(batch) >= batch_size:
+            audio_seconds += _flush_batch(router, batch, writer, batch_size)
+            batch = []
+    audio_seconds += _flush_batch(router, batch, writer, batch_size)
+    return audio_seconds
 
-    # 如果选择了list输出方式，生成list文件
-    output_file_path = None
-    if "list" in output_mode:
-        output_folder = output_folder or "output/asr_opt"
-        os.makedirs(output_folder, exist_ok=True)
-        output_file_path = os.path.abspath(os.path.join(output_folder, f"{output_file_name}.list"))
 
-        with open(output_file_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(output))
-            print(f"ASR 任务完成->标注文件路径: {output_file_path}\n")
-    
-    # 如果选择了jsonl输出方式，生成jsonl文件
-    jsonl_file_path = None
-    if "jsonl" in output_mode:
-        output_folder = output_folder or "output/asr_opt"
-        os.makedirs(output_folder, exist_ok=True)
-        jsonl_file_path = os.path.abspath(os.path.join(output_folder, f"{output_file_name}.jsonl"))
-
-        with open(jsonl_file_path, "w", encoding="utf-8") as f:
-            for item in jsonl_output:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
-            print(f"ASR 任务完成->JSONL文件路径: {jsonl_file_path}\n")
-    
-    if "list" not in output_mode and "jsonl" not in output_mode:
-        print(f"ASR 任务完成（已生成txt文件）\n")
-    
-    return output_file_path
+def _flush_batch(router, batch, writer, batch_size):
+    """
+    识别一批切片并按原顺序写出结果
+
+    中文切片由 FunASR 识别；其余切片按语种分组，首尾相接拼成一段音频，每个切片作为一个
+    clip_timestamps 片段，由批量推理在一次前向中识别，识别结果按片段在拼接音频中的位置（seek）
+    归还给对应的切片。
+
+    Returns:
+        这批切片的总时长（秒）
+    """
+    if not batch:
+        return 0.0
+    languages = [language for _, _, language in batch]
+    try:
+        texts = [None] * len(batch)
+        for i, (_, audio, language) in enumerate(batch):
+            if language == "zh" and router.funasr_zh:
+                texts[i] = only_asr(audio, language=language) or None
+
+        for language in dict.fromkeys(languages):
+            # FunASR 未识别出文本的中文切片仍由 Whisper 识别
+            indices = [i for i, item in enumerate(languages) if item == language and texts[i] is None]
+            if not indices:
+                continue
+            model = router.model
+            clips = []
+            offset = 0
+            for i in indices:
+                length = batch[i][1].shape[0]
+                clips.append({"start": offset / SAMPLE_RATE, "end": (offset + length) / SAMPLE_RATE})
+                offset += length
+            seeks = [int(clip["start"] * model.frames_per_second) for clip in clips]
+            parts = ["" for _ in indices]
+            from faster_whisper import BatchedInferencePipeline
+
+            with span("whisper_batch", slices=len(indices), language=language):
+                segments, _ = BatchedInferencePipeline(model=model).transcribe(
+                    np.concatenate([batch[i][1] for i in indices]),
+                    language=language,
+                    beam_size=router.beam_size,
+                    clip_timestamps=clips,
+                    batch_size=batch_size,
+                )
+                for segment in segments:
+                    # seek 为片段起点的帧号，容忍 1 帧的取整误差
+                    parts[max(bisect.bisect_right(seeks, segment.seek + 1) - 1, 0)] += segment.text
+            for i, text in zip(indices, parts):
+                texts[i] = text
+    except Exception as e:
+        print(f"Error processing batch of {len(batch)} slices: {e}")
+        traceback.print_exc()
+        return 0.0
+
+    audio_seconds = 0.0
+    for (file_path, audio, language), text in zip(batch, texts):
+        duration = audio.shape[0] / SAMPLE_RATE
+        writer.add(file_path, language, text, duration=duration)
+        audio_seconds += duration
+    return audio_seconds
+
+
+def _report_rtf(audio_seconds, elapsed):
+    """打印识别吞吐量（实时率 RTF = 耗时 / 音频时长，越小越快）"""
+    if audio_seconds <= 0:
+        return
+    print(
+        f"识别音频 {audio_seconds:.1f} 秒，耗时 {elapsed:.1f} 秒，"
+        f"RTF {elapsed / audio_seconds:.3f}（{audio_seconds / max(elapsed, 1e-9):.1f} 倍实时）\n"
+    )
@@ -1,15 +1,18 @@
-"""FunASR ASR 实现（中文/粤语）"""
+"""FunASR ASR 实现（中文/粤语）
+
+torch 和 funasr 在创建模型时才导入，识别循环本身不依赖识别引擎。
+"""
 
-import json
 import os
 import traceback
 
-from funasr import AutoModel
 from tqdm import tqdm
 
-from ..utils.audio_utils import get_audio_duration
-
-funasr_models = {}  # 存储模型避免重复加载
+from ..slicer.manifest import folder_slices, manifest_durations
+from ..utils.pipeline import track_progress
+from ..utils.tracing import span, traced
+from .output import AsrResultWriter
+from .registry import model_registry
 
 
 def only_asr(input_file, language="zh"):
@@ -25,7 +28,8 @@ def only_asr(input_file, language="zh"):
     """
     try:
         model = create_model(language)
-        text = model.generate(input=input_file)[0]["text"]
+        with span("funasr_generate"):
+            text = model.generate(input=input_file)[0]["text"]
     except Exception as e:
         text = ""
         print(f"Error in only_asr: {traceback.format_exc()}")
@@ -71,9 +75,13 @@ def create_model(language="zh"):
     else:
         raise ValueError(f"FunASR 不支持该语言: {language}")
 
-    if language in funasr_models:
-        return funasr_models[language]
-    else:
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    def loader():
+        from funasr import AutoModel
+
         model = AutoModel(
             model=path_asr,
             model_revision=model_revision,
@@ -81,14 +89,37 @@ def create_model(language="zh"):
             vad_model_revision=vad_model_revision,
             punc_model=path_punc,
             punc_model_revision=punc_model_revision,
+            device=device,
         )
         print(f"FunASR 模型加载完成: {language.upper()}")
-
-        funasr_models[language] = model
         return model
 
+    return model_registry.get(("funasr", language, "float32", device), loader, _model_mb)
+
+
+def _model_mb(model):
+    """按参数和缓冲区大小估算 AutoModel（识别、VAD、标点模型）的占用（MB）"""
+    import torch
 
-def execute_asr(input_folder, output_folder, model_size="large", language="zh", output_mode=None):
+    total = 0
+    for module in (model.model, model.vad_model, model.punc_model):
+        if isinstance(module, torch.nn.Module):
+            for tensor in list(module.parameters()) + list(module.buffers()):
+                total += tensor.numel() * tensor.element_size()
+    return total / (1 << 20)
+
+
+def execute_asr(
+    input_folder,
+    output_folder,
+    model_size="large",
+    language="zh",
+    output_mode=None,
+    resume=False,
+    batch_size=0,
+    trace_path=None,
+    on_file=None,
+):
     """
     执行 FunASR ASR 识别
     
@@ -98,83 +129,161 @@ def execute_asr(input_folder, output_folder, model_size="large", language="zh",
         model_size: 模型尺寸（FunASR 固定为 large）
         language: 语言代码（zh 或 yue）
         output_mode: 输出方式列表，可选值：["list"], ["txt"], ["list", "txt"]，默认为 ["list"]
+        resume: 是否续跑，跳过输出文件夹任务账本中已识别且未改动的切片
+        batch_size: 批量识别的切片数，小于等于 1 时逐条识别
+        trace_path: 性能追踪文件路径（.json），给出时记录各阶段耗时并写出 Chrome Trace 文件和汇总表
+        on_file: 每识别完一个切片调用一次 on_file(已完成切片数, 切片总数)。on_file 抛出异常（如任务被取消）时
+            不再开始新的切片，异常继续向外抛出；已识别的结果留在输出目录的 .part 文件中（开启续跑时也记在任务账本中，重新运行即可继续）
         
     Returns:
         输出文件路径（如果output_mode包含"list"则返回list文件路径，否则返回None）
     """
-    if output_mode is None:
-        output_mode = ["list"]
     input_file_names = [f for f in os.listdir(input_folder) if f.lower().endswith(('.wav', '.mp3', '.m4a', '.flac'))]
     input_file_names.sort()
+    # 切片清单记录为 16kHz 的切片直接读入内存，跳过重采样
+    slices = folder_slices(input_folder, input_file_names, sr=16000)
+    slices = track_progress(slices, on_file, len(input_file_names))
+    return execute_asr_on_slices(
+        slices,
+        output_folder,
+        os.path.basename(input_folder),
+        model_size=model_size,
+        language=language,
+        output_mode=output_mode,
+        resume=resume,
+        durations=manifest_durations(input_folder),
+        batch_size=batch_size,
+        trace_path=trace_path,
+    )
+
 
-    output = []
-    jsonl_output = []
-    output_file_name = os.path.basename(input_folder)
+def execute_asr_on_slices(
+    slices,
+    output_folder,
+    output_name,
+    model_size="large",
+    language="zh",
+    output_mode=None,
+    resume=False,
+    durations=None,
+    batch_size=0,
+    trace_path=None,
+    on_file=None,
+):
+    """
+    对内存中的切片执行 FunASR ASR 识别（不需要先把切片写到磁盘再读回）
+    
+    Args:
+        slices: (文件路径, 音频) 的可迭代对象；音频为 16kHz float32 单声道数组，
+            为 None 时从文件路径读取。文件路径用于输出文件中的音频路径和 txt 位置
+        output_folder: 输出文件夹
+        output_name: 输出文件名（不含扩展名）
+        model_size: 模型尺寸（FunASR 固定为 large）
+        language: 语言代码（zh 或 yue）
+        output_mode: 输出方式列表，默认为 ["list"]
+        resume: 是否续跑，每条结果立即记入任务账本，重新运行时跳过已识别且未改动的切片
+        durations: 已知的切片时长 {文件名: 秒}，jsonl 输出时不需要再读取切片文件
+        batch_size: 批量识别的切片数。大于 1 时切片成批直接交给识别模型（切片已按静音切好，跳过 VAD），
+            整批识别完成后再统一加标点；小于等于 1 时逐条走完整的 VAD → 识别 → 标点流程
+        trace_path: 性能追踪文件路径（.json），给出时记录各阶段耗时并写出 Chrome Trace 文件和汇总表
+        on_file: 每识别完一个切片调用一次 on_file(已完成切片数, None)，抛出异常时不再开始新的切片，见 execute_asr
+        
+    Returns:
+        输出文件路径（如果output_mode包含"list"则返回list文件路径，否则返回None）
+    """
+    if output_mode is None:
+        output_mode = ["list"]
+    slices = track_progress(slices, on_file)
 
-    model = create_model(language)
+    with traced(trace_path, "asr", engine="funasr") as job:
+        writer = AsrResultWriter(
+            output_folder,
+            output_name,
+            output_mode,
+            resume=resume,
+            durations=durations,
+            params={"engine": "funasr", "model_size": model_size, "language": language},
+        )
 
-    for file_name in tqdm(input_file_names, desc="Transcribing"):
         try:
-            print(f"\n{file_name}")
-            file_path = os.path.join(input_folder, file_name)
-            text = model.generate(input=file_path)[0]["text"]
-            
-            # 如果选择了list输出方式，添加到输出列表
-            if "list" in output_mode:
-                output.append(f"{file_path}|{output_file_name}|{language.upper()}|{text}")
-            
-            # 如果选择了jsonl输出方式，添加到jsonl输出列表
-            if "jsonl" in output_mode:
-                try:
-                    duration = get_audio_duration(file_path)
-                    jsonl_output.append({
-                        "audio": file_path,
-                        "text": text,
-                        "duration": round(duration, 1)
-                    })
-                except Exception as e:
-                    print(f"Error getting duration for {file_name}: {e}")
-                    traceback.print_exc()
-            
-            # 如果选择了txt输出方式，在音频文件同目录生成同名txt文件
-            if "txt" in output_mode:
-                try:
-                    audio_dir = os.path.dirname(file_path)
-                    audio_name_without_ext = os.path.splitext(file_name)[0]
-                    txt_file_path = os.path.join(audio_dir, f"{audio_name_without_ext}.txt")
-                    
-                    with open(txt_file_path, "w", encoding="utf-8") as txt_f:
-                        txt_f.write(text)
-                except Exception as e:
-                    print(f"Error writing txt file for {file_name}: {e}")
-                    traceback.print_exc()
-        except Exception as e:
-            print(f"Error processing {file_name}: {traceback.format_exc()}")
-
-    # 如果选择了list输出方式，生成list文件
-    output_file_path = None
-    if "list" in output_mode:
-        output_folder = output_folder or "output/asr_opt"
-        os.makedirs(output_folder, exist_ok=True)
-        output_file_path = os.path.abspath(os.path.join(output_folder, f"{output_file_name}.list"))
-
-        with open(output_file_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(output))
-            print(f"ASR 任务完成->标注文件路径: {output_file_path}\n")
-    
-    # 如果选择了jsonl输出方式，生成jsonl文件
-    jsonl_file_path = None
-    if "jsonl" in output_mode:
-        output_folder = output_folder or "output/asr_opt"
-        os.makedirs(output_folder, exist_ok=True)
-        jsonl_file_path = os.path.abspath(os.path.join(output_folder, f"{output_file_name}.jsonl"))
-
-        with open(jsonl_file_path, "w", encoding="utf-8") as f:
-            for item in jsonl_output:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
-            print(f"ASR 任务完成->JSONL文件路径: {jsonl_file_path}\n")
-    
-    if "list" not in output_mode and "jsonl" not in output_mode:
-        print(f"ASR 任务完成（已生成txt文件）\n")
-    
-    return output_file_path
+            model = create_model(language)
+
+            if int(batch_size) > 1:
+                _transcribe_batched(model, slices, writer, language, int(batch_size))
+                job["audio_seconds"] = writer.audio_seconds
+                return writer.close()
+
+            for file_path, audio in tqdm(slices, desc="Transcribing"):
+                if writer.restore(file_path, audio):
+                    continue
+                _generate_one(model, file_path, audio, writer, language)
+
+            job["audio_seconds"] = writer.audio_seconds
+            return writer.close()
+        finally:
+            writer.abort()
+
+
+def _generate_one(model, file_path, audio, writer, language):
+    """用 generate 逐个识别一个切片并写出结果，失败时打印错误并跳过该切片"""
+    file_name = os.path.basename(file_path)
+    try:
+        print(f"\n{file_name}")
+        with span("funasr_generate", file=file_name):
+            text = model.generate(input=file_path if audio is None else audio)[0]["text"]
+
+        duration = None if audio is None else audio.shape[0] / 16000
+        writer.add(file_path, language, text, duration=duration)
+    except Exception as e:
+        print(f"Error processing {file_name}: {traceback.format_exc()}")
+
+
+def _transcribe_batched(model, slices, writer, language, batch_size):
+    """每凑够 batch_size 个切片识别一次"""
+    batch = []
+    for file_path, audio in tqdm(slices, desc="Transcribing"):
+        if writer.restore(file_path, audio):
+            continue
+        batch.append((file_path, audio))
+        if len(batch) >= batch_size:
+            _flush_batch(model, batch, writer, language, batch_size)
+            batch = []
+    if batch:
+        _flush_batch(model, batch, writer, language, batch_size)
+
+
+def _flush_batch(model, batch, writer, language, batch_size):
+    """
+    识别一批切片并按原顺序写出结果
+
+    切片直接交给识别模型成批推理（AutoModel.inference 不经过 VAD），再把整批文本交给标点模型；
+    与 generate 的流程相比只是省去了对已切好的切片重复做 VAD。
+    整批推理失败时改用 generate 逐个重试这一批切片，只跳过单独识别仍然失败的切片。
+    """
+    inputs = [file_path if audio is None else audio for file_path, audio in batch]
+    try:
+        with span("funasr_asr_batch", slices=len(inputs)):
+            # AutoModel.inference 会把参数 update 进传入的 kwargs，传副本，不改动注册表中共享模型的设置
+            results = model.inference(inputs, kwargs={**model.kwargs, "batch_size": batch_size})
+            texts = [result["text"] for result in results]
+        if model.punc_model is not None:
+            indices = [i for i, text in enumerate(texts) if text.strip()]
+            if indices:
+                # 标点模型一次只处理一条文本
+                with span("funasr_punc", texts=len(indices)):
+                    punc_results = model.inference(
+                        [texts[i] for i in indices],
+                        model=model.punc_model,
+                        kwargs={**model.punc_kwargs, "batch_size": 1},
+                    )
+                for i, result in zip(indices, punc_results):
+                    texts[i] = result["text"]
+    except Exception as e:
+        print(f"Error processing batch of {len(batch)} slices, retrying one by one: {traceback.format_exc()}")
+        for file_path, audio in batch:
+            _generate_one(model, file_path, audio, writer, language)
+        return
+
+    for (file_path, audio), text in zip(batch, texts):
+        duration = None if audio is None else audio.shape[0] / 16000
+        writer.add(file_path, language, text, duration=duration)
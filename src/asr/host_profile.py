@@ -0,0 +1,101 @@
+"""主机配置：autotune 在本机测得的 Faster Whisper 最快识别参数"""
+
+import json
+import os
+
+HOST_PROFILE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "models", "asr", "host_profile.json")
+DEFAULT_BEAM_SIZE = 5
+
+
+def load_host_profile(model_size, device, path=None):
+    """
+    读取本机的识别参数
+
+    Args:
+        model_size: 模型尺寸
+        device: 设备（cuda 或 cpu）
+        path: 主机配置文件路径，默认为 models/asr/host_profile.json
+
+    Returns:
+        dict: 包含 precision、beam_size、batch_size、cpu_threads 等；没有测过该模型时为空字典
+    """
+    path = path or HOST_PROFILE_PATH
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取主机配置失败，使用默认参数: {e}")
+        return {}
+    return profiles.get(_profile_key(model_size, device), {})
+
+
+def save_host_profile(model_size, device, settings, path=None):
+    """
+    写入本机的识别参数（保留其他模型和设备的记录）
+
+    Args:
+        model_size: 模型尺寸
+        device: 设备（cuda 或 cpu）
+        settings: 识别参数
+        path: 主机配置文件路径，默认为 models/asr/host_profile.json
+
+    Returns:
+        主机配置文件路径
+    """
+    path = os.path.abspath(path or HOST_PROFILE_PATH)
+    profiles = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profiles = json.load(f)
+        except (OSError, ValueError):
+            profiles = {}
+    profiles[_profile_key(model_size, device)] = settings
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.part"
+    with open(part_path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2)
+    os.replace(part_path, path)
+    return path
+
+
+def resolve_settings(model_size, device, precision, beam_size=None, batch_size=0, cpu_threads=0):
+    """
+    确定实际使用的识别参数
+
+    精度为 "auto" 时使用主机配置中的参数：精度取主机配置（没有时 GPU 为 float16、CPU 为 int8），
+    批量大小和线程数为 0 时也取主机配置。指定了精度时只有未指定的束搜索宽度取默认值 5。
+
+    Args:
+        model_size: 模型尺寸
+        device: 设备（cuda 或 cpu）
+        precision: 计算精度，"auto" 表示使用主机配置
+        beam_size: 束搜索宽度，None 表示未指定
+        batch_size: 批量识别的切片数，0 表示未指定
+        cpu_threads: CPU 推理线程数，0 表示未指定
+
+    Returns:
+        dict: precision、beam_size、batch_size、cpu_threads
+    """
+    profile = load_host_profile(model_size, device) if precision == "auto" else {}
+    if precision == "auto":
+        precision = profile.get("precision") or ("float16" if device == "cuda" else "int8")
+    if beam_size is None:
+        beam_size = profile.get("beam_size", DEFAULT_BEAM_SIZE)
+    if int(batch_size) <= 0:
+        batch_size = profile.get("batch_size", 0)
+    if int(cpu_threads) <= 0:
+        cpu_threads = profile.get("cpu_threads", 0)
+    return {
+        "precision": precision,
+        "beam_size": int(beam_size),
+        "batch_size": int(batch_size),
+        "cpu_threads": int(cpu_threads),
+    }
+
+
+def _profile_key(model_size, device):
+    return f"{model_size.removesuffix('-local')}@{device}"
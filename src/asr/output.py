@@ -0,0 +1,249 @@
+"""ASR 结果输出（.list / .jsonl / .txt）"""
+
+import json
+import os
+import time
+import traceback
+
+from ..utils.audio_utils import get_audio_duration
+from ..utils.ledger import LEDGER_NAME, JobLedger, array_digest
+from ..utils.tracing import span
+
+# 每写出这么多条结果或经过这么多秒落盘一次（fsync）
+FSYNC_EVERY = 50
+FSYNC_SECONDS = 5.0
+
+
+def failed_list_path(output_folder, output_name):
+    """识别失败的切片清单路径（<输出文件夹>/<文件名>.failed.txt）"""
+    return os.path.join(output_folder or "output/asr_opt", f"{output_name}.failed.txt")
+
+
+class AsrResultWriter:
+    """
+    按 output_mode 写出 .list / .jsonl / .txt 文件
+
+    .list / .jsonl 的每条结果识别后立即追加到 <文件名>.part 并 flush，识别过程中可以直接查看
+    （如 tail -f）已完成的部分，内存占用不随切片数增长；每 FSYNC_EVERY 条或 FSYNC_SECONDS 秒 fsync 一次，
+    全部完成后 fsync 并原子地改名为正式文件，正式文件不会只写了一半。
+
+    续跑模式下每条识别结果都会立即记入输出文件夹中的任务账本（ledger.sqlite），
+    中断后重新运行时通过 restore 取回已识别的结果，不需要重新识别。
+
+    通过 fail 记录的识别失败的切片在 close 时写入 <文件名>.failed.txt（见 failed_list_path），
+    没有失败时删除上次留下的清单。失败的切片不记入任务账本，续跑时会重新识别。
+    """
+
+    def __init__(self, output_folder, output_name, output_mode, resume=False, params=None, durations=None):
+        """
+        Args:
+            output_folder: 输出文件夹（.list / .jsonl 的位置）
+            output_name: 输出文件名（不含扩展名），通常为输入文件夹名
+            output_mode: 输出方式列表，可选值："list"、"txt"、"jsonl" 的任意组合
+            resume: 是否使用任务账本续跑
+            params: 影响识别结果的参数（模型、语言等），参数改变时已记录的结果不再复用
+            durations: 已知的切片时长 {文件名: 秒}（如来自切片清单），add 未给出时长时优先使用
+        """
+        self.output_folder = output_folder or "output/asr_opt"
+        self.output_name = output_name
+        self.output_mode = output_mode
+        self.params = params or {}
+        self.durations = durations or {}
+        self.ledger = JobLedger(os.path.join(self.output_folder, LEDGER_NAME)) if resume else None
+        self.restored = 0
+        self.failed = []  # [(音频文件路径, 错误信息)]
+        self.audio_seconds = 0.0  # 已输出结果的音频总时长（时长已知的切片）
+        self._digests = {}
+        self._files = {}  # 扩展名 -> (正式文件路径, .part 文件对象)
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        for ext in ("list", "jsonl"):
+            if ext in self.output_mode:
+                os.makedirs(self.output_folder, exist_ok=True)
+                path = os.path.abspath(os.path.join(self.output_folder, f"{self.output_name}.{ext}"))
+                self._files[ext] = (path, open(f"{path}.part", "w", encoding="utf-8"))
+
+    def restore(self, file_path, audio=None):
+        """
+        续跑时从任务账本取回已识别的结果
+
+        Args:
+            file_path: 音频文件路径
+            audio: 内存中的音频数据，为 None 时按文件内容判断是否改动
+
+        Returns:
+            bool: 是否已取回（为 True 时不需要再识别该切片）
+        """
+        result = self.lookup(file_path, audio)
+        if result is None:
+            return False
+        self.add(file_path, result["language"], result["text"], duration=result["duration"])
+        self.restored += 1
+        return True
+
+    def lookup(self, file_path, audio=None):
+        """
+        查询任务账本中已识别的结果，不添加到输出
+
+        Args:
+            file_path: 音频文件路径
+            audio: 内存中的音频数据，为 None 时按文件内容判断是否改动
+
+        Returns:
+            dict: 包含 language、text、duration；未续跑、未识别或切片已改动时为 None
+        """
+        if self.ledger is None:
+            return None
+        try:
+            digest = self.ledger.digest(file_path) if audio is None else array_digest(audio)
+        except OSError:
+            return None
+        result = self.ledger.get("asr", os.path.abspath(file_path), digest, self.params)
+        if result is None:
+            self._digests[file_path] = digest  # 识别完成后由 add 记入账本
+        return result
+
+    def add(self, file_path, language, text, duration=None):
+        """
+        添加一条识别结果
+
+        Args:
+            file_path: 音频文件路径
+            language: 语言代码
+            text: 识别文本
+            duration: 音频时长（秒），为 None 时使用 durations 中的时长；jsonl 输出仍需要时长时
+                再读取音频文件头，最后才调用 ffprobe
+        """
+        file_name = os.path.basename(file_path)
+        if duration is None:
+            duration = self.durations.get(file_name)
+        if duration is not None:
+            self.audio_seconds += duration
+
+        # 如果选择了list输出方式，追加到list文件
+        if "list" in self.output_mode:
+            self._write("list", f"{file_path}|{self.output_name}|{language.upper()}|{text}")
+
+        # 如果选择了jsonl输出方式，追加到jsonl文件
+        if "jsonl" in self.output_mode:
+            try:
+                if duration is None:
+                    with span("get_audio_duration", file=file_name):
+                        duration = get_audio_duration(file_path)
+                self._write("jsonl", json.dumps({
+                    "audio": file_path,
+                    "text": text,
+                    "duration": round(duration, 1)
+                }, ensure_ascii=False))
+            except Exception as e:
+                print(f"Error getting duration for {file_name}: {e}")
+                traceback.print_exc()
+
+        # 如果选择了txt输出方式，在音频文件同目录生成同名txt文件
+        if "txt" in self.output_mode:
+            try:
+                audio_dir = os.path.dirname(file_path)
+                audio_name_without_ext = os.path.splitext(file_name)[0]
+                txt_file_path = os.path.join(audio_dir, f"{audio_name_without_ext}.txt")
+
+                with open(txt_file_path, "w", encoding="utf-8") as txt_f:
+                    txt_f.write(text)
+            except Exception as e:
+                print(f"Error writing txt file for {file_name}: {e}")
+                traceback.print_exc()
+
+        digest = self._digests.pop(file_path, None)
+        if self.ledger is not None and digest is not None:
+            self.ledger.put(
+                "asr",
+                os.path.abspath(file_path),
+                digest,
+                self.params,
+                {"language": language, "text": text, "duration": duration},
+            )
+        self._sync()
+
+    def fail(self, file_path, error):
+        """
+        记录一个识别失败的切片（不写入输出文件）
+
+        Args:
+            file_path: 音频文件路径
+            error: 错误信息
+        """
+        self.failed.append((file_path, str(error).strip().replace("\n", " ")))
+        self._digests.pop(file_path, None)
+
+    def close(self):
+        """
+        完成 .list / .jsonl 文件：fsync 后把 .part 文件改名为正式文件
+
+        Returns:
+            list 文件路径（output_mode 不包含 "list" 时为 None）
+        """
+        output_file_path = None
+        for ext, (path, f) in self._files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+            os.replace(f"{path}.part", path)
+            if ext == "list":
+                output_file_path = path
+                print(f"ASR 任务完成->标注文件路径: {path}\n")
+            else:
+                print(f"ASR 任务完成->JSONL文件路径: {path}\n")
+        self._files = {}
+
+        if "list" not in self.output_mode and "jsonl" not in self.output_mode:
+            print(f"ASR 任务完成（已生成txt文件）\n")
+
+        failed_path = failed_list_path(self.output_folder, self.output_name)
+        if self.failed:
+            os.makedirs(self.output_folder, exist_ok=True)
+            with open(failed_path, "w", encoding="utf-8") as f:
+                for file_path, error in self.failed:
+                    f.write(f"{file_path}\t{error}\n")
+            print(f"{len(self.failed)} 个切片识别失败，清单: {os.path.abspath(failed_path)}\n")
+        elif os.path.exists(failed_path):
+            os.remove(failed_path)
+
+        if self.ledger is not None:
+            if self.restored:
+                print(f"续跑：{self.restored} 个切片使用了任务账本中的识别结果\n")
+            self.ledger.close()
+            self.ledger = None
+
+        return output_file_path
+
+    def abort(self):
+        """
+        识别中途出错或被取消时释放文件和任务账本：.part 文件 flush 后关闭但不改名（保留已写出的部分），
+        正式文件不变。已经 close 过时不做任何事，可以放在 finally 中调用
+        """
+        for _, f in self._files.values():
+            try:
+                f.flush()
+            finally:
+                f.close()
+        self._files = {}
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
+
+    def _write(self, ext, line):
+        """追加一行并 flush，其他进程可以立即读到"""
+        f = self._files[ext][1]
+        f.write(line + "\n")
+        f.flush()
+
+    def _sync(self):
+        """按条数或时间间隔把已写出的结果落盘"""
+        if not self._files:
+            return
+        self._unsynced += 1
+        if self._unsynced < FSYNC_EVERY and time.monotonic() - self._synced_at < FSYNC_SECONDS:
+            return
+        for _, f in self._files.values():
+            os.fsync(f.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
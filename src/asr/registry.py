@@ -0,0 +1,162 @@
+"""ASR 模型注册表：进程内共享已加载的模型，WebUI 多次识别不再重复加载"""
+
+import gc
+import threading
+import time
+from collections import OrderedDict
+
+from ..utils.tracing import span
+
+
+class ModelRegistry:
+    """
+    进程内共享的 ASR 模型注册表
+
+    以 (引擎, 模型尺寸, 精度, 设备) 为键缓存已加载的模型。常驻模型数超过 max_models
+    或估算的总占用超过 memory_budget_mb 时，按最近最少使用（LRU）的顺序卸载；
+    刚加载的模型不会被立即卸载。同一个键同时只加载一次，其他线程等待加载完成后直接使用。
+    """
+
+    def __init__(self, max_models=2, memory_budget_mb=0):
+        """
+        Args:
+            max_models: 最多常驻的模型数，小于等于 0 表示不限制
+            memory_budget_mb: 常驻模型的总占用上限（MB），小于等于 0 表示不限制
+        """
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()  # key -> {"model", "size_mb", "loaded_at", "last_used"}
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> 加载锁
+
+    def configure(self, max_models=None, memory_budget_mb=None):
+        """修改淘汰策略，超出新上限的模型立即卸载"""
+        with self._lock:
+            if max_models is not None:
+                self.max_models = int(max_models)
+            if memory_budget_mb is not None:
+                self.memory_budget_mb = float(memory_budget_mb)
+            evicted = self._evict()
+        _release(evicted)
+
+    def get(self, key, loader, size_mb=None):
+        """
+        获取模型，未加载时调用 loader 加载并登记
+
+        Args:
+            key: (引擎, 模型尺寸, 精度, 设备)
+            loader: 无参数的加载函数，返回模型实例
+            size_mb: 估算模型占用（MB）的函数，参数为模型实例；为 None 时按 0 计算
+
+        Returns:
+            模型实例
+        """
+        with self._lock:
+            model = self._touch(key)
+            if model is not None:
+                return model
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                model = self._touch(key)
+                if model is not None:
+                    return model
+
+            started = time.perf_counter()
+            with span("load_model", model=_format_key(key)):
+                model = loader()
+            mb = float(size_mb(model)) if size_mb is not None else 0.0
+            print(f"模型已加载: {_format_key(key)}（{mb:.0f} MB，耗时 {time.perf_counter() - started:.1f} 秒）")
+
+            with self._lock:
+                now = time.time()
+                self._models[key] = {"model": model, "size_mb": mb, "loaded_at": now, "last_used": now}
+                self._loading.pop(key, None)
+                evicted = self._evict(keep=key)
+        _release(evicted)
+        return model
+
+    def list(self):
+        """
+        列出常驻模型（最近使用的在后）
+
+        Returns:
+            字典列表，包含 engine、model_size、precision、device、size_mb、loaded_at、last_used
+        """
+        with self._lock:
+            return [
+                {
+                    "engine": key[0],
+                    "model_size": key[1],
+                    "precision": key[2],
+                    "device": key[3],
+                    "size_mb": entry["size_mb"],
+                    "loaded_at": entry["loaded_at"],
+                    "last_used": entry["last_used"],
+                }
+                for key, entry in self._models.items()
+            ]
+
+    def unload(self, key=None):
+        """
+        卸载模型
+
+        Args:
+            key: 要卸载的模型键，为 None 时卸载全部
+
+        Returns:
+            卸载的模型数
+        """
+        with self._lock:
+            keys = list(self._models) if key is None else [key] if key in self._models else []
+            evicted = [(k, self._models.pop(k)) for k in keys]
+        count = len(evicted)
+        _release(evicted)
+        return count
+
+    def _touch(self, key):
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        entry["last_used"] = time.time()
+        self._models.move_to_end(key)
+        return entry["model"]
+
+    def _evict(self, keep=None):
+        evicted = []
+        while True:
+            candidates = [k for k in self._models if k != keep]
+            if not candidates:
+                break
+            over_count = self.max_models > 0 and len(self._models) > self.max_models
+            total_mb = sum(entry["size_mb"] for entry in self._models.values())
+            over_budget = self.memory_budget_mb > 0 and total_mb > self.memory_budget_mb
+            if not (over_count or over_budget):
+                break
+            evicted.append((candidates[0], self._models.pop(candidates[0])))
+        return evicted
+
+
+def _release(evicted):
+    """释放卸载的模型占用的内存（正在使用该模型的识别任务结束后才会真正释放）"""
+    if not evicted:
+        return
+    for key, _ in evicted:
+        print(f"模型已卸载: {_format_key(key)}")
+    evicted.clear()
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def _format_key(key):
+    return " / ".join(str(part) for part in key)
+
+
+model_registry = ModelRegistry()
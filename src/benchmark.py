@@ -0,0 +1,528 @@
+"""性能基准：用确定性的合成音频测量切片和识别各阶段的吞吐量、峰值内存和实时率
+
+合成音频由带谐波的浊音、噪声爆破音和长度受控的静音组成，同一种子每次生成完全相同的信号；
+识别阶段使用本地的替身模型（按音频长度做等比例的频谱计算），不需要下载模型，也不需要网络。
+结果写成 JSON，可与保存的基线比较，超出容差时退出码为 1。
+
+用法：
+    python -m src.benchmark --save-baseline                 # 在本机生成基线
+    python -m src.benchmark                                 # 运行并与基线比较
+    python -m src.benchmark --scenario dense --stage slice --scale 0.2
+"""
+
+import contextlib
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+import numpy as np
+import typer
+
+from .slicer.slicer import Slicer, get_rms
+
+BENCHMARK_DIR = os.path.join("output", "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+REPORT_PATH = os.path.join(BENCHMARK_DIR, "latest.json")
+REPORT_VERSION = 1
+SAMPLE_RATE = 32000  # 与默认输出配置 sovits-32k 相同
+ASR_SAMPLE_RATE = 16000
+
+# 切片参数与 WebUI 默认值相同
+SLICER_PARAMS = {"threshold": -34, "min_length": 4000, "min_interval": 300, "hop_size": 10, "max_sil_kept": 500}
+
+# 场景：总时长（秒）、每段语音时长范围、静音时长范围（秒）
+SCENARIOS = {
+    "dense": {"duration": 120, "speech": (0.5, 2.0), "silence": (0.15, 0.6)},
+    "sparse": {"duration": 600, "speech": (4.0, 12.0), "silence": (0.8, 3.0)},
+    "continuous": {"duration": 300, "speech": (20.0, 40.0), "silence": (0.3, 0.5)},
+}
+
+STAGES = (
+    "get_rms",
+    "slice",
+    "slice_loop",
+    "slice_stream",
+    "slice_audio",
+    "asr_whisper",
+    "asr_funasr_batch",
+    "pipeline",
+)
+ASR_STAGES = ("asr_whisper", "asr_funasr_batch", "pipeline")
+REGRESSIONS = ("changed", "slower", "more_memory")  # 比较时视为退化的状态
+
+
+def synthesize(scenario, sr=SAMPLE_RATE, seed=0, scale=1.0):
+    """
+    生成类似语音的合成音频
+
+    语音段由浊音（基频 90-250Hz 带谐波，按 3-6Hz 的音节节奏调幅）和噪声爆破音（类似擦音）交替组成，
+    段与段之间是 -60dB 底噪的静音。相同的参数和种子每次生成完全相同的信号。
+
+    Args:
+        scenario: 场景名（见 SCENARIOS）
+        sr: 采样率
+        seed: 随机种子
+        scale: 总时长的缩放比例（如 0.1 用于快速检查）
+
+    Returns:
+        float32 单声道数组
+    """
+    spec = SCENARIOS[scenario]
+    rng = np.random.default_rng([seed, sorted(SCENARIOS).index(scenario)])
+    total = int(spec["duration"] * scale * sr)
+    audio = (rng.standard_normal(total) * 10 ** (-60 / 20)).astype(np.float32)
+    pos = int(rng.uniform(*spec["silence"]) * sr)
+    while pos < total:
+        length = min(int(rng.uniform(*spec["speech"]) * sr), total - pos)
+        audio[pos : pos + length] += _speech(rng, length, sr)
+        pos += length + int(rng.uniform(*spec["silence"]) * sr)
+    return audio
+
+
+def _speech(rng, n, sr):
+    """一段语音：浊音和噪声爆破音交替，幅度约 -20 至 -10 dBFS"""
+    out = np.empty(n, dtype=np.float32)
+    pos = 0
+    while pos < n:
+        length = min(int(rng.uniform(0.08, 0.35) * sr), n - pos)
+        t = np.arange(length) / sr
+        if rng.random() < 0.75:
+            f0 = rng.uniform(90, 250)
+            wave = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+            wave *= 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        else:
+            wave = rng.standard_normal(length)
+            wave -= np.concatenate(([0.0], wave[:-1]))  # 一阶差分，能量偏向高频
+        peak = np.abs(wave).max() or 1.0
+        out[pos : pos + length] = wave / peak * 10 ** (rng.uniform(-20, -10) / 20)
+        pos += length
+    # 段首尾 10ms 渐入渐出，避免阶跃
+    fade = min(int(0.01 * sr), n // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        out[:fade] *= ramp
+        out[n - fade :] *= ramp[::-1]
+    return out
+
+
+class _Segment:
+    def __init__(self, text, seek):
+        self.text = text
+        self.seek = seek
+
+
+class _Info:
+    def __init__(self, language, duration):
+        self.language = language
+        self.duration = duration
+
+
+def _standin_text(audio):
+    """
+    替身模型的“识别”：对 25ms 帧做 FFT，按帧的主频生成文字，计算量与音频长度成正比
+
+    Returns:
+        每 0.25 秒一个字的文本
+    """
+    frame = 400
+    n = audio.shape[0] // frame * frame
+    if n == 0:
+        return ""
+    frames = audio[:n].reshape(-1, frame) * np.hanning(frame).astype(np.float32)
+    peaks = np.abs(np.fft.rfft(frames, axis=1)).argmax(axis=1)
+    return "".join(chr(0x4E00 + int(bin_)) for bin_ in peaks[::10])
+
+
+class StandInWhisper:
+    """Faster Whisper 的替身模型：提供 transcribe 和 detect_language，供识别循环的基准测试离线使用"""
+
+    frames_per_second = 100
+
+    def detect_language(self, audio):
+        _standin_text(audio[: 30 * ASR_SAMPLE_RATE])
+        return "en", 1.0, [("en", 1.0)]
+
+    def transcribe(self, audio, language=None, **kwargs):
+        text = _standin_text(audio)
+        segments = (_Segment(text[i : i + 40], i * 25) for i in range(0, len(text), 40))
+        return segments, _Info(language or "en", audio.shape[0] / ASR_SAMPLE_RATE)
+
+
+class StandInParaformer:
+    """FunASR AutoModel 的替身模型：提供 generate 和 inference（不带标点模型）"""
+
+    punc_model = None
+    kwargs = {}
+    punc_kwargs = {}
+
+    def generate(self, input, **kwargs):
+        return [{"text": _standin_text(input)}]
+
+    def inference(self, inputs, batch_size=1, **kwargs):
+        return [{"text": _standin_text(audio)} for audio in inputs]
+
+
+def run_benchmarks(scenarios=None, stages=None, scale=1.0, repeats=3, seed=0):
+    """
+    运行基准测试
+
+    每个阶段先计时运行 repeats 次（取中位数），再在 tracemalloc 下运行一次测峰值内存，
+    峰值内存只包含 Python 和 numpy 的分配。slice_audio 使用单进程，写出到临时目录。
+    识别阶段使用替身模型，不需要 torch、faster_whisper 和 funasr；识别模块的其他依赖（如 tqdm、
+    huggingface_hub）无法导入时记为跳过。
+
+    Args:
+        scenarios: 场景名列表，默认全部
+        stages: 阶段名列表（见 STAGES），默认全部
+        scale: 合成音频总时长的缩放比例
+        repeats: 每个阶段的计时次数
+        seed: 合成音频的随机种子
+
+    Returns:
+        dict: 报告，results 的键为 "<阶段>/<场景>"，值包括 seconds（中位数）、min_seconds、audio_seconds、
+            rtf（耗时/音频时长）、x_realtime、peak_mb、items（切片数或帧数，用于确认结果未改变）；
+            跳过的阶段只有 skipped（原因）
+    """
+    scenarios = list(scenarios or SCENARIOS)
+    stages = list(stages or STAGES)
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError(f"未知场景: {name}，可选 {', '.join(SCENARIOS)}")
+    for name in stages:
+        if name not in STAGES:
+            raise ValueError(f"未知阶段: {name}，可选 {', '.join(STAGES)}")
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="voiceslice_bench_")
+    try:
+        for scenario in scenarios:
+            audio = synthesize(scenario, seed=seed, scale=scale)
+            audio_seconds = audio.shape[0] / SAMPLE_RATE
+            print(f"场景 {scenario}：{audio_seconds:.1f} 秒")
+            context = _Context(scenario, audio, work_dir)
+            for stage in stages:
+                key = f"{stage}/{scenario}"
+                try:
+                    run = context.prepare(stage)
+                except ImportError as e:
+                    results[key] = {"skipped": f"无法导入识别模块: {e}"}
+                    print(f"  {stage:<18} 跳过（{results[key]['skipped']}）")
+                    continue
+                seconds, items, peak_mb = _measure(run, repeats)
+                stage_seconds = context.asr_seconds if stage in ASR_STAGES else audio_seconds
+                results[key] = {
+                    "seconds": round(statistics.median(seconds), 6),
+                    "min_seconds": round(min(seconds), 6),
+                    "audio_seconds": round(stage_seconds, 3),
+                    "rtf": round(statistics.median(seconds) / max(stage_seconds, 1e-9), 6),
+                    "x_realtime": round(stage_seconds / max(statistics.median(seconds), 1e-9), 1),
+                    "peak_mb": round(peak_mb, 2),
+                    "items": items,
+                }
+                print(
+                    f"  {stage:<18} {results[key]['seconds']:.4f} 秒，{results[key]['x_realtime']:.0f} 倍实时，"
+                    f"峰值内存 {peak_mb:.1f} MB，{items} 项"
+                )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "version": REPORT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": _host_info(),
+        "settings": {"scale": scale, "repeats": repeats, "seed": seed, "slicer": SLICER_PARAMS},
+        "results": results,
+    }
+
+
+class _Context:
+    """一个场景的输入数据，按阶段准备计时用的函数（准备工作不计时）"""
+
+    def __init__(self, scenario, audio, work_dir):
+        self.scenario = scenario
+        self.audio = audio
+        self.work_dir = work_dir
+        self.slicer = Slicer(sr=SAMPLE_RATE, **SLICER_PARAMS)
+        self.asr_seconds = 0.0
+        self._wav_path = None
+        self._asr_slices = None
+
+    def prepare(self, stage):
+        """
+        Returns:
+            无参数的函数，运行一次该阶段，返回产出的项数
+        """
+        return getattr(self, "_" + stage)()
+
+    def _get_rms(self):
+        slicer = self.slicer
+        return lambda: get_rms(self.audio, frame_length=slicer.win_size, hop_length=slicer.hop_size).shape[-1]
+
+    def _slice(self):
+        return lambda: len(self.slicer.slice(self.audio))
+
+    def _slice_loop(self):
+        slicer = Slicer(sr=SAMPLE_RATE, vectorized=False, **SLICER_PARAMS)
+        return lambda: len(slicer.slice(self.audio))
+
+    def _slice_stream(self):
+        block = 1 << 20
+
+        def run():
+            blocks = (self.audio[i : i + block] for i in range(0, self.audio.shape[0], block))
+            return sum(1 for _ in self.slicer.slice_stream(blocks))
+
+        return run
+
+    def _slice_audio(self):
+        from .slicer import slice_audio
+
+        inp = self._wav()
+        opt_root = os.path.join(self.work_dir, "slice_audio")
+
+        def run():
+            shutil.rmtree(opt_root, ignore_errors=True)
+            slice_audio(inp, opt_root, workers=1, **SLICER_PARAMS)
+            return sum(1 for name in os.listdir(opt_root) if name.endswith(".wav"))
+
+        return run
+
+    def _asr_whisper(self):
+        from .asr.fasterwhisper_asr import _LanguageRouter, _transcribe_sequential
+
+        slices = self._slices()
+
+        def run():
+            router = _LanguageRouter("standin", "float32", None, None)
+            router._model = StandInWhisper()
+            router.funasr_zh = False
+            return self._transcribe("asr_whisper", lambda writer: _transcribe_sequential(router, iter(slices), writer))
+
+        return run
+
+    def _asr_funasr_batch(self):
+        from .asr.funasr_asr import _transcribe_batched
+
+        slices = self._slices()
+        model = StandInParaformer()
+        return lambda: self._transcribe(
+            "asr_funasr_batch", lambda writer: _transcribe_batched(model, iter(slices), writer, "zh", 8)
+        )
+
+    def _pipeline(self):
+        from .asr.fasterwhisper_asr import _LanguageRouter, _transcribe_sequential
+        from .slicer import iter_slices
+        from .utils.pipeline import Prefetcher
+
+        inp = self._wav()
+        self._slices()
+        opt_root = os.path.join(self.work_dir, "pipeline")
+
+        def run():
+            router = _LanguageRouter("standin", "float32", None, None)
+            router._model = StandInWhisper()
+            router.funasr_zh = False
+            slices = Prefetcher(iter_slices(inp, opt_root, write_audio=False, **SLICER_PARAMS), 32)
+            return self._transcribe("pipeline", lambda writer: _transcribe_sequential(router, slices, writer))
+
+        return run
+
+    def _transcribe(self, name, transcribe):
+        """用真实的结果写出器（list 输出）运行识别循环，返回写出的结果数"""
+        from .asr.output import AsrResultWriter
+
+        output_folder = os.path.join(self.work_dir, "asr", name)
+        shutil.rmtree(output_folder, ignore_errors=True)
+        writer = AsrResultWriter(output_folder, self.scenario, ["list"])
+        transcribe(writer)
+        list_path = writer.close()
+        with open(list_path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _wav(self):
+        """把合成音频写成 16 位 wav（slice_audio 和 pipeline 从文件解码）"""
+        if self._wav_path is None:
+            import soundfile as sf
+
+            folder = os.path.join(self.work_dir, "input", self.scenario)
+            os.makedirs(folder, exist_ok=True)
+            self._wav_path = os.path.join(folder, f"{self.scenario}.wav")
+            sf.write(self._wav_path, self.audio, SAMPLE_RATE, subtype="PCM_16")
+        return self._wav_path
+
+    def _slices(self):
+        """预先切好并重采样到 16kHz 的切片，识别阶段只计识别循环本身"""
+        if self._asr_slices is None:
+            from .utils.audio_utils import resample_audio
+
+            folder = os.path.join(self.work_dir, "slices", self.scenario)
+            self._asr_slices = [
+                (
+                    os.path.join(folder, f"{self.scenario}_{start:010d}_{end:010d}.wav"),
+                    resample_audio(chunk.astype(np.float32), SAMPLE_RATE, ASR_SAMPLE_RATE),
+                )
+                for chunk, start, end in self.slicer.slice(self.audio)
+            ]
+            self.asr_seconds = sum(audio.shape[0] for _, audio in self._asr_slices) / ASR_SAMPLE_RATE
+        return self._asr_slices
+
+
+def _measure(run, repeats):
+    """
+    计时并测峰值内存，各阶段自己的输出不显示（出错的切片会使产出项数与基线不同）
+
+    Returns:
+        (各次耗时（秒）, 产出的项数, 峰值内存（MB）)
+    """
+    seconds = []
+    items = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(max(int(repeats), 1)):
+            started = time.perf_counter()
+            items = run()
+            seconds.append(time.perf_counter() - started)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, items, peak / (1 << 20)
+
+
+def _host_info():
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def save_report(report, path):
+    """写出报告（JSON），返回绝对路径"""
+    import json
+
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_report(path):
+    """读取报告，文件不存在时为 None"""
+    import json
+
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(report, baseline, tolerance=0.15):
+    """
+    与基线比较
+
+    耗时（中位数）或峰值内存超过基线的 (1 + tolerance) 倍记为退化，低于 (1 - tolerance) 倍记为改进；
+    峰值内存相差不到 1MB 时不计。产出项数不同说明相同输入的切片结果变了，记为 changed。
+    只比较两边都有且都没有跳过的条目。
+
+    Args:
+        report: 本次运行的报告
+        baseline: 基线报告
+        tolerance: 允许的相对变化
+
+    Returns:
+        list[dict]: 每个条目一行，包括 key、seconds、baseline_seconds、time_ratio、peak_mb、
+            baseline_peak_mb、status（ok、faster、slower、more_memory、less_memory 或 changed，可能有多个，以逗号分隔）
+    """
+    rows = []
+    for key, current in report["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None or "skipped" in current or "skipped" in base:
+            continue
+        time_ratio = current["seconds"] / max(base["seconds"], 1e-9)
+        memory_ratio = current["peak_mb"] / max(base["peak_mb"], 1e-9)
+        status = []
+        if current["items"] != base["items"]:
+            status.append("changed")
+        if time_ratio > 1 + tolerance:
+            status.append("slower")
+        elif time_ratio < 1 - tolerance:
+            status.append("faster")
+        if abs(current["peak_mb"] - base["peak_mb"]) >= 1.0:
+            if memory_ratio > 1 + tolerance:
+                status.append("more_memory")
+            elif memory_ratio < 1 - tolerance:
+                status.append("less_memory")
+        rows.append(
+            {
+                "key": key,
+                "seconds": current["seconds"],
+                "baseline_seconds": base["seconds"],
+                "time_ratio": round(time_ratio, 3),
+                "peak_mb": current["peak_mb"],
+                "baseline_peak_mb": base["peak_mb"],
+                "status": ",".join(status) or "ok",
+            }
+        )
+    return rows
+
+
+def _print_comparison(rows, report, baseline):
+    if baseline.get("host") != report["host"]:
+        print("注意：基线来自另一台主机或另一套环境，耗时只能粗略比较")
+    if baseline.get("settings") != report["settings"]:
+        print("注意：基线的合成音频或切片参数不同，只比较同名条目")
+    print(f"{'条目':<28}{'耗时':>10}{'基线':>10}{'比值':>8}{'内存MB':>10}{'基线MB':>10}  状态")
+    for row in rows:
+        print(
+            f"{row['key']:<28}{row['seconds']:>10.4f}{row['baseline_seconds']:>10.4f}{row['time_ratio']:>8.2f}"
+            f"{row['peak_mb']:>10.1f}{row['baseline_peak_mb']:>10.1f}  {row['status']}"
+        )
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command()
+def main(
+    scenario: Optional[List[str]] = typer.Option(None, help=f"场景，可重复指定（{'、'.join(SCENARIOS)}），默认全部"),
+    stage: Optional[List[str]] = typer.Option(None, help=f"阶段，可重复指定（{'、'.join(STAGES)}），默认全部"),
+    scale: float = typer.Option(1.0, help="合成音频总时长的缩放比例，如 0.1 用于快速检查"),
+    repeats: int = typer.Option(3, help="每个阶段的计时次数（取中位数）"),
+    seed: int = typer.Option(0, help="合成音频的随机种子"),
+    output: str = typer.Option(REPORT_PATH, help="结果文件路径（.json）"),
+    baseline: str = typer.Option(BASELINE_PATH, help="基线文件路径（.json）"),
+    save_baseline: bool = typer.Option(False, help="把本次结果保存为基线，不做比较"),
+    tolerance: float = typer.Option(0.15, help="允许的相对变化，超出时视为退化"),
+):
+    """运行切片和识别的性能基准，并与基线比较（有退化时退出码为 1）"""
+    os.environ.setdefault("TQDM_DISABLE", "1")
+    report = run_benchmarks(scenario or None, stage or None, scale=scale, repeats=repeats, seed=seed)
+    print(f"结果已写入 {save_report(report, output)}")
+    if save_baseline:
+        print(f"基线已写入 {save_report(report, baseline)}")
+        return
+    base = load_report(baseline)
+    if base is None:
+        print(f"没有基线 {baseline}，使用 --save-baseline 生成")
+        return
+    rows = compare(report, base, tolerance)
+    _print_comparison(rows, report, base)
+    regressions = [row for row in rows if any(status in row["status"] for status in REGRESSIONS)]
+    if regressions:
+        print(f"{len(regressions)} 项退化（容差 {tolerance:.0%}）")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
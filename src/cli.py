@@ -0,0 +1,266 @@
+"""命令行：不启动 WebUI 的批量切片和识别
+
+用法：
+    voiceslice slice <输入文件或文件夹> <切片输出目录>
+    voiceslice asr <切片文件夹> <识别输出目录> --engine faster-whisper --language auto
+    voiceslice pipeline <输入文件或文件夹> --slice-output output/slicer_opt --asr-output output/asr_opt
+
+切片和识别模块在命令执行时才导入：voiceslice slice 不会导入 torch 和识别模型，--help 也不需要导入任何音频库。
+"""
+
+import os
+from typing import List, Optional
+
+import typer
+
+ENGINES = ("faster-whisper", "funasr")
+
+app = typer.Typer(add_completion=False, help="VoiceSlice 音频切片和文本识别（命令行）")
+
+
+@app.command("slice")
+def slice_command(
+    inp: str = typer.Argument(..., help="输入音频文件或文件夹"),
+    output: str = typer.Argument("output/slicer_opt", help="切片输出目录"),
+    threshold: float = typer.Option(-34, help="音量阈值（dB），小于此值视为静音"),
+    min_length: int = typer.Option(4000, help="每段最小长度（毫秒）"),
+    min_interval: int = typer.Option(300, help="最短切割间隔（毫秒）"),
+    hop_size: int = typer.Option(10, help="帧长度（毫秒）"),
+    max_sil_kept: int = typer.Option(500, help="切完后静音最多保留长度（毫秒）"),
+    max_val: float = typer.Option(0.9, "--max", help="归一化后最大值"),
+    alpha: float = typer.Option(0.25, help="混音比例"),
+    workers: int = typer.Option(1, help="并行切片的进程数，0 表示使用全部 CPU 核心"),
+    write_audio: bool = typer.Option(True, help="写出切片音频；--no-write-audio 时只生成 slices.jsonl 切片清单"),
+    audio_format: str = typer.Option("wav", "--format", help="切片输出格式：wav 或 flac"),
+    filename_template: Optional[str] = typer.Option(None, help="切片文件名模板，可用字段 name、stem、start、end、index"),
+    profile: Optional[str] = typer.Option(None, help="输出配置：sovits-32k、asr-16k-int16 或 float32-archive"),
+    decoder: str = typer.Option("auto", help="解码后端：auto、soundfile 或 ffmpeg"),
+    streaming: bool = typer.Option(False, help="流式切片，长音频内存占用不随文件长度增长"),
+    cache_dir: Optional[str] = typer.Option(None, help="RMS 包络缓存目录，只改静音参数重新切片时跳过解码（--streaming 时不使用）"),
+    resume: bool = typer.Option(False, help="断点续切，跳过任务账本中已完成且未改动的文件"),
+    trace: Optional[str] = typer.Option(None, help="性能追踪文件路径（.json）"),
+):
+    """音频切片"""
+    from .slicer import slice_audio
+    from .slicer.profiles import DEFAULT_PROFILE
+    from .slicer.writer import DEFAULT_FILENAME_TEMPLATE
+
+    result = slice_audio(
+        inp=inp,
+        opt_root=output,
+        threshold=threshold,
+        min_length=min_length,
+        min_interval=min_interval,
+        hop_size=hop_size,
+        max_sil_kept=max_sil_kept,
+        _max=max_val,
+        alpha=alpha,
+        streaming=streaming,
+        workers=workers,
+        write_audio=write_audio,
+        cache_dir=cache_dir,
+        audio_format=audio_format,
+        filename_template=filename_template or DEFAULT_FILENAME_TEMPLATE,
+        decoder=decoder,
+        profile=profile or DEFAULT_PROFILE,
+        resume=resume,
+        trace_path=trace,
+    )
+    typer.echo(result)
+    if "处理出错" in result:
+        raise typer.Exit(code=1)
+
+
+@app.command("asr")
+def asr_command(
+    input_folder: str = typer.Argument(..., help="切片文件夹"),
+    output: str = typer.Argument("output/asr_opt", help="识别输出目录"),
+    engine: str = typer.Option("faster-whisper", help="识别引擎：faster-whisper 或 funasr（中文）"),
+    language: str = typer.Option("auto", help="语言代码，auto 表示自动检测"),
+    model_size: str = typer.Option("large-v3", help="模型尺寸（仅 Faster Whisper）"),
+    precision: str = typer.Option("auto", help="计算精度，auto 使用 autotune 测得的主机配置（仅 Faster Whisper）"),
+    output_mode: Optional[List[str]] = typer.Option(None, help="输出方式：list、txt、jsonl，可重复指定，默认 list"),
+    batch_size: int = typer.Option(0, help="批量识别的切片数，0 或 1 为逐条识别"),
+    replicas: int = typer.Option(1, help="CPU 模型副本数（仅 Faster Whisper）"),
+    cpu_threads: int = typer.Option(0, help="每个副本的推理线程数，0 表示使用主机配置或平均分配"),
+    beam_size: Optional[int] = typer.Option(None, help="束搜索宽度，默认使用主机配置或 5（仅 Faster Whisper）"),
+    offline: bool = typer.Option(False, help="离线模式，只使用本地模型"),
+    resume: bool = typer.Option(False, help="断点续跑，跳过任务账本中已识别且未改动的切片"),
+    trace: Optional[str] = typer.Option(None, help="性能追踪文件路径（.json）"),
+):
+    """文本识别"""
+    _check_engine(engine)
+    output_mode = output_mode or ["list"]
+    if engine == "funasr":
+        from .asr import funasr_asr
+
+        result_path = funasr_asr(
+            input_folder=input_folder,
+            output_folder=output,
+            model_size="large",
+            language="zh" if language == "auto" else language,
+            output_mode=output_mode,
+            resume=resume,
+            batch_size=batch_size,
+            trace_path=trace,
+        )
+    else:
+        from .asr import fasterwhisper_asr
+
+        result_path = fasterwhisper_asr(
+            input_folder=input_folder,
+            output_folder=output,
+            model_size=model_size,
+            language=language,
+            precision=precision,
+            output_mode=output_mode,
+            resume=resume,
+            batch_size=batch_size,
+            offline=offline,
+            replicas=replicas,
+            cpu_threads=cpu_threads,
+            beam_size=beam_size,
+            trace_path=trace,
+        )
+    if result_path:
+        typer.echo(f"识别结果: {result_path}")
+
+
+@app.command("pipeline")
+def pipeline_command(
+    inp: str = typer.Argument(..., help="输入音频文件或文件夹"),
+    slice_output: str = typer.Option("output/slicer_opt", help="切片输出目录"),
+    asr_output: str = typer.Option("output/asr_opt", help="识别输出目录"),
+    in_memory: bool = typer.Option(False, help="内存直通：切片在内存中直接交给识别，与识别同时进行"),
+    write_audio: bool = typer.Option(True, help="写出切片音频（内存直通时可以不写出）"),
+    threshold: float = typer.Option(-34, help="音量阈值（dB）"),
+    min_length: int = typer.Option(4000, help="每段最小长度（毫秒）"),
+    min_interval: int = typer.Option(300, help="最短切割间隔（毫秒）"),
+    hop_size: int = typer.Option(10, help="帧长度（毫秒）"),
+    max_sil_kept: int = typer.Option(500, help="切完后静音最多保留长度（毫秒）"),
+    max_val: float = typer.Option(0.9, "--max", help="归一化后最大值"),
+    alpha: float = typer.Option(0.25, help="混音比例"),
+    workers: int = typer.Option(1, help="并行切片的进程数（内存直通时不使用）"),
+    audio_format: str = typer.Option("wav", "--format", help="切片输出格式：wav 或 flac"),
+    profile: Optional[str] = typer.Option(None, help="输出配置：sovits-32k、asr-16k-int16 或 float32-archive"),
+    engine: str = typer.Option("faster-whisper", help="识别引擎：faster-whisper 或 funasr（中文）"),
+    language: str = typer.Option("auto", help="语言代码，auto 表示自动检测"),
+    model_size: str = typer.Option("large-v3", help="模型尺寸（仅 Faster Whisper）"),
+    precision: str = typer.Option("auto", help="计算精度（仅 Faster Whisper）"),
+    output_mode: Optional[List[str]] = typer.Option(None, help="输出方式：list、txt、jsonl，可重复指定，默认 list"),
+    batch_size: int = typer.Option(0, help="批量识别的切片数，0 或 1 为逐条识别"),
+    queue_size: int = typer.Option(32, help="内存直通时切片与识别之间的队列长度，0 表示不并行"),
+    offline: bool = typer.Option(False, help="离线模式，只使用本地模型"),
+    resume: bool = typer.Option(False, help="断点续跑：切片和识别都跳过任务账本中已完成的部分"),
+    trace: Optional[str] = typer.Option(None, help="性能追踪文件路径（.json），切片和识别记在同一个文件中"),
+):
+    """完整流程：切片 + 识别"""
+    _check_engine(engine)
+    from .utils.tracing import traced
+
+    with traced(trace, "pipeline"):
+        if not in_memory:
+            slice_command(
+                inp,
+                slice_output,
+                threshold=threshold,
+                min_length=min_length,
+                min_interval=min_interval,
+                hop_size=hop_size,
+                max_sil_kept=max_sil_kept,
+                max_val=max_val,
+                alpha=alpha,
+                workers=workers,
+                write_audio=True,
+                audio_format=audio_format,
+                filename_template=None,
+                profile=profile,
+                decoder="auto",
+                streaming=False,
+                cache_dir=None,
+                resume=resume,
+                trace=None,
+            )
+            asr_command(
+                slice_output,
+                asr_output,
+                engine=engine,
+                language=language,
+                model_size=model_size,
+                precision=precision,
+                output_mode=output_mode,
+                batch_size=batch_size,
+                replicas=1,
+                cpu_threads=0,
+                beam_size=None,
+                offline=offline,
+                resume=resume,
+                trace=None,
+            )
+            return
+
+        from .slicer import iter_slices
+        from .slicer.profiles import DEFAULT_PROFILE
+        from .utils import Prefetcher
+
+        slices = iter_slices(
+            inp=inp,
+            opt_root=slice_output,
+            threshold=threshold,
+            min_length=min_length,
+            min_interval=min_interval,
+            hop_size=hop_size,
+            max_sil_kept=max_sil_kept,
+            _max=max_val,
+            alpha=alpha,
+            write_audio=write_audio,
+            audio_format=audio_format,
+            profile=profile or DEFAULT_PROFILE,
+        )
+        if queue_size > 0:
+            slices = Prefetcher(slices, queue_size)
+        output_name = os.path.basename(os.path.normpath(slice_output))
+        output_mode = output_mode or ["list"]
+        if engine == "funasr":
+            from .asr import funasr_asr_on_slices
+
+            result_path = funasr_asr_on_slices(
+                slices,
+                output_folder=asr_output,
+                output_name=output_name,
+                model_size="large",
+                language="zh" if language == "auto" else language,
+                output_mode=output_mode,
+                resume=resume,
+                batch_size=batch_size,
+            )
+        else:
+            from .asr import fasterwhisper_asr_on_slices
+
+            result_path = fasterwhisper_asr_on_slices(
+                slices,
+                output_folder=asr_output,
+                output_name=output_name,
+                model_size=model_size,
+                language=language,
+                precision=precision,
+                output_mode=output_mode,
+                resume=resume,
+                batch_size=batch_size,
+                offline=offline,
+            )
+        if result_path:
+            typer.echo(f"识别结果: {result_path}")
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise typer.BadParameter(f"识别引擎只能是 {'、'.join(ENGINES)}", param_hint="--engine")
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """音频切片模块"""
 
 from .slicer import Slicer
-from .slice_audio import slice_audio
+from .slice_audio import slice_audio, iter_slices, preview_slices
+from .manifest import load_slice, read_manifest
 
-__all__ = ["Slicer", "slice_audio"]
+__all__ = ["Slicer", "slice_audio", "iter_slices", "preview_slices", "load_slice", "read_manifest"]
@@ -0,0 +1,124 @@
+"""RMS 包络缓存：调整静音参数重新切片时跳过解码和 RMS 计算"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from ..utils.ledger import file_digest
+from .slicer import get_rms
+
+
+def compute_envelope(audio, win_size, hop_size):
+    """
+    计算切片所需的包络
+
+    Args:
+        audio: 音频波形数据（一维）
+        win_size: RMS 窗长（采样点）
+        hop_size: RMS 帧移（采样点）
+
+    Returns:
+        dict: rms 为 RMS 包络，peaks 为每 hop_size 个采样点的绝对值最大值，n_samples 为采样点数
+    """
+    n_samples = audio.shape[0]
+    n_blocks = -(-n_samples // hop_size)
+    peaks = np.zeros(n_blocks, dtype=np.float32)
+    # 分块计算，避免一次性生成整段音频的绝对值副本
+    step = max(1, (1 << 20) // hop_size) * hop_size
+    for begin in range(0, n_samples, step):
+        block = np.abs(audio[begin : begin + step])
+        first = begin // hop_size
+        full = block.shape[0] // hop_size
+        peaks[first : first + full] = block[: full * hop_size].reshape(-1, hop_size).max(axis=1)
+        if full * hop_size < block.shape[0]:
+            peaks[first + full] = block[full * hop_size :].max()
+    return {
+        "rms": get_rms(y=audio, frame_length=win_size, hop_length=hop_size).squeeze(0),
+        "peaks": peaks,
+        "n_samples": n_samples,
+    }
+
+
+def envelope_peak(envelope, start, end, hop_size):
+    """由包络中的逐块峰值得到切片 [start, end) 的峰值，与直接对切片音频求 np.abs(chunk).max() 相同"""
+    return envelope["peaks"][start // hop_size : -(-end // hop_size)].max()
+
+
+class EnvelopeCache:
+    """
+    磁盘上的 RMS 包络缓存
+
+    以 (文件内容哈希, 采样率, hop_size, win_size) 为键，保存 compute_envelope 的结果；
+    总大小超过 max_bytes 时按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path, sr, hop_size, win_size):
+        """计算缓存键（文件内容的 SHA-1 加上包络参数）"""
+        return f"{file_digest(path)}_{int(sr)}_{int(hop_size)}_{int(win_size)}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        读取缓存的包络
+
+        Returns:
+            dict 或 None（未命中）
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                envelope = {
+                    "rms": data["rms"],
+                    "peaks": data["peaks"],
+                    "n_samples": int(data["n_samples"]),
+                }
+            os.utime(path)  # 更新最近使用时间
+        except (OSError, KeyError, ValueError):
+            return None
+        return envelope
+
+    def put(self, key, envelope):
+        """写入包络并按容量淘汰旧条目"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, rms=envelope["rms"], peaks=envelope["peaks"], n_samples=envelope["n_samples"])
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue  # 可能已被其他进程删除
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
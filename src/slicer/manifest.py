@@ -0,0 +1,160 @@
+"""切片清单：只记录切片在源文件中的位置和归一化参数，按需读取切片音频"""
+
+import glob
+import json
+import os
+
+import numpy as np
+import soundfile as sf
+
+from ..utils.audio_utils import load_audio_segment
+
+MANIFEST_NAME = "slices.jsonl"
+
+
+def manifest_path(opt_root, i_part=0, all_part=1):
+    """
+    获取切片清单路径
+
+    Args:
+        opt_root: 切片输出目录
+        i_part: 当前批次索引
+        all_part: 总批次数（多批次时每个批次写各自的清单，避免互相覆盖）
+
+    Returns:
+        清单文件路径
+    """
+    if int(all_part) > 1:
+        return os.path.join(opt_root, f"slices.part{int(i_part)}.jsonl")
+    return os.path.join(opt_root, MANIFEST_NAME)
+
+
+def normalize_gain(peak, _max, alpha):
+    """
+    计算与 slice_audio 写出 wav 时等价的归一化增益
+
+    Args:
+        peak: 切片的峰值（绝对值最大值）
+        _max: 归一化后最大值
+        alpha: 混音比例
+
+    Returns:
+        增益系数，切片音频乘以该系数即为归一化结果
+    """
+    if peak > 1:
+        # slice_audio 先把切片除以峰值，随后混音时又除了一次峰值
+        return _max * alpha / peak / peak + (1 - alpha) / peak
+    if peak > 0:
+        return _max * alpha / peak + (1 - alpha)
+    return _max
+
+
+def write_manifest(path, records):
+    """
+    写出切片清单（JSONL，每行一条切片记录）
+
+    Args:
+        path: 清单文件路径
+        records: 切片记录列表，每条包含 source、sr、profile、sample_format、start、end、duration、peak、gain、
+            decoder（解码后端：soundfile、ffmpeg，命中包络缓存且未解码时为 cache）等字段
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_manifest(path):
+    """
+    读取切片清单
+
+    Args:
+        path: 清单文件路径
+
+    Returns:
+        切片记录列表
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_slice(record):
+    """
+    按清单记录读取一个切片并归一化，不需要事先写出切片文件
+
+    Args:
+        record: 切片记录
+
+    Returns:
+        归一化后的切片音频（numpy array，float32，单声道，采样率为 record["sr"]）
+    """
+    audio = load_audio_segment(record["source"], record["sr"], record["start"], record["end"])
+    return (audio * record["gain"]).astype(np.float32)
+
+
+def folder_slices(folder, file_names, sr=16000):
+    """
+    为文件夹中的切片文件准备 ASR 输入，按切片清单跳过重采样
+
+    切片清单记录的采样率与 sr 相同（如使用 asr-16k-int16 输出配置）时，切片直接由 soundfile
+    读入内存，不需要 ASR 再通过 ffmpeg 解码重采样；其余文件的音频为 None，由 ASR 自行读取。
+
+    Args:
+        folder: 切片文件夹
+        file_names: 要识别的文件名列表
+        sr: ASR 模型的采样率
+
+    Returns:
+        (文件路径, 音频或 None) 的迭代器
+    """
+    native = {name for name, record in _folder_records(folder).items() if record.get("sr") == sr}
+    for file_name in file_names:
+        file_path = os.path.join(folder, file_name)
+        audio = None
+        if file_name in native:
+            try:
+                audio = sf.read(file_path, dtype="float32", always_2d=True)[0].mean(axis=1, dtype=np.float32)
+            except Exception:
+                audio = None  # 读取失败时交给 ASR 自行解码
+        yield file_path, audio
+
+
+def manifest_durations(folder):
+    """
+    从文件夹中的切片清单得到各切片文件的时长，不需要打开切片文件
+
+    Args:
+        folder: 切片文件夹
+
+    Returns:
+        dict: {切片文件名: 时长（秒）}，没有清单或清单中没有该切片时不包含
+    """
+    return {
+        name: record.get("duration", (record["end"] - record["start"]) / record["sr"])
+        for name, record in _folder_records(folder).items()
+    }
+
+
+def manifest_sources(folder):
+    """
+    从文件夹中的切片清单得到各切片文件所属的源录音
+
+    Args:
+        folder: 切片文件夹
+
+    Returns:
+        dict: {切片文件名: 源文件路径}
+    """
+    return {name: record["source"] for name, record in _folder_records(folder).items()}
+
+
+def _folder_records(folder):
+    """读取文件夹中所有切片清单（含多批次清单），返回 {切片文件名: 记录}"""
+    records = {}
+    for path in glob.glob(os.path.join(folder, "slices*.jsonl")):
+        try:
+            for record in read_manifest(path):
+                if "audio" in record:
+                    records[os.path.basename(record["audio"])] = record
+        except (OSError, ValueError):
+            continue
+    return records
@@ -0,0 +1,48 @@
+"""切片输出配置：解码采样率、切片采样率与写出的采样格式"""
+
+import numpy as np
+
+# 配置名 -> (采样率, 采样格式)
+OUTPUT_PROFILES = {
+    # GPT-SoVITS 训练使用的 32kHz 16 位切片（原有行为）
+    "sovits-32k": {"sr": 32000, "sample_format": "int16"},
+    # 只做 ASR 时直接按模型的 16kHz 解码和写出，采样点数减半，识别时不需要再重采样
+    "asr-16k-int16": {"sr": 16000, "sample_format": "int16"},
+    # 32 位浮点存档，不做 16 位量化
+    "float32-archive": {"sr": 32000, "sample_format": "float32"},
+}
+
+DEFAULT_PROFILE = "sovits-32k"
+
+
+def get_profile(name):
+    """
+    获取输出配置
+
+    Args:
+        name: 配置名（见 OUTPUT_PROFILES）
+
+    Returns:
+        dict: sr 为解码、切片和写出的采样率，sample_format 为写出的采样格式（int16 或 float32）
+    """
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"不支持的输出配置: {name}，可选: {', '.join(OUTPUT_PROFILES)}")
+    return OUTPUT_PROFILES[name]
+
+
+def to_sample_format(chunk, sample_format):
+    """
+    把归一化后的切片转换为写出的采样格式
+
+    Args:
+        chunk: 归一化后的切片（浮点，范围 [-1, 1]）
+        sample_format: int16 或 float32
+
+    Returns:
+        转换后的音频数据
+    """
+    if sample_format == "int16":
+        return (chunk * 32767).astype(np.int16)
+    if sample_format == "float32":
+        return chunk.astype(np.float32)
+    raise ValueError(f"不支持的采样格式: {sample_format}")
@@ -3,10 +3,17 @@
 import os
 import numpy as np
 import traceback
-from scipy.io import wavfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from ..utils.audio_utils import load_audio
+from ..utils.audio_utils import decode_audio, decode_audio_stream, resample_audio
+from ..utils.ledger import LEDGER_NAME, JobLedger
+from ..utils.tracing import attach, span, traced
+from ..utils.tracing import trace_path as active_trace_path
+from .envelope_cache import EnvelopeCache, compute_envelope, envelope_peak
+from .manifest import manifest_path, normalize_gain, write_manifest
+from .profiles import DEFAULT_PROFILE, get_profile, to_sample_format
 from .slicer import Slicer
+from .writer import DEFAULT_FILENAME_TEMPLATE, SliceWriter, slice_filename
 
 
 def slice_audio(
@@ -21,6 +28,20 @@ def slice_audio(
     alpha=0.25,
     i_part=0,
     all_part=1,
+    streaming=False,
+    vectorized=True,
+    workers=1,
+    write_audio=True,
+    cache_dir=None,
+    cache_max_mb=512,
+    audio_format="wav",
+    filename_template=DEFAULT_FILENAME_TEMPLATE,
+    writer_threads=4,
+    decoder="auto",
+    profile=DEFAULT_PROFILE,
+    resume=False,
+    trace_path=None,
+    on_file=None,
 ):
     """
     对音频文件或文件夹进行切片处理
@@ -37,48 +58,470 @@ def slice_audio(
         alpha: 混音比例
         i_part: 当前处理的批次索引（用于多进程）
         all_part: 总批次数（用于多进程）
+        streaming: 是否使用流式切片（逐块解码，内存占用与文件长度无关）
+        vectorized: 是否使用向量化的切割点检测（False 时使用逐帧循环的原始实现）
+        workers: 并行切片的进程数，0 表示使用全部 CPU 核心
+        write_audio: 是否写出切片 wav；为 False 时只写切片清单（slices.jsonl），
+            通过 manifest.load_slice 按需读取切片
+        cache_dir: RMS 包络缓存目录，为 None 时不使用缓存。命中缓存时只调整静音参数的重新切片
+            不需要解码和计算 RMS（write_audio=False 时完全不需要解码）。缓存需要计算源文件的哈希，
+            未命中时整个文件解码到内存；streaming=True 时不使用缓存
+        cache_max_mb: 包络缓存总大小上限（MB），超过时淘汰最久未使用的条目
+        audio_format: 切片输出格式（wav 或 flac）
+        filename_template: 切片文件名模板（不含扩展名），可用字段 name、stem、start、end、index
+        writer_threads: 后台写出线程数，切片计算与文件写出并行进行
+        decoder: 解码后端（auto、soundfile 或 ffmpeg），auto 优先进程内解码，无法处理时回退到 ffmpeg
+        profile: 输出配置（见 profiles.OUTPUT_PROFILES），决定解码、切片和写出的采样率以及采样格式，
+            并记录在切片清单中
+        resume: 是否断点续切。为 True 时使用输出目录中的任务账本（ledger.sqlite），跳过内容和切片参数
+            都未改变、且切片文件齐全的输入文件，只处理新增或改动的文件
+        trace_path: 性能追踪文件路径（.json），给出时记录解码、RMS、切割、写出等各阶段的耗时，
+            结束后写出 Chrome Trace 文件和汇总表
+        on_file: 每处理完一个输入文件调用一次 on_file(已完成文件数, 文件总数)。on_file 抛出异常（如任务被取消）时
+            不再开始新的文件，已写出的切片保留（开启断点续切时已完成的文件记在任务账本中），异常继续向外抛出
         
     Returns:
         str: 处理结果消息
     """
-    os.makedirs(opt_root, exist_ok=True)
+    with traced(trace_path, "slice_audio", inp=inp) as job:
+        output_profile = _check_profile(profile, audio_format)
+        os.makedirs(opt_root, exist_ok=True)
+        if os.path.isfile(inp):
+            input_files = [inp]
+        elif os.path.isdir(inp):
+            input_files = [os.path.join(inp, name) for name in sorted(list(os.listdir(inp)))]
+        else:
+            return "输入路径存在但既不是文件也不是文件夹"
+    
+        slicer = _make_slicer(threshold, min_length, min_interval, hop_size, max_sil_kept, vectorized, output_profile["sr"])
+        # 流式切片优先：缓存未命中时要整个文件解码，与流式切片的内存上限冲突
+        cache = EnvelopeCache(cache_dir, int(cache_max_mb) * 1024 * 1024) if cache_dir and not streaming else None
+        options = {
+            "_max": float(_max),
+            "alpha": float(alpha),
+            "streaming": streaming,
+            "write_audio": write_audio,
+            "audio_format": audio_format,
+            "filename_template": filename_template,
+            "writer_threads": int(writer_threads),
+            "decoder": decoder,
+            "profile": profile,
+            "sr": output_profile["sr"],
+            "sample_format": output_profile["sample_format"],
+        }
+    
+        # 处理指定批次的文件
+        files = input_files[int(i_part) :: int(all_part)]
+        results = []
+        ledger = None
+        if resume:
+            ledger = JobLedger(os.path.join(opt_root, LEDGER_NAME))
+            params = _ledger_params(options, slicer_params=(threshold, min_length, min_interval, hop_size, max_sil_kept))
+            pending = []
+            for inp_path in files:
+                records = _ledger_records(ledger, inp_path, params)
+                if records is None:
+                    pending.append(inp_path)
+                else:
+                    results.append((inp_path, records, None, "ledger"))
+            files = pending
+        # 续切跳过的文件计入已完成
+        total = len(results) + len(files)
+        workers = int(workers) if int(workers) > 0 else (os.cpu_count() or 1)
+        workers = max(1, min(workers, len(files)))
+        if workers > 1:
+            # 按文件大小从大到小提交，避免最后只剩一个大文件占着一个核心
+            files = sorted(files, key=_file_size, reverse=True)
+            # 子进程显式加入当前任务的追踪，不依赖 fork 时继承的上下文
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach, initargs=(active_trace_path(),)) as executor:
+                futures = [
+                    executor.submit(_slice_file, inp_path, opt_root, slicer, options, cache)
+                    for inp_path in files
+                ]
+                try:
+                    for future in as_completed(futures):
+                        results.append(future.result())
+                        if ledger is not None:
+                            _ledger_record(ledger, results[-1], params)
+                        if on_file is not None:
+                            on_file(len(results), total)
+                except BaseException:
+                    # 未开始的文件不再处理，只等待进行中的文件结束
+                    for future in futures:
+                        future.cancel()
+                    if ledger is not None:
+                        ledger.close()
+                    raise
+        else:
+            # 单进程时所有文件共用一个写出线程池，文件之间的解码和写出也能重叠
+            writer = SliceWriter(audio_format, options["writer_threads"])
+            try:
+                for inp_path in files:
+                    results.append(_slice_file(inp_path, opt_root, slicer, options, cache, writer))
+                    if ledger is not None:
+                        # 切片文件先写临时文件再改名，续切时会检查切片文件是否齐全
+                        _ledger_record(ledger, results[-1], params)
+                    if on_file is not None:
+                        on_file(len(results), total)
+            except BaseException:
+                # 已提交的切片写完后再退出
+                for inp_path, path, error in writer.close():
+                    print(f"{path} ->fail-> {error}")
+                    if ledger is not None:
+                        ledger.forget("slice", os.path.abspath(inp_path))
+                if ledger is not None:
+                    ledger.close()
+                raise
+            write_errors = {}
+            for inp_path, path, error in writer.close():
+                print(f"{path} ->fail-> {error}")
+                write_errors.setdefault(inp_path, error)
+                if ledger is not None:
+                    ledger.forget("slice", os.path.abspath(inp_path))
+            results = [
+                (inp_path, records, error or write_errors.get(inp_path), backend)
+                for inp_path, records, error, backend in results
+            ]
+    
+        if ledger is not None:
+            ledger.close()
+        job["audio_seconds"] = sum(record["duration"] for _, records, _, _ in results for record in records)
+        results.sort(key=lambda result: result[0])
+        write_manifest(
+            manifest_path(opt_root, i_part, all_part),
+            [record for _, records, _, _ in results for record in records],
+        )
+        return _summarize(results)
+
+
+def iter_slices(
+    inp,
+    opt_root,
+    threshold=-34,
+    min_length=4000,
+    min_interval=300,
+    hop_size=10,
+    max_sil_kept=500,
+    _max=0.9,
+    alpha=0.25,
+    target_sr=16000,
+    streaming=False,
+    vectorized=True,
+    write_audio=False,
+    audio_format="wav",
+    filename_template=DEFAULT_FILENAME_TEMPLATE,
+    writer_threads=4,
+    decoder="auto",
+    profile=DEFAULT_PROFILE,
+    on_file=None,
+):
+    """
+    逐个产出归一化并重采样后的切片，供 ASR 直接在内存中识别
+    
+    切片参数与 slice_audio 相同。切片只有在 write_audio=True 时才会写出（作为附带输出），
+    否则产出的文件路径只用于标注文件中的音频路径和 txt 的位置。输出配置的采样率与 target_sr
+    相同（如 asr-16k-int16）时直接按 target_sr 解码，不需要重采样。
+    
+    Args:
+        target_sr: 产出切片的采样率（ASR 模型使用 16000）
+        on_file: 每处理完一个输入文件调用一次 on_file(已完成文件数, 文件总数)，用于显示切片进度
+        其余参数见 slice_audio
+        
+    Yields:
+        (切片文件路径, 音频)，音频为 target_sr 采样率的 float32 单声道数组
+    """
     if os.path.isfile(inp):
         input_files = [inp]
     elif os.path.isdir(inp):
         input_files = [os.path.join(inp, name) for name in sorted(list(os.listdir(inp)))]
     else:
-        return "输入路径存在但既不是文件也不是文件夹"
+        return
+    output_profile = _check_profile(profile, audio_format)
+    sr, sample_format = output_profile["sr"], output_profile["sample_format"]
+    os.makedirs(opt_root, exist_ok=True)
+    slicer = _make_slicer(threshold, min_length, min_interval, hop_size, max_sil_kept, vectorized, sr)
+    _max = float(_max)
+    alpha = float(alpha)
+    writer = SliceWriter(audio_format, writer_threads) if write_audio else None
+    try:
+        for file_index, inp_path in enumerate(input_files):
+            try:
+                name = os.path.basename(inp_path)
+                if streaming:
+                    chunks = slicer.slice_stream(decode_audio_stream(inp_path, sr, backend=decoder)[0])
+                else:
+                    with span("decode", file=name):
+                        audio = decode_audio(inp_path, sr, decoder)[0]
+                    chunks = slicer.slice(audio)
+                for index, (chunk, start, end) in enumerate(chunks):  # start和end是帧数
+                    chunk = _normalize_chunk(chunk, np.abs(chunk).max(), _max, alpha)
+                    path = "%s/%s" % (opt_root, slice_filename(filename_template, name, start, end, index, audio_format))
+                    if writer is not None:
+                        writer.submit(path, to_sample_format(chunk, sample_format), sr, tag=inp_path)
+                    with span("resample", file=os.path.basename(path)):
+                        audio_16k = resample_audio(chunk.astype(np.float32), sr, target_sr)
+                    yield path, audio_16k
+            except Exception:
+                print(f"{inp_path} ->fail-> {traceback.format_exc()}")
+            if on_file is not None:
+                on_file(file_index + 1, len(input_files))
+    finally:
+        if writer is not None:
+            for _, path, error in writer.close():
+                print(f"{path} ->fail-> {error}")
+
+
+def preview_slices(
+    inp,
+    threshold=-34,
+    min_length=4000,
+    min_interval=300,
+    hop_size=10,
+    max_sil_kept=500,
+    cache_dir=None,
+    cache_max_mb=512,
+    decoder="auto",
+    profile=DEFAULT_PROFILE,
+):
+    """
+    只计算切割点，不写出任何音频（配合包络缓存可以快速试验静音参数）
     
-    slicer = Slicer(
-        sr=32000,  # 长音频采样率
+    Args:
+        inp: 输入文件或文件夹路径
+        threshold, min_length, min_interval, hop_size, max_sil_kept: 同 slice_audio
+        cache_dir: RMS 包络缓存目录，为 None 时每次都重新解码
+        cache_max_mb: 包络缓存总大小上限（MB）
+        decoder: 解码后端（auto、soundfile 或 ffmpeg）
+        profile: 输出配置，决定解码和切片的采样率
+        
+    Returns:
+        dict: {输入文件路径: [(起始采样点, 结束采样点), ...]}，采样率为输出配置的采样率；处理失败的文件不在结果中
+    """
+    if os.path.isfile(inp):
+        input_files = [inp]
+    elif os.path.isdir(inp):
+        input_files = [os.path.join(inp, name) for name in sorted(list(os.listdir(inp)))]
+    else:
+        return {}
+    sr = get_profile(profile)["sr"]
+    slicer = _make_slicer(threshold, min_length, min_interval, hop_size, max_sil_kept, sr=sr)
+    cache = EnvelopeCache(cache_dir, int(cache_max_mb) * 1024 * 1024) if cache_dir else None
+    cut_points = {}
+    for inp_path in input_files:
+        try:
+            if cache is not None:
+                envelope, _, _ = _cached_envelope(inp_path, slicer, sr, cache, decoder)
+            else:
+                audio, _ = decode_audio(inp_path, sr, decoder)
+                envelope = compute_envelope(audio, slicer.win_size, slicer.hop_size)
+            cut_points[inp_path] = slicer.cut_points(envelope["rms"], envelope["n_samples"])
+        except Exception:
+            print(f"{inp_path} ->fail-> {traceback.format_exc()}")
+    return cut_points
+
+
+def _check_profile(profile, audio_format):
+    """获取输出配置并检查与输出格式是否兼容"""
+    output_profile = get_profile(profile)
+    if output_profile["sample_format"] == "float32" and audio_format != "wav":
+        raise ValueError(f"{audio_format} 不支持 32 位浮点采样，输出配置 {profile} 请使用 wav 格式")
+    return output_profile
+
+
+def _make_slicer(threshold, min_length, min_interval, hop_size, max_sil_kept, vectorized=True, sr=32000):
+    """按 slice_audio 的参数创建切片器"""
+    return Slicer(
+        sr=sr,  # 长音频采样率
         threshold=int(threshold),  # 音量小于这个值视作静音的备选切割点
         min_length=int(min_length),  # 每段最小多长，如果第一段太短一直和后面段连起来直到超过这个值
         min_interval=int(min_interval),  # 最短切割间隔
         hop_size=int(hop_size),  # 怎么算音量曲线，越小精度越大计算量越高（不是精度越大效果越好）
         max_sil_kept=int(max_sil_kept),  # 切完后静音最多留多长
+        vectorized=bool(vectorized),
     )
-    _max = float(_max)
-    alpha = float(alpha)
+
+
+def _cached_envelope(inp_path, slicer, sr, cache, decoder="auto"):
+    """
+    读取缓存的包络，未命中时解码并计算后写入缓存
     
-    # 处理指定批次的文件
-    for inp_path in input_files[int(i_part) :: int(all_part)]:
-        try:
-            name = os.path.basename(inp_path)
-            audio = load_audio(inp_path, 32000)
-            for chunk, start, end in slicer.slice(audio):  # start和end是帧数
-                tmp_max = np.abs(chunk).max()
-                if tmp_max > 1:
-                    chunk /= tmp_max
-                if tmp_max > 0:
-                    chunk = (chunk / tmp_max * (_max * alpha)) + (1 - alpha) * chunk
+    Returns:
+        tuple: (包络, 本次解码的音频, 解码后端)；命中缓存时音频为 None，后端为 "cache"
+    """
+    key = cache.key(inp_path, sr, slicer.hop_size, slicer.win_size)
+    envelope = cache.get(key)
+    if envelope is not None:
+        return envelope, None, "cache"
+    with span("decode", file=os.path.basename(inp_path)) as info:
+        audio, backend = decode_audio(inp_path, sr, decoder)
+        info["backend"] = backend
+    with span("get_rms", file=os.path.basename(inp_path)):
+        envelope = compute_envelope(audio, slicer.win_size, slicer.hop_size)
+    cache.put(key, envelope)
+    return envelope, audio, backend
+
+
+def _normalize_chunk(chunk, tmp_max, _max, alpha):
+    """按峰值归一化切片并与原始切片混合（不修改传入的切片，切片可能是只读的解码缓冲区或内存映射）"""
+    if tmp_max > 1:
+        chunk = chunk / tmp_max
+    if tmp_max > 0:
+        chunk = (chunk / tmp_max * (_max * alpha)) + (1 - alpha) * chunk
+    else:
+        chunk = chunk * _max
+    return chunk
+
+
+def _ledger_params(options, slicer_params):
+    """影响切片结果的参数（任务账本中参数一致的文件才视为已完成）"""
+    return {
+        "slicer": [int(value) for value in slicer_params],
+        "_max": options["_max"],
+        "alpha": options["alpha"],
+        "write_audio": bool(options["write_audio"]),
+        "audio_format": options["audio_format"],
+        "filename_template": options["filename_template"],
+        "profile": options["profile"],
+    }
+
+
+def _ledger_records(ledger, inp_path, params):
+    """从任务账本中取出已完成文件的切片清单记录，未完成、已改动或切片文件缺失时返回 None"""
+    try:
+        digest = ledger.digest(inp_path)
+    except OSError:
+        return None
+    result = ledger.get("slice", os.path.abspath(inp_path), digest, params)
+    if result is None:
+        return None
+    records = result["records"]
+    if not all(os.path.exists(record["audio"]) for record in records if "audio" in record):
+        return None
+    return records
+
+
+def _ledger_record(ledger, result, params):
+    """把处理成功的文件记入任务账本"""
+    inp_path, records, error, _ = result
+    if error is not None:
+        return
+    try:
+        digest = ledger.digest(inp_path)
+    except OSError:
+        return
+    ledger.put("slice", os.path.abspath(inp_path), digest, params, {"records": records})
+
+
+def _file_size(path):
+    """获取文件大小，无法访问时视为 0"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _slice_file(inp_path, opt_root, slicer, options, cache=None, writer=None):
+    """
+    切分单个文件并写出切片（可在子进程中运行）
+    
+    Args:
+        options: slice_audio 的归一化和输出参数
+        cache: 包络缓存，为 None 时不使用
+        writer: 共用的写出线程池；为 None 时为本文件单独创建，并在返回前等待写出完成
+    
+    Returns:
+        tuple: (输入路径, 切片清单记录列表, 错误信息或 None, 解码后端)
+    """
+    _max, alpha = options["_max"], options["alpha"]
+    write_audio = options["write_audio"]
+    own_writer = writer is None and write_audio
+    if own_writer:
+        writer = SliceWriter(options["audio_format"], options["writer_threads"])
+    decoder = options["decoder"]
+    sr = options["sr"]
+    records = []
+    backend = None
+    name = os.path.basename(inp_path)
+    try:
+        with span("slice_file", file=name):
+            envelope = None
+            if cache is not None:
+                envelope, audio, backend = _cached_envelope(inp_path, slicer, sr, cache, decoder)
+                if write_audio and audio is None:
+                    with span("decode", file=name) as info:
+                        audio, backend = decode_audio(inp_path, sr, decoder)
+                        info["backend"] = backend
+                with span("cut_points", file=name):
+                    cut_points = slicer.cut_points(envelope["rms"], envelope["n_samples"])
+                chunks = [(audio[start:end] if write_audio else None, start, end) for start, end in cut_points]
+            elif options["streaming"]:
+                # 流式切片时解码、RMS 计算和切割交替进行，记在 slice_file 中
+                blocks, backend = decode_audio_stream(inp_path, sr, backend=decoder)
+                chunks = slicer.slice_stream(blocks)
+            else:
+                with span("decode", file=name) as info:
+                    audio, backend = decode_audio(inp_path, sr, decoder)
+                    info["backend"] = backend
+                chunks = slicer.slice(audio)
+            for index, (chunk, start, end) in enumerate(chunks):  # start和end是帧数
+                if envelope is not None:
+                    tmp_max = envelope_peak(envelope, start, end, slicer.hop_size)
+                    n_samples = min(end, envelope["n_samples"]) - start
                 else:
-                    chunk = chunk * _max
-                wavfile.write(
-                    "%s/%s_%010d_%010d.wav" % (opt_root, name, start, end),
-                    32000,
-                    (chunk * 32767).astype(np.int16),
+                    tmp_max = np.abs(chunk).max()
+                    n_samples = chunk.shape[0]
+                record = {
+                    "source": os.path.abspath(inp_path),
+                    "sr": sr,
+                    "profile": options["profile"],
+                    "sample_format": options["sample_format"],
+                    "start": start,
+                    "end": end,
+                    "duration": n_samples / sr,  # 最后一个切片的 end 可能超出音频末尾
+                    "peak": float(tmp_max),
+                    "gain": normalize_gain(float(tmp_max), _max, alpha),
+                    "decoder": backend,
+                }
+                records.append(record)
+                if not write_audio:
+                    continue
+                chunk = _normalize_chunk(chunk, tmp_max, _max, alpha)
+                filename = slice_filename(
+                    options["filename_template"], name, start, end, index, options["audio_format"]
                 )
-        except Exception as e:
-            print(f"{inp_path} ->fail-> {traceback.format_exc()}")
-    
-    return "执行完毕，请检查输出文件"
+                record["audio"] = "%s/%s" % (opt_root, filename)
+                writer.submit(record["audio"], to_sample_format(chunk, options["sample_format"]), sr, tag=inp_path)
+    except Exception:
+        error = traceback.format_exc()
+        print(f"{inp_path} ->fail-> {error}")
+        if own_writer:
+            writer.close()
+        return inp_path, records, error, backend
+    if own_writer:
+        for _, path, error in writer.close():
+            print(f"{path} ->fail-> {error}")
+            return inp_path, records, error, backend
+    return inp_path, records, None, backend
+
+
+def _summarize(results):
+    """汇总各文件（各进程）的处理结果"""
+    failed = sorted(inp_path for inp_path, _, error, _ in results if error is not None)
+    slice_count = sum(len(records) for _, records, _, _ in results)
+    message = f"执行完毕，共处理 {len(results)} 个文件，生成 {slice_count} 个切片，请检查输出文件"
+    backends = {}
+    for _, _, _, backend in results:
+        if backend is not None:
+            backends[backend] = backends.get(backend, 0) + 1
+    skipped = backends.pop("ledger", 0)
+    if skipped:
+        message += f"\n跳过已完成的文件 {skipped} 个"
+    if backends:
+        message += "\n解码后端：" + "，".join(f"{backend} {count} 个" for backend, count in sorted(backends.items()))
+    # 进程内解码失败回退到 ffmpeg 的文件（或指定 ffmpeg 时的全部文件）逐个列出，各切片的后端另记在切片清单中
+    ffmpeg_files = sorted(inp_path for inp_path, _, _, backend in results if backend == "ffmpeg")
+    if ffmpeg_files:
+        message += "\n使用 ffmpeg 解码的文件：\n" + "\n".join(ffmpeg_files)
+    if failed:
+        message += f"\n{len(failed)} 个文件处理出错：\n" + "\n".join(failed)
+    return message
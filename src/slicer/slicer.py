@@ -2,8 +2,10 @@
 
 import numpy as np
 
+from ..utils.tracing import span
 
-# This function is obtained from librosa.
+
+# Adapted from librosa.feature.rms.
 def get_rms(
     y,
     frame_length=2048,
@@ -11,31 +13,222 @@ def get_rms(
     pad_mode="constant",
 ):
     """计算 RMS (Root Mean Square) 能量"""
-    padding = (int(frame_length // 2), int(frame_length // 2))
-    y = np.pad(y, padding, mode=pad_mode)
-
-    axis = -1
-    # put our new within-frame axis at the end for now
-    out_strides = y.strides + tuple([y.strides[axis]])
-    # Reduce the shape on the framing axis
-    x_shape_trimmed = list(y.shape)
-    x_shape_trimmed[axis] -= frame_length - 1
-    out_shape = tuple(x_shape_trimmed) + tuple([frame_length])
-    xw = np.lib.stride_tricks.as_strided(y, shape=out_shape, strides=out_strides)
-    if axis < 0:
-        target_axis = axis - 1
-    else:
-        target_axis = axis + 1
-    xw = np.moveaxis(xw, -1, target_axis)
-    # Downsample along the target axis
-    slices = [slice(None)] * xw.ndim
-    slices[axis] = slice(0, None, hop_length)
-    x = xw[tuple(slices)]
-
-    # Calculate power
-    power = np.mean(np.abs(x) ** 2, axis=-2, keepdims=True)
-
-    return np.sqrt(power)
+    pad = int(frame_length // 2)
+    if pad_mode == "constant":
+        # 零填充不改变能量，直接在 _framed_rms 中按越界处理，避免复制整个信号
+        n_frames = (y.shape[-1] + 2 * pad - frame_length) // hop_length + 1
+        return _framed_rms(y, frame_length, hop_length, n_frames, offset=pad)
+    y = np.pad(y, (pad, pad), mode=pad_mode)
+    n_frames = (y.shape[-1] - frame_length) // hop_length + 1
+    return _framed_rms(y, frame_length, hop_length, n_frames)
+
+
+def _framed_rms(y, frame_length, hop_length, n_frames, offset=0, block_size=1 << 16):
+    """
+    分帧计算 RMS，第 t 帧覆盖 y[t * hop_length - offset : t * hop_length - offset + frame_length]，
+    超出 y 范围的部分按 0 处理
+    
+    按 block_size 分块计算平方和的前缀和（float64 累加），每帧能量为两个前缀和之差：
+    O(N) 时间，除输出外只需要 O(block_size + frame_length) 的额外内存
+    
+    Returns:
+        形状为 (1, n_frames) 的 RMS
+    """
+    n = y.shape[-1]
+    starts = np.arange(max(n_frames, 0), dtype=np.int64) * hop_length - offset
+    lo = np.clip(starts, 0, n)
+    hi = np.clip(starts + frame_length, 0, n)
+    energy = np.zeros(lo.shape[0], dtype=np.float64)
+    for block_start in range(0, n, block_size):
+        first, last = np.searchsorted(lo, (block_start, block_start + block_size))
+        if first == last:
+            continue
+        # 起点落在本块内的帧，其窗口最多延伸到块尾之后 frame_length 个采样点
+        segment = y[block_start : hi[last - 1]].astype(np.float64)
+        cumsum = np.zeros(segment.shape[0] + 1, dtype=np.float64)
+        np.cumsum(np.square(segment), out=cumsum[1:])
+        energy[first:last] = cumsum[hi[first:last] - block_start] - cumsum[lo[first:last] - block_start]
+    # 前缀和相减可能引入极小的负数误差
+    power = np.maximum(energy, 0) / frame_length
+    dtype = y.dtype if np.issubdtype(y.dtype, np.floating) else np.float64
+    return np.sqrt(power).astype(dtype)[None, :]
+
+
+class _SilenceTracker:
+    """增量式静音检测，逐块接收 RMS 帧并返回已确定的静音区间 (sil_tags)"""
+
+    def __init__(self, threshold, min_length, min_interval, max_sil_kept, vectorized=True):
+        self.threshold = threshold
+        self.vectorized = vectorized
+        self.min_length = min_length
+        self.min_interval = min_interval
+        self.max_sil_kept = max_sil_kept
+        self.frames = 0  # 已接收的帧数
+        self.silence_start = None
+        self.clip_start = 0
+        # 只保留当前静音段起点之后的 RMS，_offset 为 _rms[0] 的绝对帧号
+        self._rms = np.zeros(0, dtype=np.float32)
+        self._offset = 0
+
+    def _argmin(self, begin, end):
+        """返回绝对帧区间 [begin, end) 内 RMS 最小的帧号"""
+        return int(self._rms[begin - self._offset : end - self._offset].argmin()) + begin
+
+    def _range_argmin(self, begins, ends):
+        """向量化版本的 _argmin，一次计算多个区间 [begins[k], ends[k]) 的最小值位置"""
+        width = int((ends - begins).max())
+        index = (begins - self._offset)[:, None] + np.arange(width)
+        valid = index < (ends - self._offset)[:, None]
+        index = np.minimum(index, self._rms.shape[0] - 1)
+        window = np.where(valid, self._rms[index], np.inf)
+        return begins + window.argmin(axis=1)
+
+    def push(self, rms_list):
+        """
+        追加一段 RMS 帧
+        
+        Args:
+            rms_list: 新的 RMS 帧（一维数组）
+            
+        Returns:
+            list: 本次新确定的静音区间 [(起始帧, 结束帧), ...]
+        """
+        if self._rms.shape[0] == 0:
+            self._rms = rms_list
+            self._offset = self.frames
+        else:
+            self._rms = np.concatenate((self._rms, rms_list))
+        base = self.frames
+        self.frames += rms_list.shape[0]
+        if self.vectorized:
+            sil_tags = self._push_vectorized(rms_list, base)
+        else:
+            sil_tags = self._push_loop(rms_list, base)
+        # 丢弃当前静音段之前不再需要的 RMS
+        keep = self.frames if self.silence_start is None else self.silence_start
+        if keep > self._offset:
+            self._rms = self._rms[keep - self._offset :]
+            self._offset = keep
+        return sil_tags
+
+    def _push_loop(self, rms_list, base):
+        """逐帧循环实现（原始算法）"""
+        sil_tags = []
+        for i, rms in enumerate(rms_list, start=base):
+            # Keep looping while frame is silent.
+            if rms < self.threshold:
+                # Record start of silent frames.
+                if self.silence_start is None:
+                    self.silence_start = i
+                continue
+            # Keep looping while frame is not silent and silence start has not been recorded.
+            if self.silence_start is None:
+                continue
+            silence_start = self.silence_start
+            # Clear recorded silence start if interval is not enough or clip is too short
+            is_leading_silence = silence_start == 0 and i > self.max_sil_kept
+            need_slice_middle = i - silence_start >= self.min_interval and i - self.clip_start >= self.min_length
+            if not is_leading_silence and not need_slice_middle:
+                self.silence_start = None
+                continue
+            # Need slicing. Record the range of silent frames to be removed.
+            if i - silence_start <= self.max_sil_kept:
+                pos = self._argmin(silence_start, i + 1)
+                if silence_start == 0:
+                    sil_tags.append((0, pos))
+                else:
+                    sil_tags.append((pos, pos))
+                self.clip_start = pos
+            elif i - silence_start <= self.max_sil_kept * 2:
+                pos = self._argmin(i - self.max_sil_kept, silence_start + self.max_sil_kept + 1)
+                pos_l = self._argmin(silence_start, silence_start + self.max_sil_kept + 1)
+                pos_r = self._argmin(i - self.max_sil_kept, i + 1)
+                if silence_start == 0:
+                    sil_tags.append((0, pos_r))
+                    self.clip_start = pos_r
+                else:
+                    sil_tags.append((min(pos_l, pos), max(pos_r, pos)))
+                    self.clip_start = max(pos_r, pos)
+            else:
+                pos_l = self._argmin(silence_start, silence_start + self.max_sil_kept + 1)
+                pos_r = self._argmin(i - self.max_sil_kept, i + 1)
+                if silence_start == 0:
+                    sil_tags.append((0, pos_r))
+                else:
+                    sil_tags.append((pos_l, pos_r))
+                self.clip_start = pos_r
+            self.silence_start = None
+        return sil_tags
+
+    def _push_vectorized(self, rms_list, base):
+        """
+        向量化实现：用数组运算得到静音掩码并做游程编码，批量计算每个静音段的候选切割点，
+        只在静音段（而不是每一帧）上做依赖 clip_start 的顺序判断，结果与 _push_loop 完全一致
+        """
+        # 与逐帧循环中标量比较的精度保持一致（float64）
+        silent = rms_list.astype(np.float64) < self.threshold
+        prev_silent = np.empty_like(silent)
+        prev_silent[:1] = self.silence_start is not None
+        prev_silent[1:] = silent[:-1]
+        starts = np.flatnonzero(silent & ~prev_silent) + base
+        ends = np.flatnonzero(~silent & prev_silent) + base
+        if self.silence_start is not None:
+            starts = np.concatenate(([self.silence_start], starts))
+        # 最后一个静音段可能延续到下一块
+        open_start = int(starts[-1]) if starts.shape[0] > ends.shape[0] else None
+        starts = starts[: ends.shape[0]]
+
+        max_sil_kept = self.max_sil_kept
+        # 既不是开头静音、长度也不足 min_interval 的静音段一定不会被切割
+        candidate = ((starts == 0) & (ends > max_sil_kept)) | (ends - starts >= self.min_interval)
+        starts, ends = starts[candidate], ends[candidate]
+        sil_tags = []
+        if starts.shape[0] > 0:
+            pos_l = self._range_argmin(starts, np.minimum(ends, starts + max_sil_kept) + 1)
+            pos_r = self._range_argmin(np.maximum(starts, ends - max_sil_kept), ends + 1)
+            pos_m = pos_r.copy()
+            middle = (ends - starts > max_sil_kept) & (ends - starts <= max_sil_kept * 2)
+            if middle.any():
+                pos_m[middle] = self._range_argmin(ends[middle] - max_sil_kept, starts[middle] + max_sil_kept + 1)
+            clip_start = self.clip_start
+            for silence_start, i, l, r, m in zip(
+                starts.tolist(), ends.tolist(), pos_l.tolist(), pos_r.tolist(), pos_m.tolist()
+            ):
+                is_leading_silence = silence_start == 0 and i > max_sil_kept
+                need_slice_middle = i - silence_start >= self.min_interval and i - clip_start >= self.min_length
+                if not is_leading_silence and not need_slice_middle:
+                    continue
+                if i - silence_start <= max_sil_kept:
+                    sil_tags.append((0, l) if silence_start == 0 else (l, l))
+                    clip_start = l
+                elif i - silence_start <= max_sil_kept * 2:
+                    if silence_start == 0:
+                        sil_tags.append((0, r))
+                        clip_start = r
+                    else:
+                        sil_tags.append((min(l, m), max(r, m)))
+                        clip_start = max(r, m)
+                else:
+                    sil_tags.append((0, r) if silence_start == 0 else (l, r))
+                    clip_start = r
+            self.clip_start = clip_start
+        self.silence_start = open_start
+        return sil_tags
+
+    def finish(self):
+        """
+        结束输入，处理尾部静音
+        
+        Returns:
+            list: 尾部静音区间（可能为空）
+        """
+        # Deal with trailing silence.
+        total_frames = self.frames
+        if self.silence_start is not None and total_frames - self.silence_start >= self.min_interval:
+            silence_end = min(total_frames, self.silence_start + self.max_sil_kept)
+            pos = self._argmin(self.silence_start, silence_end + 1)
+            return [(pos, total_frames + 1)]
+        return []
 
 
 class Slicer:
@@ -49,6 +242,7 @@ class Slicer:
         min_interval: int = 300,
         hop_size: int = 20,
         max_sil_kept: int = 5000,
+        vectorized: bool = True,
     ):
         """
         初始化切片器
@@ -60,6 +254,7 @@ class Slicer:
             min_interval: 最短切割间隔（毫秒）
             hop_size: 帧长度（毫秒）
             max_sil_kept: 切完后静音最多保留长度（毫秒）
+            vectorized: 是否使用向量化的切割点检测（False 时使用逐帧循环的原始实现，结果相同）
         """
         if not min_length >= min_interval >= hop_size:
             raise ValueError("The following condition must be satisfied: min_length >= min_interval >= hop_size")
@@ -72,6 +267,7 @@ class Slicer:
         self.min_length = round(sr * min_length / 1000 / self.hop_size)
         self.min_interval = round(min_interval / self.hop_size)
         self.max_sil_kept = round(sr * max_sil_kept / 1000 / self.hop_size)
+        self.vectorized = vectorized
 
     def _apply_slice(self, waveform, begin, end):
         """应用切片，提取指定范围的音频"""
@@ -80,6 +276,12 @@ class Slicer:
         else:
             return waveform[begin * self.hop_size : min(waveform.shape[0], end * self.hop_size)]
 
+    def _new_tracker(self):
+        """创建静音检测器"""
+        return _SilenceTracker(
+            self.threshold, self.min_length, self.min_interval, self.max_sil_kept, vectorized=self.vectorized
+        )
+
     def slice(self, waveform):
         """
         对音频进行切片
@@ -96,82 +298,123 @@ class Slicer:
             samples = waveform
         if samples.shape[0] <= self.min_length:
             return [[waveform, 0, int(samples.shape[0])]]
-        rms_list = get_rms(y=samples, frame_length=self.win_size, hop_length=self.hop_size).squeeze(0)
-        sil_tags = []
-        silence_start = None
-        clip_start = 0
-        for i, rms in enumerate(rms_list):
-            # Keep looping while frame is silent.
-            if rms < self.threshold:
-                # Record start of silent frames.
-                if silence_start is None:
-                    silence_start = i
-                continue
-            # Keep looping while frame is not silent and silence start has not been recorded.
-            if silence_start is None:
-                continue
-            # Clear recorded silence start if interval is not enough or clip is too short
-            is_leading_silence = silence_start == 0 and i > self.max_sil_kept
-            need_slice_middle = i - silence_start >= self.min_interval and i - clip_start >= self.min_length
-            if not is_leading_silence and not need_slice_middle:
-                silence_start = None
-                continue
-            # Need slicing. Record the range of silent frames to be removed.
-            if i - silence_start <= self.max_sil_kept:
-                pos = rms_list[silence_start : i + 1].argmin() + silence_start
-                if silence_start == 0:
-                    sil_tags.append((0, pos))
-                else:
-                    sil_tags.append((pos, pos))
-                clip_start = pos
-            elif i - silence_start <= self.max_sil_kept * 2:
-                pos = rms_list[i - self.max_sil_kept : silence_start + self.max_sil_kept + 1].argmin()
-                pos += i - self.max_sil_kept
-                pos_l = rms_list[silence_start : silence_start + self.max_sil_kept + 1].argmin() + silence_start
-                pos_r = rms_list[i - self.max_sil_kept : i + 1].argmin() + i - self.max_sil_kept
-                if silence_start == 0:
-                    sil_tags.append((0, pos_r))
-                    clip_start = pos_r
-                else:
-                    sil_tags.append((min(pos_l, pos), max(pos_r, pos)))
-                    clip_start = max(pos_r, pos)
-            else:
-                pos_l = rms_list[silence_start : silence_start + self.max_sil_kept + 1].argmin() + silence_start
-                pos_r = rms_list[i - self.max_sil_kept : i + 1].argmin() + i - self.max_sil_kept
-                if silence_start == 0:
-                    sil_tags.append((0, pos_r))
-                else:
-                    sil_tags.append((pos_l, pos_r))
-                clip_start = pos_r
-            silence_start = None
-        # Deal with trailing silence.
+        with span("get_rms"):
+            rms_list = get_rms(y=samples, frame_length=self.win_size, hop_length=self.hop_size).squeeze(0)
+        with span("cut_points"):
+            ranges = self._cut_frames(rms_list)
+        ####音频+起始时间+终止时间
+        return [
+            [self._apply_slice(waveform, begin, end), int(begin * self.hop_size), int(end * self.hop_size)]
+            for begin, end in ranges
+        ]
+
+    def cut_points(self, rms_list, n_samples):
+        """
+        根据预先计算的 RMS 包络求切片范围，不需要音频数据（用于缓存的包络和切割点预览）
+        
+        Args:
+            rms_list: get_rms(samples, self.win_size, self.hop_size) 的结果（一维）
+            n_samples: 音频采样点数
+            
+        Returns:
+            list: [(起始帧, 结束帧), ...]，与 slice() 返回的起止位置一致
+        """
+        if n_samples <= self.min_length:
+            return [(0, int(n_samples))]
+        return [(int(begin * self.hop_size), int(end * self.hop_size)) for begin, end in self._cut_frames(rms_list)]
+
+    def _cut_frames(self, rms_list):
+        """由 RMS 包络计算各切片的 [起始, 结束) RMS 帧号"""
+        tracker = self._new_tracker()
+        sil_tags = tracker.push(rms_list) + tracker.finish()
         total_frames = rms_list.shape[0]
-        if silence_start is not None and total_frames - silence_start >= self.min_interval:
-            silence_end = min(total_frames, silence_start + self.max_sil_kept)
-            pos = rms_list[silence_start : silence_end + 1].argmin() + silence_start
-            sil_tags.append((pos, total_frames + 1))
         # Apply and return slices.
-        ####音频+起始时间+终止时间
         if len(sil_tags) == 0:
-            return [[waveform, 0, int(total_frames * self.hop_size)]]
-        else:
-            chunks = []
-            if sil_tags[0][0] > 0:
-                chunks.append([self._apply_slice(waveform, 0, sil_tags[0][0]), 0, int(sil_tags[0][0] * self.hop_size)])
-            for i in range(len(sil_tags) - 1):
-                chunks.append(
-                    [
-                        self._apply_slice(waveform, sil_tags[i][1], sil_tags[i + 1][0]),
-                        int(sil_tags[i][1] * self.hop_size),
-                        int(sil_tags[i + 1][0] * self.hop_size),
-                    ]
-                )
-            if sil_tags[-1][1] < total_frames:
-                chunks.append(
-                    [
-                        self._apply_slice(waveform, sil_tags[-1][1], total_frames),
-                        int(sil_tags[-1][1] * self.hop_size),
-                        int(total_frames * self.hop_size),
-                    ]
-                )
-            return chunks
+            return [(0, total_frames)]
+        ranges = []
+        if sil_tags[0][0] > 0:
+            ranges.append((0, sil_tags[0][0]))
+        for i in range(len(sil_tags) - 1):
+            ranges.append((sil_tags[i][1], sil_tags[i + 1][0]))
+        if sil_tags[-1][1] < total_frames:
+            ranges.append((sil_tags[-1][1], total_frames))
+        return ranges
+
+    def slice_stream(self, blocks):
+        """
+        流式切片：逐块读取音频，切割点一旦确定就立即产出切片
+        
+        只保留上一个切割点之后的音频和当前静音段的 RMS，峰值内存取决于
+        最长切片和 max_sil_kept，而不是整个文件的长度。切割结果与 slice() 一致。
+        
+        Args:
+            blocks: 音频块的可迭代对象（例如 load_audio_stream 的返回值），
+                每块的形状约定与 slice() 的 waveform 相同
+            
+        Yields:
+            (音频数据, 起始帧, 结束帧)
+        """
+        hop_size = self.hop_size
+        win_size = self.win_size
+        pad = win_size // 2
+        tracker = self._new_tracker()
+        buffer = None  # 从 buffer_start 开始保留的音频
+        buffer_start = 0
+        total = 0  # 已读取的采样点数
+        next_frame = 0  # 下一个待计算 RMS 的帧
+        clip_begin = 0  # 当前切片的起始帧（上一个静音区间的结束帧）
+        has_tags = False
+
+        def frames_rms(end):
+            # 第 t 帧覆盖 [t * hop_size - pad, t * hop_size - pad + win_size)，超出已读范围的部分补零
+            nonlocal next_frame
+            lo = next_frame * hop_size - pad
+            hi = (end - 1) * hop_size - pad + win_size
+            segment_start = max(lo, buffer_start)
+            segment = buffer[..., segment_start - buffer_start : hi - buffer_start]
+            if segment.ndim > 1:
+                segment = segment.mean(axis=0)
+            rms_list = _framed_rms(segment, win_size, hop_size, end - next_frame, offset=segment_start - lo)
+            next_frame = end
+            return rms_list.squeeze(0)
+
+        def take(begin, end):
+            stop = min(total, end * hop_size)
+            chunk = buffer[..., begin * hop_size - buffer_start : stop - buffer_start].copy()
+            return chunk, int(begin * hop_size), int(end * hop_size)
+
+        def emit(sil_tags):
+            nonlocal buffer, buffer_start, clip_begin, has_tags
+            for tag in sil_tags:
+                if has_tags or tag[0] > 0:
+                    yield take(clip_begin, tag[0])
+                clip_begin = tag[1]
+                has_tags = True
+            # 丢弃当前切片起点和待计算 RMS 窗口之前的音频
+            keep = min(clip_begin * hop_size, next_frame * hop_size - pad, total)
+            if keep > buffer_start:
+                buffer = buffer[..., keep - buffer_start :]
+                buffer_start = keep
+
+        for block in blocks:
+            buffer = block if buffer is None else np.concatenate((buffer, block), axis=-1)
+            total += block.shape[-1]
+            # 音频不超过 min_length 时 slice() 不切割，需要先确认长度
+            if total <= self.min_length:
+                continue
+            ready = max((total + pad - win_size) // hop_size + 1, 0)
+            if ready > next_frame:
+                yield from emit(tracker.push(frames_rms(ready)))
+
+        if buffer is None:
+            return
+        if total <= self.min_length:
+            yield buffer, 0, int(total)
+            return
+        total_frames = (total + 2 * pad - win_size) // hop_size + 1
+        sil_tags = tracker.push(frames_rms(total_frames)) if total_frames > next_frame else []
+        yield from emit(sil_tags + tracker.finish())
+        if not has_tags:
+            yield buffer, 0, int(total_frames * hop_size)
+        elif clip_begin < total_frames:
+            yield take(clip_begin, total_frames)
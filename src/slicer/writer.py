@@ -0,0 +1,131 @@
+"""切片写出：后台线程池异步写文件，支持多种输出格式"""
+
+import contextvars
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import soundfile as sf
+from scipy.io import wavfile
+
+from ..utils.tracing import span
+
+# 输出格式 -> 文件扩展名
+AUDIO_FORMATS = {
+    "wav": "wav",
+    "flac": "flac",
+}
+
+DEFAULT_FILENAME_TEMPLATE = "{name}_{start:010d}_{end:010d}"
+
+
+def slice_filename(template, name, start, end, index, audio_format="wav"):
+    """
+    按模板生成切片文件名
+
+    Args:
+        template: 文件名模板（不含扩展名），可用字段：name（源文件名）、stem（不含扩展名的源文件名）、
+            start、end（起止采样点）、index（切片序号）
+        name: 源文件名
+        start: 起始采样点
+        end: 结束采样点
+        index: 切片序号（从 0 开始）
+        audio_format: 输出格式
+
+    Returns:
+        切片文件名
+    """
+    stem = name.rsplit(".", 1)[0] if "." in name else name
+    filename = template.format(name=name, stem=stem, start=start, end=end, index=index)
+    return f"{filename}.{AUDIO_FORMATS[audio_format]}"
+
+
+def write_slice(path, audio, sr, audio_format="wav"):
+    """
+    写出一个切片
+
+    Args:
+        path: 输出路径
+        audio: int16 或 float32 音频数据（float32 只能写出 wav）
+        sr: 采样率
+        audio_format: 输出格式（wav 或 flac）
+    """
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"不支持的输出格式: {audio_format}")
+    # 先写临时文件再改名，中断时不会留下不完整的切片（任务账本据此判断切片是否已写出）
+    tmp_path = f"{path}.part"
+    try:
+        with span("write", file=os.path.basename(path)):
+            if audio_format == "wav":
+                wavfile.write(tmp_path, sr, audio)
+            else:
+                sf.write(tmp_path, audio, sr, format="FLAC", subtype="PCM_16")
+            os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SliceWriter:
+    """
+    有界的后台写出线程池
+
+    切片计算线程调用 submit 后立即返回，由后台线程写文件，使计算与 I/O 重叠；
+    待写出的切片数达到 max_pending 时 submit 会阻塞，避免切片在内存中堆积。
+    """
+
+    def __init__(self, audio_format="wav", max_workers=4, max_pending=32):
+        """
+        Args:
+            audio_format: 输出格式（wav 或 flac）
+            max_workers: 写出线程数
+            max_pending: 最多排队等待写出的切片数
+        """
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"不支持的输出格式: {audio_format}")
+        self.audio_format = audio_format
+        self.errors = []  # [(tag, 输出路径, 错误信息)]
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._lock = threading.Lock()
+
+    def submit(self, path, audio, sr, tag=None):
+        """
+        提交一个切片写出任务
+
+        Args:
+            path: 输出路径
+            audio: int16 或 float32 音频数据
+            sr: 采样率
+            tag: 任务标签（如源文件路径），用于在 errors 中归属失败
+        """
+        self._slots.acquire()
+        try:
+            # 在提交者的上下文中写出，写出耗时记入提交者所在任务的性能追踪
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, write_slice, path, audio, sr, self.audio_format)
+        except Exception:
+            self._slots.release()
+            raise
+
+        def done(future):
+            self._slots.release()
+            exc = future.exception()
+            if exc is not None:
+                error = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+                with self._lock:
+                    self.errors.append((tag, path, error))
+
+        future.add_done_callback(done)
+
+    def close(self):
+        """
+        等待所有写出任务完成
+
+        Returns:
+            list: 写出失败的 [(tag, 输出路径, 错误信息)]
+        """
+        self._executor.shutdown(wait=True)
+        return self.errors
@@ -1,5 +1,35 @@
 """工具函数模块"""
 
-from .audio_utils import load_audio, clean_path
+from .audio_utils import (
+    DECODERS,
+    clean_path,
+    decode_audio,
+    decode_audio_stream,
+    load_audio,
+    load_audio_segment,
+    load_audio_stream,
+    resample_audio,
+)
+from .ledger import LEDGER_NAME, JobLedger, array_digest, file_digest
+from .pipeline import Prefetcher, track_progress
+from .scheduler import Job, JobCancelled, JobScheduler
 
-__all__ = ["load_audio", "clean_path"]
+__all__ = [
+    "DECODERS",
+    "clean_path",
+    "decode_audio",
+    "decode_audio_stream",
+    "load_audio",
+    "load_audio_segment",
+    "load_audio_stream",
+    "resample_audio",
+    "LEDGER_NAME",
+    "JobLedger",
+    "array_digest",
+    "file_digest",
+    "Prefetcher",
+    "track_progress",
+    "Job",
+    "JobCancelled",
+    "JobScheduler",
+]
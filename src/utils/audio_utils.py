@@ -1,8 +1,12 @@
 """音频处理工具函数"""
 
+import math
 import os
+import struct
+
 import numpy as np
 import ffmpeg
+import soundfile as sf
 
 
 def clean_path(path_str: str) -> str:
@@ -21,13 +25,18 @@ def clean_path(path_str: str) -> str:
     return path_str.strip(" '\n\"\u202a")
 
 
-def load_audio(file: str, sr: int) -> np.ndarray:
+# 可选的解码后端：auto 优先使用进程内的 soundfile，无法处理时回退到 ffmpeg 子进程
+DECODERS = ("auto", "soundfile", "ffmpeg")
+
+
+def load_audio(file: str, sr: int, backend: str = "auto") -> np.ndarray:
     """
     加载音频文件并重采样到指定采样率
     
     Args:
         file: 音频文件路径
         sr: 目标采样率
+        backend: 解码后端（auto、soundfile 或 ffmpeg）
         
     Returns:
         音频波形数据（numpy array，float32，单声道）
@@ -35,33 +44,258 @@ def load_audio(file: str, sr: int) -> np.ndarray:
     Raises:
         RuntimeError: 音频加载失败
     """
+    return decode_audio(file, sr, backend)[0]
+
+
+def decode_audio(file: str, sr: int, backend: str = "auto"):
+    """
+    加载音频文件并重采样到指定采样率，同时返回实际使用的解码后端
+    
+    soundfile 能读取的格式（wav/flac/ogg 等，最多双声道）在进程内解码：采样率一致的
+    单声道 32 位浮点 wav 直接内存映射，其余读入后在进程内重采样；其他格式使用 ffmpeg 子进程。
+    
+    Args:
+        file: 音频文件路径
+        sr: 目标采样率
+        backend: 解码后端（auto、soundfile 或 ffmpeg）
+        
+    Returns:
+        tuple: (音频波形数据（float32，单声道）, 后端名称 "soundfile" 或 "ffmpeg")
+        
+    Raises:
+        RuntimeError: 音频加载失败
+    """
+    if backend not in DECODERS:
+        raise ValueError(f"不支持的解码后端: {backend}")
+    file = clean_path(file)  # 防止小白拷路径头尾带了空格和"和回车
+    if os.path.exists(file) is False:
+        raise RuntimeError("You input a wrong audio path that does not exists, please fix it!")
+    if backend != "ffmpeg":
+        try:
+            return _decode_soundfile(file, sr), "soundfile"
+        except Exception as e:
+            if backend == "soundfile":
+                raise RuntimeError(f"音频加载失败（soundfile）: {e}")
+    return _decode_ffmpeg(file, sr), "ffmpeg"
+
+
+def resample_audio(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    进程内多相滤波重采样
+    
+    Args:
+        audio: 音频波形数据（一维）
+        orig_sr: 原采样率
+        target_sr: 目标采样率
+        
+    Returns:
+        重采样后的音频（float32）
+    """
+    if orig_sr == target_sr:
+        return audio
+    # scipy.signal 导入需要约 1 秒（会连带导入 scipy.stats），只在需要重采样时导入
+    from scipy.signal import resample_poly
+
+    g = math.gcd(int(orig_sr), int(target_sr))
+    return resample_poly(audio, int(target_sr) // g, int(orig_sr) // g).astype(np.float32)
+
+
+def _decode_soundfile(file, sr):
+    info = sf.info(file)
+    if info.channels > 2:
+        # 多声道的混音规则交给 ffmpeg
+        raise RuntimeError(f"不支持 {info.channels} 声道")
+    if info.samplerate == sr:
+        audio = _wav_float32_memmap(file)
+        if audio is not None:
+            return audio
+    data, file_sr = sf.read(file, dtype="float32", always_2d=True)
+    if data.shape[1] == 1:
+        audio = np.ascontiguousarray(data[:, 0])
+    else:
+        audio = data.mean(axis=1, dtype=np.float32)
+    return resample_audio(audio, file_sr, sr)
+
+
+def _wav_float32_memmap(file):
+    """单声道 32 位浮点 wav 直接以写时复制方式内存映射，其他格式返回 None"""
+    with open(file, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"data":
+                offset = f.tell()
+                break
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                f.seek(size % 2, 1)
+            else:
+                f.seek(size + size % 2, 1)
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag, channels, _, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    if format_tag != 3 or channels != 1 or bits != 32:
+        return None
+    n_samples = min(size, os.path.getsize(file) - offset) // 4
+    if n_samples <= 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(file, dtype="<f4", mode="c", offset=offset, shape=(n_samples,)).view(np.ndarray)
+
+
+def _decode_ffmpeg(file, sr):
     try:
         # https://github.com/openai/whisper/blob/main/whisper/audio.py#L26
         # This launches a subprocess to decode audio while down-mixing and resampling as necessary.
         # Requires the ffmpeg CLI and `ffmpeg-python` package to be installed.
-        file = clean_path(file)  # 防止小白拷路径头尾带了空格和"和回车
-        if os.path.exists(file) is False:
-            raise RuntimeError("You input a wrong audio path that does not exists, please fix it!")
         out, _ = (
             ffmpeg.input(file, threads=0)
             .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
             .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True)
         )
+    except ffmpeg.Error as e:
+        # 错误信息已在 stderr 中捕获，不需要再启动一次 ffmpeg
+        raise RuntimeError(f"音频加载失败: {e.stderr.decode(errors='ignore').strip()}")
+
+    return np.frombuffer(out, np.float32).flatten()
+
+
+def load_audio_stream(file: str, sr: int, block_size: int = 1 << 20, backend: str = "auto"):
+    """
+    流式加载音频文件，逐块读取 PCM 数据，不在内存中保留整个文件
+    
+    Args:
+        file: 音频文件路径
+        sr: 目标采样率
+        block_size: 每块的采样点数
+        backend: 解码后端（auto、soundfile 或 ffmpeg）
+        
+    Returns:
+        音频波形数据块（numpy array，float32，单声道）的迭代器
+        
+    Raises:
+        RuntimeError: 音频加载失败
+    """
+    return decode_audio_stream(file, sr, block_size, backend)[0]
+
+
+def decode_audio_stream(file: str, sr: int, block_size: int = 1 << 20, backend: str = "auto"):
+    """
+    流式加载音频文件，同时返回实际使用的解码后端
+    
+    soundfile 能读取且采样率一致（不需要重采样）时在进程内逐块读取，否则逐块读取 ffmpeg 管道。
+    
+    Returns:
+        tuple: (音频块迭代器, 后端名称 "soundfile" 或 "ffmpeg")
+        
+    Raises:
+        RuntimeError: 音频加载失败
+    """
+    if backend not in DECODERS:
+        raise ValueError(f"不支持的解码后端: {backend}")
+    file = clean_path(file)
+    if os.path.exists(file) is False:
+        raise RuntimeError("You input a wrong audio path that does not exists, please fix it!")
+    if backend != "ffmpeg":
+        try:
+            info = sf.info(file)
+        except Exception:
+            info = None
+        if info is not None and info.samplerate == sr and info.channels <= 2:
+            return _soundfile_blocks(file, block_size), "soundfile"
+        if backend == "soundfile":
+            raise RuntimeError("音频加载失败（soundfile）: 格式不支持或采样率与目标不一致")
+    return _ffmpeg_blocks(file, sr, block_size), "ffmpeg"
+
+
+def _soundfile_blocks(file, block_size):
+    with sf.SoundFile(file) as f:
+        for block in f.blocks(blocksize=block_size, dtype="float32", always_2d=True):
+            if block.shape[1] == 1:
+                yield np.ascontiguousarray(block[:, 0])
+            else:
+                yield block.mean(axis=1, dtype=np.float32)
+
+
+def _ffmpeg_blocks(file, sr, block_size):
+    process = (
+        ffmpeg.input(file, threads=0)
+        .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
+        .global_args("-loglevel", "error")
+        .run_async(cmd=["ffmpeg", "-nostdin"], pipe_stdout=True, pipe_stderr=True)
+    )
+    try:
+        while True:
+            data = process.stdout.read(block_size * 4)
+            if not data:
+                break
+            # frombuffer 得到的是只读数组，复制一份，下游可以原地修改
+            yield np.frombuffer(data, np.float32).copy()
+        err = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"音频加载失败: {err.decode(errors='ignore').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def load_audio_segment(file: str, sr: int, start: int, end: int) -> np.ndarray:
+    """
+    读取音频文件中 [start, end) 范围的采样点（按目标采样率计）
+    
+    采样率一致且 soundfile 能直接读取（wav/flac 等）时直接 seek 读取，
+    否则调用 ffmpeg 只解码该时间段
+    
+    Args:
+        file: 音频文件路径
+        sr: 目标采样率
+        start: 起始采样点
+        end: 结束采样点
+        
+    Returns:
+        音频波形数据（numpy array，float32，单声道）
+        
+    Raises:
+        RuntimeError: 音频加载失败
+    """
+    file = clean_path(file)
+    if os.path.exists(file) is False:
+        raise RuntimeError("You input a wrong audio path that does not exists, please fix it!")
+    try:
+        with sf.SoundFile(file) as f:
+            if f.samplerate == sr:
+                f.seek(min(start, f.frames))
+                data = f.read(max(end - start, 0), dtype="float32", always_2d=True)
+                return data.mean(axis=1, dtype=np.float32)
     except Exception:
+        pass  # soundfile 不支持的格式交给 ffmpeg
+    try:
         out, _ = (
-            ffmpeg.input(file, threads=0)
+            ffmpeg.input(file, ss=start / sr, t=(end - start) / sr, threads=0)
             .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
-            .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True)
-        )  # Expose the Error
-        raise RuntimeError("音频加载失败")
-
-    return np.frombuffer(out, np.float32).flatten()
+            .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise RuntimeError(f"音频加载失败: {e.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(out, np.float32)[: max(end - start, 0)]
 
 
 def get_audio_duration(file: str) -> float:
     """
     获取音频文件时长（秒）
     
+    wav/flac/ogg 等 soundfile 能识别的格式直接读取文件头，不启动子进程；其他格式回退到 ffprobe
+    
     Args:
         file: 音频文件路径
         
@@ -76,6 +310,13 @@ def get_audio_duration(file: str) -> float:
         if os.path.exists(file) is False:
             raise RuntimeError(f"音频文件不存在: {file}")
         
+        try:
+            info = sf.info(file)
+            if info.samplerate > 0 and info.frames > 0:
+                return info.frames / info.samplerate
+        except Exception:
+            pass  # soundfile 不支持的格式交给 ffprobe
+        
         probe = ffmpeg.probe(file)
         # 优先从format获取时长，如果没有则从streams获取
         if 'format' in probe and 'duration' in probe['format']:
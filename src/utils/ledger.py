@@ -0,0 +1,126 @@
+"""任务账本：记录已完成的切片和识别结果，中断后重新运行时跳过已完成的工作"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+LEDGER_NAME = "ledger.sqlite"
+
+
+def file_digest(path):
+    """计算文件内容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def array_digest(audio):
+    """计算内存中音频数据的 SHA-1"""
+    return hashlib.sha1(np.ascontiguousarray(audio).tobytes()).hexdigest()
+
+
+class JobLedger:
+    """
+    每个输出目录一个的 SQLite 任务账本
+
+    以 (阶段, 任务键) 记录输入内容哈希、处理参数和输出结果。重新运行时只有哈希和参数都一致的
+    任务才视为已完成；输入文件的哈希按 (大小, 修改时间) 缓存，未改动的文件不需要重新读取。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 账本文件路径（通常为 输出目录/ledger.sqlite）
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "stage TEXT, key TEXT, digest TEXT, params TEXT, result TEXT, "
+            "PRIMARY KEY (stage, key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+        )
+        self._conn.commit()
+
+    def digest(self, path):
+        """
+        获取输入文件的内容哈希，文件大小和修改时间未变时直接使用账本中的记录
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            SHA-1 十六进制字符串
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, digest FROM sources WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest),
+            )
+            self._conn.commit()
+        return digest
+
+    def get(self, stage, key, digest, params):
+        """
+        查询已完成的任务
+
+        Args:
+            stage: 阶段名（如 "slice"、"asr"）
+            key: 任务键（如输入文件路径）
+            digest: 输入内容哈希
+            params: 处理参数（可 JSON 序列化）
+
+        Returns:
+            任务结果，未完成或哈希、参数不一致时为 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, params, result FROM jobs WHERE stage = ? AND key = ?", (stage, key)
+            ).fetchone()
+        if row is None or row[0] != digest or row[1] != _dumps(params):
+            return None
+        return json.loads(row[2])
+
+    def put(self, stage, key, digest, params, result):
+        """记录一个已完成的任务（立即提交，中断后不会丢失）"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)",
+                (stage, key, digest, _dumps(params), json.dumps(result, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def forget(self, stage, key):
+        """删除一个任务的记录（如输出写出失败），下次运行时重新处理"""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE stage = ? AND key = ?", (stage, key))
+            self._conn.commit()
+
+    def close(self):
+        """关闭账本"""
+        with self._lock:
+            self._conn.close()
+
+
+def _dumps(params):
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
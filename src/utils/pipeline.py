@@ -0,0 +1,106 @@
+"""流水线：生产者在后台线程中运行，通过有界队列把结果交给消费者"""
+
+import contextvars
+import queue
+import threading
+
+_DONE = object()
+
+
+class Prefetcher:
+    """
+    在后台线程中迭代 iterable，产出的元素放入有界队列，由消费者在当前线程中取出
+
+    队列满时生产者阻塞等待（背压），内存中最多只积压 maxsize 个元素。生产者抛出的异常在消费者
+    取到该位置时重新抛出；消费者提前停止迭代时生产者随之停止。
+
+    用于完整流程：切片（解码、切割）在后台线程进行，ASR 在当前线程识别已切好的切片，两个阶段同时进行。
+    """
+
+    def __init__(self, iterable, maxsize=32):
+        """
+        Args:
+            iterable: 生产者（如 iter_slices 的生成器）
+            maxsize: 队列容量
+        """
+        self.iterable = iterable
+        self.produced = 0
+        self.consumed = 0
+        self.done = False
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """已产出但尚未被消费的元素数"""
+        return self._queue.qsize()
+
+    def __iter__(self):
+        # 生产者在当前上下文的副本中运行，切片阶段的耗时记入当前任务的性能追踪
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(self._produce,), daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                self.consumed += 1
+                yield item
+        finally:
+            self._stop.set()
+            self._thread.join()
+
+    def _produce(self):
+        iterator = iter(self.iterable)
+        try:
+            for item in iterator:
+                self.produced += 1
+                if not self._put(item):
+                    return
+            self.done = True
+            self._put(_DONE)
+        except BaseException as e:
+            self.done = True
+            self._put(_Failure(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def _put(self, item):
+        # 带超时地等待队列空位，消费者停止后不会一直阻塞
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+def track_progress(iterable, on_item, total=None):
+    """
+    逐个产出 iterable 的元素，每个元素处理完（取下一个元素或迭代结束）时调用 on_item(已完成数, 总数)
+
+    on_item 抛出异常（如任务被取消）时迭代在两个元素之间停止。
+
+    Args:
+        iterable: 可迭代对象
+        on_item: 回调，为 None 时不调用
+        total: 元素总数，未知时为 None
+    """
+    done = 0
+    for item in iterable:
+        yield item
+        done += 1
+        if on_item is not None:
+            on_item(done, total)
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
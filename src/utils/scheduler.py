@@ -0,0 +1,295 @@
+"""任务调度：限制同时进行的切片和识别任务数，排队、预计时间和协作式取消
+
+WebUI 中每个用户的每次操作是一个任务。任务在占用资源（切片槽位、识别槽位、模型）前排队，
+资源不足时等待；取消在文件之间生效（切片、识别每处理完一个文件检查一次）。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+MODEL_PREFIX = "model:"
+HISTORY_SIZE = 50
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class Job:
+    """一个任务：记录状态和进度，供排队显示、预计时间和取消使用"""
+
+    def __init__(self, job_id, kind, label="", owner=None):
+        """
+        Args:
+            job_id: 任务编号
+            kind: 任务类型（如 "切片"、"识别"、"完整流程"），同类任务的历史耗时用于估计排队时间
+            label: 显示用的说明（如输入路径）
+            owner: 任务所属的会话，用于取消某个用户自己的任务
+        """
+        self.id = job_id
+        self.kind = kind
+        self.label = label
+        self.owner = owner
+        self.state = "queued"
+        self.stage = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = 0
+        self.total = None
+        self._stage_started = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """请求取消：排队中的任务立即退出，进行中的任务在处理完当前文件后停止"""
+        self._cancel.set()
+
+    def check(self):
+        """已请求取消时抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled(f"任务 {self.id} 已取消")
+
+    def update(self, done, total=None):
+        """
+        更新当前阶段的进度并检查取消，可以直接作为 slice_audio、识别等的 on_file 回调
+
+        Args:
+            done: 已完成的文件数
+            total: 文件总数，未知时为 None
+        """
+        self.done = done
+        self.total = total
+        self.check()
+
+    def eta(self):
+        """当前阶段的预计剩余秒数（按已完成文件的平均耗时估计），无法估计时为 None"""
+        if self.state != "running" or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self._stage_started
+        return elapsed / self.done * max(self.total - self.done, 0)
+
+    def _enter_stage(self, stage):
+        now = time.time()
+        if self.started_at is None:
+            self.started_at = now
+        self.state = "running"
+        self.stage = stage
+        self.done = 0
+        self.total = None
+        self._stage_started = now
+
+
+class JobScheduler:
+    """
+    按资源槽位调度任务
+
+    资源为 "slice"、"asr" 等槽位和 "model:<模型名>"（每个模型的并发上限）。任务在某个阶段一次性占用
+    所需的全部资源；排队按提交顺序，但只有在前面没有争用同一资源的任务时才能越过前面的任务，
+    所以切片任务不会被排在识别任务后面，前面的任务也不会一直被后来的任务插队。
+    """
+
+    def __init__(self, slots, model_limits=None):
+        """
+        Args:
+            slots: 各槽位同时进行的任务数，如 {"slice": 2, "asr": 1}；小于等于 0 表示不限制
+            model_limits: 每个模型同时进行的识别任务数，如 {"large-v3": 1}；未列出的模型不单独限制
+        """
+        self.slots = {name: int(limit) for name, limit in slots.items()}
+        self.model_limits = {name: int(limit) for name, limit in (model_limits or {}).items()}
+        self._cond = threading.Condition()
+        self._in_use = {}
+        self._waiting = []
+        self._running = []
+        self._jobs = []
+        self._durations = {}
+        self._next_id = 1
+
+    def submit(self, kind, label="", owner=None):
+        """
+        创建任务（此时还不占用资源，由 slot 排队占用）
+
+        Returns:
+            Job
+        """
+        with self._cond:
+            job = Job(self._next_id, kind, label, owner)
+            self._next_id += 1
+            self._jobs.append(job)
+            return job
+
+    @contextmanager
+    def slot(self, job, resources, stage=None, on_wait=None):
+        """
+        在任务的一个阶段占用资源，资源不足时排队等待
+
+        Args:
+            job: 任务
+            resources: 所需资源，如 ["slice"] 或 ["asr", "model:large-v3"]
+            stage: 阶段名，显示在任务列表中
+            on_wait: 排队时每秒调用一次 on_wait(前面的任务数, 预计等待秒数或 None)
+
+        Raises:
+            JobCancelled: 排队时任务被取消
+        """
+        entry = (job, tuple(resources))
+        with self._cond:
+            job.state = "queued"
+            self._waiting.append(entry)
+        try:
+            while True:
+                with self._cond:
+                    job.check()
+                    if self._admissible(entry):
+                        self._waiting.remove(entry)
+                        for resource in entry[1]:
+                            self._in_use[resource] = self._in_use.get(resource, 0) + 1
+                        self._running.append(entry)
+                        job._enter_stage(stage)
+                        break
+                    ahead, wait = self._estimate(entry)
+                if on_wait is not None:
+                    on_wait(ahead, wait)
+                with self._cond:
+                    self._cond.wait(timeout=1.0)
+        except BaseException:
+            with self._cond:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    self._cond.notify_all()
+            raise
+        try:
+            yield job
+        finally:
+            with self._cond:
+                self._running.remove(entry)
+                for resource in entry[1]:
+                    self._in_use[resource] -= 1
+                job.state = "queued"
+                self._cond.notify_all()
+
+    def finish(self, job, state="finished"):
+        """
+        结束任务，记录耗时用于估计之后同类任务的排队时间
+
+        Args:
+            job: 任务
+            state: 结束状态（finished、cancelled 或 failed）
+        """
+        with self._cond:
+            job.state = state
+            job.finished_at = time.time()
+            if state == "finished" and job.started_at is not None:
+                history = self._durations.setdefault(job.kind, [])
+                history.append(job.finished_at - job.started_at)
+                del history[:-HISTORY_SIZE]
+            # 只保留最近结束的任务
+            finished = [item for item in self._jobs if item.finished_at is not None]
+            for item in finished[:-HISTORY_SIZE]:
+                self._jobs.remove(item)
+            self._cond.notify_all()
+
+    def cancel(self, owner=None, job_id=None):
+        """
+        取消任务
+
+        Args:
+            owner: 只取消该会话的任务，None 表示不限
+            job_id: 只取消该编号的任务，None 表示不限
+
+        Returns:
+            取消的任务数
+        """
+        with self._cond:
+            jobs = [
+                job
+                for job in self._jobs
+                if job.finished_at is None
+                and not job.cancelled
+                and (owner is None or job.owner == owner)
+                and (job_id is None or job.id == job_id)
+            ]
+            for job in jobs:
+                job.cancel()
+            self._cond.notify_all()
+        return len(jobs)
+
+    def jobs(self):
+        """
+        列出任务（包括最近结束的任务）
+
+        Returns:
+            list[dict]: 编号、类型、说明、所属会话、状态、阶段、进度、排队位置和预计时间
+        """
+        with self._cond:
+            items = []
+            for job in self._jobs:
+                item = {
+                    "id": job.id,
+                    "kind": job.kind,
+                    "label": job.label,
+                    "owner": job.owner,
+                    "state": job.state,
+                    "stage": job.stage,
+                    "done": job.done,
+                    "total": job.total,
+                    "cancelled": job.cancelled,
+                    "position": None,
+                    "eta": None,
+                }
+                entry = next((entry for entry in self._waiting if entry[0] is job), None)
+                if entry is not None and job.finished_at is None:
+                    item["position"], item["eta"] = self._estimate(entry)
+                elif job.state == "running":
+                    item["eta"] = job.eta()
+                items.append(item)
+            return items
+
+    def _limit(self, resource):
+        if resource.startswith(MODEL_PREFIX):
+            return self.model_limits.get(resource[len(MODEL_PREFIX) :], 0)
+        return self.slots.get(resource, 0)
+
+    def _admissible(self, entry):
+        """资源都有空位，且前面没有排队等待同一资源的任务"""
+        resources = set(entry[1])
+        for ahead in self._waiting[: self._waiting.index(entry)]:
+            if resources & set(ahead[1]):
+                return False
+        return all(
+            self._limit(resource) <= 0 or self._in_use.get(resource, 0) < self._limit(resource)
+            for resource in resources
+        )
+
+    def _estimate(self, entry):
+        """
+        估计排队情况
+
+        Returns:
+            (前面争用同一资源的任务数, 预计等待秒数)；没有可用的历史耗时时预计等待为 None
+        """
+        resources = set(entry[1])
+        ahead = [item for item in self._waiting[: self._waiting.index(entry)] if resources & set(item[1])]
+        running = [item for item in self._running if resources & set(item[1])]
+        remaining = []
+        for job, _ in running:
+            eta = job.eta()
+            if eta is None:
+                average = self._average(job.kind)
+                eta = None if average is None else max(average - (time.time() - job.started_at), 0.0)
+            remaining.append(eta)
+        remaining += [self._average(job.kind) for job, _ in ahead]
+        if any(seconds is None for seconds in remaining):
+            return len(ahead), None
+        # 同时进行的任务数受最紧张的资源限制
+        limits = [self._limit(resource) for resource in resources if self._limit(resource) > 0]
+        parallel = min(limits) if limits else 1
+        return len(ahead), sum(remaining) / parallel
+
+    def _average(self, kind):
+        history = self._durations.get(kind)
+        return sum(history) / len(history) if history else None
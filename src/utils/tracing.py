@@ -0,0 +1,204 @@
+"""性能追踪：记录切片和识别各阶段的耗时，输出 Chrome Trace（Perfetto 可打开）和汇总表
+
+未开始追踪时 span 不做任何记录，开销可以忽略。
+
+当前追踪保存在上下文变量中，WebUI 中同时运行的任务（各自的线程）各写各的追踪文件；
+后台线程需在提交任务时的上下文中运行（contextvars.copy_context），子进程通过 attach 加入追踪。
+"""
+
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+_current = contextvars.ContextVar("tracer", default=None)
+
+
+class _Tracer:
+    """一次追踪的事件记录器；子进程中的事件追加到 <追踪文件>.<pid>.events，结束时合并"""
+
+    def __init__(self, path, owner=True):
+        self.path = os.path.abspath(path)
+        self.pid = os.getpid() if owner else None
+        self.events = []
+        self._lock = threading.Lock()
+        self._child_file = None
+
+    def record(self, event):
+        if os.getpid() == self.pid:
+            with self._lock:
+                self.events.append(event)
+            return
+        with self._lock:
+            if self._child_file is None:
+                self._child_file = open(f"{self.path}.{os.getpid()}.events", "a", encoding="utf-8")
+            self._child_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._child_file.flush()
+
+
+def start_trace(path):
+    """
+    在当前上下文中开始追踪（同一上下文同时只有一个追踪，其他线程中的任务不受影响）
+
+    Args:
+        path: 追踪文件路径（.json）
+    """
+    tracer = _current.get()
+    if tracer is not None:
+        raise RuntimeError(f"已在追踪: {tracer.path}")
+    tracer = _Tracer(path)
+    os.makedirs(os.path.dirname(tracer.path), exist_ok=True)
+    _current.set(tracer)
+
+
+def attach(path):
+    """
+    在子进程中加入父进程的追踪，事件写入单独的文件，由父进程结束追踪时合并
+
+    Args:
+        path: 父进程的追踪文件路径（trace_path() 的返回值），为 None 时不追踪
+    """
+    _current.set(_Tracer(path, owner=False) if path is not None else None)
+
+
+def trace_path():
+    """当前上下文的追踪文件路径，未追踪时为 None（用于传给子进程）"""
+    tracer = _current.get()
+    return tracer.path if tracer is not None else None
+
+
+def stop_trace():
+    """
+    结束当前上下文中的追踪：合并子进程的事件，写出 Chrome Trace 文件和汇总表
+
+    Returns:
+        汇总表文本，未在追踪时为 None
+    """
+    tracer = _current.get()
+    if tracer is None:
+        return None
+    _current.set(None)
+    events = list(tracer.events)
+    for part in glob.glob(f"{glob.escape(tracer.path)}.*.events"):
+        with open(part, "r", encoding="utf-8") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+        os.remove(part)
+    events.sort(key=lambda event: event["ts"])
+
+    threads = {}
+    for event in events:
+        threads[(event["pid"], event["tid"])] = event.pop("thread")
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for (pid, tid), name in threads.items()
+    ]
+
+    with open(tracer.path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    summary = summarize(events)
+    with open(os.path.splitext(tracer.path)[0] + ".summary.txt", "w", encoding="utf-8") as f:
+        f.write(summary + "\n")
+    print(f"{summary}\n性能追踪已写出: {tracer.path}（可用 https://ui.perfetto.dev 或 chrome://tracing 打开）\n")
+    return summary
+
+
+@contextmanager
+def span(name, **args):
+    """
+    记录一个阶段的耗时
+
+    Args:
+        name: 阶段名（如 "decode"、"get_rms"、"whisper_transcribe"）
+        args: 附加信息（如文件名），阶段内可以向产出的字典中继续添加，
+            其中 audio_seconds 用于在汇总表中计算实时率
+
+    Yields:
+        dict: 附加信息
+    """
+    tracer = _current.get()
+    if tracer is None:
+        yield args
+        return
+    ts = time.time_ns() // 1000
+    started = time.perf_counter_ns()
+    try:
+        yield args
+    finally:
+        tracer.record(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": ts,
+                "dur": (time.perf_counter_ns() - started) // 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "thread": threading.current_thread().name,
+                "args": {key: _jsonable(value) for key, value in args.items()},
+            }
+        )
+
+
+@contextmanager
+def traced(path, name, **args):
+    """
+    记录一个任务：给出追踪文件路径且当前上下文没有在追踪时开始一次新的追踪，任务结束时写出；
+    已在追踪（如完整流程中的切片和识别）时只作为其中的一个阶段
+
+    Args:
+        path: 追踪文件路径，为 None 时不开始新的追踪
+        name: 任务名
+        args: 附加信息，见 span
+
+    Yields:
+        dict: 附加信息
+    """
+    owner = path is not None and _current.get() is None
+    if owner:
+        start_trace(path)
+    try:
+        with span(name, **args) as info:
+            yield info
+    finally:
+        if owner:
+            stop_trace()
+
+
+def summarize(events):
+    """
+    按阶段汇总耗时
+
+    Returns:
+        汇总表文本：各阶段的次数、总耗时、平均/P50/P95/最大耗时；带 audio_seconds 的任务另列实时率
+    """
+    stages = {}
+    for event in events:
+        stages.setdefault(event["name"], []).append(event["dur"] / 1000)
+    lines = [f"{'阶段':<24}{'次数':>8}{'总计(s)':>12}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'最大(ms)':>12}"]
+    for name, durations in sorted(stages.items(), key=lambda item: -sum(item[1])):
+        durations = np.asarray(durations)
+        lines.append(
+            f"{name:<24}{len(durations):>8}{durations.sum() / 1000:>12.2f}{durations.mean():>12.1f}"
+            f"{np.percentile(durations, 50):>12.1f}{np.percentile(durations, 95):>12.1f}{durations.max():>12.1f}"
+        )
+    for event in events:
+        audio_seconds = event["args"].get("audio_seconds")
+        if audio_seconds:
+            elapsed = event["dur"] / 1e6
+            lines.append(
+                f"{event['name']}：音频 {audio_seconds:.1f} 秒，耗时 {elapsed:.1f} 秒，RTF {elapsed / audio_seconds:.3f}"
+            )
+    return "\n".join(lines)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
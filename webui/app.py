@@ -2,7 +2,10 @@
 
 import os
 import sys
+import threading
+import time
 import yaml
+from contextlib import contextmanager
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -13,8 +16,23 @@ import gradio as gr
 import numpy as np
 from tqdm import tqdm
 
-from src.asr import asr_dict, fasterwhisper_asr, funasr_asr
-from src.slicer import slice_audio
+from src.asr import (
+    asr_dict,
+    fasterwhisper_asr,
+    fasterwhisper_asr_on_slices,
+    funasr_asr,
+    funasr_asr_on_slices,
+    load_fasterwhisper_model,
+    load_funasr_model,
+    model_registry,
+)
+from src.asr.output import failed_list_path
+from src.slicer import iter_slices, preview_slices, slice_audio
+from src.slicer.profiles import DEFAULT_PROFILE, OUTPUT_PROFILES
+from src.slicer.writer import AUDIO_FORMATS, DEFAULT_FILENAME_TEMPLATE
+from src.utils import JobCancelled, JobScheduler, Prefetcher, track_progress
+from src.utils.scheduler import MODEL_PREFIX
+from src.utils.tracing import traced
 
 
 # 加载配置
@@ -38,19 +56,119 @@ DEFAULT_SLICE_PARAMS = config.get("slicer", {
     "max_sil_kept": 500,
     "max": 0.9,
     "alpha": 0.25,
+    "streaming": False,
+    "vectorized": True,
+    "workers": 1,
+    "write_audio": True,
+    "envelope_cache": False,
+    "cache_max_mb": 512,
+    "audio_format": "wav",
+    "filename_template": DEFAULT_FILENAME_TEMPLATE,
+    "writer_threads": 4,
+    "decoder": "auto",
+    "profile": DEFAULT_PROFILE,
+    "resume": False,
 })
 
 DEFAULT_ASR_CONFIG = config.get("asr", {
     "default_model": "Faster Whisper (多语种)",
     "default_language": "auto",
-    "default_precision": "float16",
+    "default_precision": "auto",
     "default_model_size": "large-v3",
     "default_output_mode": ["list"],
+    "in_memory_pipeline": False,
+    "pipeline_queue_size": 32,
+    "resume": False,
+    "batch_size": 0,
+    "max_resident_models": 2,
+    "model_memory_budget_mb": 0,
+    "warmup": False,
+    "offline": False,
+    "replicas": 1,
+    "cpu_threads": 0,
 })
 
 OUTPUT_DIR = config.get("paths", {}).get("output_dir", "output")
 SLICE_OUTPUT = config.get("paths", {}).get("slice_output", "output/slicer_opt")
 ASR_OUTPUT = config.get("paths", {}).get("asr_output", "output/asr_opt")
+ENVELOPE_CACHE = config.get("paths", {}).get("envelope_cache", "output/envelope_cache")
+# 切片时只在开启 slicer.envelope_cache 时使用包络缓存（切割点预览始终使用）
+SLICE_CACHE = ENVELOPE_CACHE if DEFAULT_SLICE_PARAMS.get("envelope_cache", False) else None
+TRACING = config.get("tracing", {"enabled": False, "output_dir": "output/traces"})
+SCHEDULER_CONFIG = config.get("scheduler", {
+    "slice_slots": 2,
+    "asr_slots": 1,
+    "model_limits": {},
+    "max_jobs": 16,
+})
+
+# 切片和识别任务在各自的槽位中排队，识别任务还受每个模型的并发上限限制
+scheduler = JobScheduler(
+    {"slice": SCHEDULER_CONFIG.get("slice_slots", 2), "asr": SCHEDULER_CONFIG.get("asr_slots", 1)},
+    SCHEDULER_CONFIG.get("model_limits") or {},
+)
+JOB_STATES = {"queued": "排队中", "running": "进行中", "finished": "已完成", "cancelled": "已取消", "failed": "失败"}
+
+
+def _trace_path(job):
+    """开启性能追踪时返回本次任务的追踪文件路径，未开启时为 None"""
+    if not TRACING.get("enabled", False):
+        return None
+    return os.path.join(TRACING.get("output_dir", "output/traces"), f"{job}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+
+def _owner(request):
+    """任务所属的会话（同一浏览器页面），用于取消自己的任务"""
+    return getattr(request, "session_hash", None)
+
+
+@contextmanager
+def _scheduled_job(kind, label, request, job=None):
+    """
+    创建任务，结束时按结果记录状态；完整流程中的切片和识别沿用完整流程的任务
+
+    Yields:
+        Job
+    """
+    if job is not None:
+        yield job
+        return
+    job = scheduler.submit(kind, label, _owner(request))
+    state = "failed"
+    try:
+        yield job
+        state = "finished"
+    finally:
+        scheduler.finish(job, "cancelled" if job.cancelled else state)
+
+
+def _asr_resources(asr_model, model_size):
+    """识别任务占用的资源：识别槽位和所用的模型"""
+    model = "funasr" if asr_model == "达摩 ASR (中文)" else model_size
+    return ["asr", f"{MODEL_PREFIX}{model}"]
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "未知"
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def _wait_progress(progress, value=0.0):
+    """排队时在进度条中显示前面的任务数和预计等待时间"""
+    def on_wait(ahead, wait):
+        progress(value, desc=f"排队中：前面还有 {ahead} 个任务，预计等待 {_format_seconds(wait)}")
+    return on_wait
+
+
+def _file_progress(job, progress, desc):
+    """每处理完一个文件更新进度条（含预计剩余时间），并在文件之间响应取消"""
+    def on_file(done, total):
+        job.update(done, total)
+        if total:
+            progress(done / total, desc=f"{desc} {done}/{total}，预计剩余 {_format_seconds(job.eta())}")
+    return on_file
 
 
 def process_slice(
@@ -63,9 +181,17 @@ def process_slice(
     max_sil_kept,
     max_val,
     alpha,
+    workers=1,
+    write_audio=True,
+    audio_format="wav",
+    filename_template=DEFAULT_FILENAME_TEMPLATE,
+    profile=DEFAULT_PROFILE,
+    resume=False,
     progress=gr.Progress(),
+    request: gr.Request = None,
+    job=None,
 ):
-    """处理音频切片"""
+    """处理音频切片（在切片槽位中排队；job 为完整流程的任务）"""
     try:
         if not input_path:
             return "错误：请选择输入文件或文件夹", None
@@ -75,30 +201,216 @@ def process_slice(
         
         os.makedirs(output_dir, exist_ok=True)
         
-        progress(0, desc="开始切片...")
+        with _scheduled_job("切片", input_path, request, job) as job:
+            with scheduler.slot(job, ["slice"], stage="切片", on_wait=_wait_progress(progress)):
+                progress(0, desc="开始切片...")
+                
+                result = slice_audio(
+                    inp=input_path,
+                    opt_root=output_dir,
+                    threshold=threshold,
+                    min_length=min_length,
+                    min_interval=min_interval,
+                    hop_size=hop_size,
+                    max_sil_kept=max_sil_kept,
+                    _max=max_val,
+                    alpha=alpha,
+                    i_part=0,
+                    all_part=1,
+                    streaming=DEFAULT_SLICE_PARAMS.get("streaming", False),
+                    vectorized=DEFAULT_SLICE_PARAMS.get("vectorized", True),
+                    workers=workers,
+                    write_audio=write_audio,
+                    cache_dir=SLICE_CACHE,
+                    cache_max_mb=DEFAULT_SLICE_PARAMS.get("cache_max_mb", 512),
+                    audio_format=audio_format,
+                    filename_template=filename_template or DEFAULT_FILENAME_TEMPLATE,
+                    writer_threads=DEFAULT_SLICE_PARAMS.get("writer_threads", 4),
+                    decoder=DEFAULT_SLICE_PARAMS.get("decoder", "auto"),
+                    profile=profile,
+                    resume=resume,
+                    trace_path=_trace_path("slice"),
+                    on_file=_file_progress(job, progress, "切片"),
+                )
+        
+        progress(1.0, desc="切片完成")
+        
+        if not write_audio:
+            return f"切片清单已生成（未写出音频）\n输出目录：{output_dir}\n{result}", output_dir
+        
+        # 统计切片文件数量
+        slice_count = len([f for f in os.listdir(output_dir) if f.endswith(f".{AUDIO_FORMATS[audio_format]}")])
+        
+        return f"切片完成！共生成 {slice_count} 个音频片段\n输出目录：{output_dir}\n{result}", output_dir
+    except JobCancelled:
+        return "切片已取消（已切完的切片保留在输出目录，开启断点续切后重新运行即可继续）", None
+    except Exception as e:
+        return f"切片失败：{str(e)}", None
+
+
+def process_preview(
+    input_path,
+    threshold,
+    min_length,
+    min_interval,
+    hop_size,
+    max_sil_kept,
+):
+    """预览切割点（使用包络缓存，不写出音频）"""
+    try:
+        if not input_path:
+            return "错误：请选择输入文件或文件夹"
         
-        result = slice_audio(
+        profile = DEFAULT_SLICE_PARAMS.get("profile", DEFAULT_PROFILE)
+        sr = OUTPUT_PROFILES[profile]["sr"]
+        cut_points = preview_slices(
             inp=input_path,
-            opt_root=output_dir,
             threshold=threshold,
             min_length=min_length,
             min_interval=min_interval,
             hop_size=hop_size,
             max_sil_kept=max_sil_kept,
-            _max=max_val,
-            alpha=alpha,
-            i_part=0,
-            all_part=1,
+            cache_dir=ENVELOPE_CACHE,
+            cache_max_mb=DEFAULT_SLICE_PARAMS.get("cache_max_mb", 512),
+            decoder=DEFAULT_SLICE_PARAMS.get("decoder", "auto"),
+            profile=profile,
         )
+        if not cut_points:
+            return "没有可预览的音频文件"
         
-        progress(1.0, desc="切片完成")
+        total = sum(len(ranges) for ranges in cut_points.values())
+        result_text = f"共 {len(cut_points)} 个文件，将切分为 {total} 个片段\n"
+        for inp_path, ranges in cut_points.items():
+            result_text += f"\n{os.path.basename(inp_path)}：{len(ranges)} 个片段\n"
+            for start, end in ranges[:20]:
+                result_text += f"  {start / sr:.2f}s - {end / sr:.2f}s（{(end - start) / sr:.2f}s）\n"
+            if len(ranges) > 20:
+                result_text += f"  ... 还有 {len(ranges) - 20} 个片段\n"
+        return result_text
+    except Exception as e:
+        return f"预览失败：{str(e)}"
+
+
+def _format_asr_result(result_path, output_dir, output_name, output_mode):
+    """根据 ASR 输出文件生成结果预览文本，返回 (结果文本, list 文件路径)"""
+    # 读取结果文件（如果生成了list文件）
+    result_text = "识别完成！"
+    if result_path and os.path.exists(result_path):
+        with open(result_path, "r", encoding="utf-8") as f:
+            results = f.read().strip().split("\n")
         
-        # 统计切片文件数量
-        slice_count = len([f for f in os.listdir(output_dir) if f.endswith('.wav')])
+        result_text = f"识别完成！共识别 {len(results)} 个文件\n\n结果预览（前10条）：\n\n"
+        for i, line in enumerate(results[:10]):
+            parts = line.split("|")
+            if len(parts) >= 4:
+                result_text += f"{i+1}. {parts[3]}\n"
+        if len(results) > 10:
+            result_text += f"\n... 还有 {len(results) - 10} 条结果\n"
+        
+        if "txt" in output_mode:
+            result_text += "\n已生成txt文件到音频同目录"
+        if "jsonl" in output_mode:
+            jsonl_file_path = os.path.join(output_dir, f"{output_name}.jsonl")
+            if os.path.exists(jsonl_file_path):
+                result_text += f"\n已生成jsonl文件: {jsonl_file_path}"
+        
+        return result_text + _failed_note(output_dir, output_name), result_path
+    else:
+        output_parts = []
+        if "txt" in output_mode:
+            output_parts.append("已生成txt文件到音频同目录")
+        if "jsonl" in output_mode:
+            jsonl_file_path = os.path.join(output_dir, f"{output_name}.jsonl")
+            if os.path.exists(jsonl_file_path):
+                output_parts.append(f"已生成jsonl文件: {jsonl_file_path}")
         
-        return f"切片完成！共生成 {slice_count} 个音频片段\n输出目录：{output_dir}", output_dir
+        if output_parts:
+            result_text = "识别完成！" + "；".join(output_parts)
+        else:
+            result_text = "识别完成，但结果文件未找到"
+        return result_text + _failed_note(output_dir, output_name), None
+
+
+def _failed_note(output_dir, output_name):
+    """识别失败的切片数和清单路径（没有失败时为空）"""
+    path = failed_list_path(output_dir, output_name)
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        count = sum(1 for line in f if line.strip())
+    return f"\n\n注意：{count} 个切片识别失败，未写入结果，清单见 {path}（开启断点续跑后重新运行会重新识别这些切片）"
+
+
+def list_resident_models():
+    """列出模型注册表中常驻的 ASR 模型"""
+    models = model_registry.list()
+    if not models:
+        return "当前没有常驻模型"
+    lines = []
+    for item in reversed(models):
+        last_used = time.strftime("%H:%M:%S", time.localtime(item["last_used"]))
+        lines.append(
+            f"{item['engine']} / {item['model_size']} / {item['precision']} / {item['device']}"
+            f"：约 {item['size_mb']:.0f} MB，最近使用 {last_used}"
+        )
+    total_mb = sum(item["size_mb"] for item in models)
+    lines.append(f"\n共 {len(models)} 个模型，约 {total_mb:.0f} MB")
+    return "\n".join(lines)
+
+
+def unload_resident_models():
+    """卸载全部常驻模型"""
+    count = model_registry.unload()
+    return f"已卸载 {count} 个模型\n\n{list_resident_models()}"
+
+
+def list_jobs(request: gr.Request = None):
+    """列出任务队列：进行中、排队中和最近结束的任务"""
+    jobs = scheduler.jobs()
+    if not jobs:
+        return "当前没有任务"
+    owner = _owner(request)
+    lines = []
+    for item in reversed(jobs):
+        state = JOB_STATES[item["state"]]
+        if item["cancelled"] and item["state"] in ("queued", "running"):
+            state = "取消中"
+        line = f"#{item['id']} {item['kind']}｜{state}"
+        if item["position"] is not None:
+            line += f"，前面还有 {item['position']} 个任务，预计等待 {_format_seconds(item['eta'])}"
+        elif item["state"] == "running":
+            progress = f" {item['done']}/{item['total']}" if item["total"] else ""
+            line += f"，{item['stage']}{progress}，预计剩余 {_format_seconds(item['eta'])}"
+        if owner is not None and item["owner"] == owner:
+            line += "（本页面）"
+        lines.append(f"{line}\n    {item['label']}")
+    return "\n".join(lines)
+
+
+def cancel_my_jobs(request: gr.Request = None):
+    """取消本页面提交的任务：排队中的任务立即退出，进行中的任务在处理完当前文件后停止"""
+    owner = _owner(request)
+    if owner is None:
+        # 无法确定页面时不取消，避免取消其他用户的任务
+        return f"无法确定当前页面，未取消任务\n\n{list_jobs(request)}"
+    count = scheduler.cancel(owner=owner)
+    return f"已请求取消 {count} 个任务\n\n{list_jobs(request)}"
+
+
+def warmup_default_model():
+    """预加载配置中的默认 ASR 模型，第一次识别时不再等待模型加载"""
+    try:
+        if DEFAULT_ASR_CONFIG["default_model"] == "达摩 ASR (中文)":
+            load_funasr_model("zh")
+        else:
+            load_fasterwhisper_model(
+                DEFAULT_ASR_CONFIG["default_model_size"],
+                DEFAULT_ASR_CONFIG["default_precision"],
+                offline=DEFAULT_ASR_CONFIG.get("offline", False),
+                cpu_threads=DEFAULT_ASR_CONFIG.get("cpu_threads", 0),
+            )
     except Exception as e:
-        return f"切片失败：{str(e)}", None
+        print(f"预加载模型失败：{e}")
 
 
 def process_asr(
@@ -109,9 +421,14 @@ def process_asr(
     model_size,
     precision,
     output_mode,
+    resume=False,
+    batch_size=0,
+    replicas=1,
     progress=gr.Progress(),
+    request: gr.Request = None,
+    job=None,
 ):
-    """处理 ASR 识别"""
+    """处理 ASR 识别（在识别槽位中排队，同一模型的并发数受 scheduler.model_limits 限制；job 为完整流程的任务）"""
     try:
         if not input_folder:
             return "错误：请选择输入文件夹", None
@@ -121,73 +438,55 @@ def process_asr(
         
         os.makedirs(output_dir, exist_ok=True)
         
-        progress(0, desc="开始识别...")
-        
-        if asr_model == "达摩 ASR (中文)":
-            # 达摩模型只支持中文，强制设置为 zh
-            language = "zh"
-            result_path = funasr_asr(
-                input_folder=input_folder,
-                output_folder=output_dir,
-                model_size="large",
-                language=language,
-                output_mode=output_mode,
-            )
-        else:  # Faster Whisper
-            result_path = fasterwhisper_asr(
-                input_folder=input_folder,
-                output_folder=output_dir,
-                model_size=model_size,
-                language=language,
-                precision=precision,
-                output_mode=output_mode,
-            )
+        with _scheduled_job("识别", input_folder, request, job) as job:
+            resources = _asr_resources(asr_model, model_size)
+            with scheduler.slot(job, resources, stage="识别", on_wait=_wait_progress(progress)):
+                progress(0, desc="开始识别...")
+                on_file = _file_progress(job, progress, "识别")
+                
+                if asr_model == "达摩 ASR (中文)":
+                    # 达摩模型只支持中文，强制设置为 zh
+                    language = "zh"
+                    result_path = funasr_asr(
+                        input_folder=input_folder,
+                        output_folder=output_dir,
+                        model_size="large",
+                        language=language,
+                        output_mode=output_mode,
+                        resume=resume,
+                        trace_path=_trace_path("asr"),
+                        batch_size=int(batch_size),
+                        on_file=on_file,
+                    )
+                else:  # Faster Whisper
+                    result_path = fasterwhisper_asr(
+                        input_folder=input_folder,
+                        output_folder=output_dir,
+                        model_size=model_size,
+                        language=language,
+                        precision=precision,
+                        output_mode=output_mode,
+                        resume=resume,
+                        trace_path=_trace_path("asr"),
+                        batch_size=int(batch_size),
+                        offline=DEFAULT_ASR_CONFIG.get("offline", False),
+                        replicas=int(replicas),
+                        cpu_threads=DEFAULT_ASR_CONFIG.get("cpu_threads", 0),
+                        on_file=on_file,
+                    )
         
         progress(1.0, desc="识别完成")
         
-        # 读取结果文件（如果生成了list文件）
-        result_text = "识别完成！"
-        if result_path and os.path.exists(result_path):
-            with open(result_path, "r", encoding="utf-8") as f:
-                results = f.read().strip().split("\n")
-            
-            result_text = f"识别完成！共识别 {len(results)} 个文件\n\n结果预览（前10条）：\n\n"
-            for i, line in enumerate(results[:10]):
-                parts = line.split("|")
-                if len(parts) >= 4:
-                    result_text += f"{i+1}. {parts[3]}\n"
-            if len(results) > 10:
-                result_text += f"\n... 还有 {len(results) - 10} 条结果\n"
-            
-            if "txt" in output_mode:
-                result_text += "\n已生成txt文件到音频同目录"
-            if "jsonl" in output_mode:
-                jsonl_file_path = os.path.join(output_dir, f"{os.path.basename(input_folder)}.jsonl")
-                if os.path.exists(jsonl_file_path):
-                    result_text += f"\n已生成jsonl文件: {jsonl_file_path}"
-            
-            return result_text, result_path
-        else:
-            output_parts = []
-            if "txt" in output_mode:
-                output_parts.append("已生成txt文件到音频同目录")
-            if "jsonl" in output_mode:
-                jsonl_file_path = os.path.join(output_dir, f"{os.path.basename(input_folder)}.jsonl")
-                if os.path.exists(jsonl_file_path):
-                    output_parts.append(f"已生成jsonl文件: {jsonl_file_path}")
-            
-            if output_parts:
-                result_text = "识别完成！" + "；".join(output_parts)
-            else:
-                result_text = "识别完成，但结果文件未找到"
-            return result_text, None
-            
+        return _format_asr_result(result_path, output_dir, os.path.basename(input_folder), output_mode)
+    
+    except JobCancelled:
+        return "识别已取消（开启断点续跑时已识别的切片记在任务账本中，重新运行即可继续）", None
     except Exception as e:
         import traceback
         return f"识别失败：{str(e)}\n{traceback.format_exc()}", None
 
 
-def process_full_pipeline(
+def _run_in_memory_pipeline(
     input_path,
     slice_output_dir,
     asr_output_dir,
@@ -203,67 +502,245 @@ def process_full_pipeline(
     max_sil_kept,
     max_val,
     alpha,
-    progress=gr.Progress(),
+    audio_format,
+    filename_template,
+    keep_slices,
+    profile,
+    resume,
+    batch_size,
+    progress,
+    job,
 ):
-    """完整流程：切片 + 识别"""
-    try:
-        # 步骤1：切片
-        progress(0.1, desc="步骤 1/2: 音频切片...")
-        
-        # 创建一个简单的进度回调
-        class SimpleProgress:
-            def __init__(self, base_progress, start, end):
-                self.base_progress = base_progress
-                self.start = start
-                self.end = end
-            
-            def __call__(self, value, desc=None):
-                if desc:
-                    self.base_progress(self.start + (self.end - self.start) * value, desc=desc)
-                else:
-                    self.base_progress(self.start + (self.end - self.start) * value)
-        
-        slice_progress = SimpleProgress(progress, 0.1, 0.5)
-        slice_result, slice_output = process_slice(
-            input_path=input_path,
-            output_dir=slice_output_dir,
-            threshold=threshold,
-            min_length=min_length,
-            min_interval=min_interval,
-            hop_size=hop_size,
-            max_sil_kept=max_sil_kept,
-            max_val=max_val,
-            alpha=alpha,
-            progress=slice_progress,
-        )
-        
-        if "失败" in slice_result or slice_output is None:
-            return slice_result, None, None
-        
-        # 步骤2：识别
-        progress(0.6, desc="步骤 2/2: 文本识别...")
-        asr_progress = SimpleProgress(progress, 0.6, 0.95)
+    """
+    内存直通：切片在内存中重采样到 16kHz 后直接交给 ASR，切片音频只作为可选的附带输出
+
+    asr.pipeline_queue_size 大于 0 时切片在后台线程中进行，ASR 同时识别已切好的切片，
+    两个阶段之间是有界队列（队列满时切片暂停），进度条同时显示两个阶段的进度。
+    任务被取消时在两个切片之间停止。
+    """
+    if not input_path:
+        return "错误：请选择输入文件或文件夹", None, None
+    os.makedirs(asr_output_dir, exist_ok=True)
+    
+    progress(0.1, desc="切片并识别（内存直通）...")
+    files = {"done": 0, "total": 0}
+    
+    def on_file(done, total):
+        files.update(done=done, total=total)
+        job.check()
+    
+    slices = iter_slices(
+        inp=input_path,
+        opt_root=slice_output_dir,
+        threshold=threshold,
+        min_length=min_length,
+        min_interval=min_interval,
+        hop_size=hop_size,
+        max_sil_kept=max_sil_kept,
+        _max=max_val,
+        alpha=alpha,
+        streaming=DEFAULT_SLICE_PARAMS.get("streaming", False),
+        vectorized=DEFAULT_SLICE_PARAMS.get("vectorized", True),
+        write_audio=keep_slices,
+        audio_format=audio_format,
+        filename_template=filename_template,
+        writer_threads=DEFAULT_SLICE_PARAMS.get("writer_threads", 4),
+        decoder=DEFAULT_SLICE_PARAMS.get("decoder", "auto"),
+        profile=profile,
+        on_file=on_file,
+    )
+    queue_size = int(DEFAULT_ASR_CONFIG.get("pipeline_queue_size", 32))
+    if queue_size > 0:
+        slices = _track_pipeline(Prefetcher(slices, queue_size), files, progress, job)
+    else:
+        slices = track_progress(slices, job.update)
+    output_name = os.path.basename(os.path.normpath(slice_output_dir))
+    if asr_model == "达摩 ASR (中文)":
         # 达摩模型只支持中文，强制设置为 zh
-        if asr_model == "达摩 ASR (中文)":
-            language = "zh"
-        asr_result, asr_output = process_asr(
-            input_folder=slice_output,
-            output_dir=asr_output_dir,
-            asr_model=asr_model,
-            language=language,
+        result_path = funasr_asr_on_slices(
+            slices,
+            output_folder=asr_output_dir,
+            output_name=output_name,
+            model_size="large",
+            language="zh",
+            output_mode=output_mode,
+            resume=resume,
+            batch_size=int(batch_size),
+        )
+    else:  # Faster Whisper
+        result_path = fasterwhisper_asr_on_slices(
+            slices,
+            output_folder=asr_output_dir,
+            output_name=output_name,
             model_size=model_size,
+            language=language,
             precision=precision,
             output_mode=output_mode,
-            progress=asr_progress,
+            resume=resume,
+            batch_size=int(batch_size),
+            offline=DEFAULT_ASR_CONFIG.get("offline", False),
+            cpu_threads=DEFAULT_ASR_CONFIG.get("cpu_threads", 0),
+        )
+    progress(1.0, desc="全部完成！")
+    
+    asr_result, asr_output = _format_asr_result(result_path, asr_output_dir, output_name, output_mode)
+    slice_note = f"切片已写出到: {slice_output_dir}" if keep_slices else "切片未写出（内存直通）"
+    return f"完整流程完成！\n\n{slice_note}\n\n{asr_result}", slice_output_dir, asr_output
+
+
+def _track_pipeline(prefetcher, files, progress, job):
+    """逐个取出切片交给 ASR，同时在进度条中显示切片和识别两个阶段的进度"""
+    for item in prefetcher:
+        if prefetcher.done or not files["done"]:
+            expected = prefetcher.produced
+        else:
+            # 按已切完的文件数估计切片总数
+            expected = prefetcher.produced * files["total"] / files["done"]
+        job.update(prefetcher.consumed, max(round(expected), prefetcher.consumed))
+        if prefetcher.done:
+            slice_desc = f"切片完成（{prefetcher.produced} 段）"
+        else:
+            slice_desc = f"切片 {files['done']}/{files['total'] or '?'} 个文件（已切 {prefetcher.produced} 段）"
+        progress(
+            0.1 + 0.85 * min(prefetcher.consumed / max(expected, 1), 1.0),
+            desc=f"{slice_desc}｜识别 {prefetcher.consumed} 段，排队 {prefetcher.pending} 段，预计剩余 {_format_seconds(job.eta())}",
         )
+        yield item
+
+
+def process_full_pipeline(
+    input_path,
+    slice_output_dir,
+    asr_output_dir,
+    asr_model,
+    language,
+    model_size,
+    precision,
+    output_mode,
+    threshold,
+    min_length,
+    min_interval,
+    hop_size,
+    max_sil_kept,
+    max_val,
+    alpha,
+    workers=1,
+    audio_format="wav",
+    filename_template=DEFAULT_FILENAME_TEMPLATE,
+    in_memory=False,
+    keep_slices=True,
+    profile=DEFAULT_PROFILE,
+    resume=False,
+    batch_size=0,
+    replicas=1,
+    progress=gr.Progress(),
+    request: gr.Request = None,
+):
+    """完整流程：切片 + 识别（作为一个任务，切片和识别阶段分别在各自的槽位中排队）"""
+    # 开启性能追踪时切片和识别记在同一个追踪文件中
+    with traced(_trace_path("pipeline"), "pipeline"), _scheduled_job("完整流程", input_path, request) as job:
+        try:
+            # 步骤1：切片
+            progress(0.1, desc="步骤 1/2: 音频切片...")
         
-        progress(1.0, desc="全部完成！")
+            # 创建一个简单的进度回调
+            class SimpleProgress:
+                def __init__(self, base_progress, start, end):
+                    self.base_progress = base_progress
+                    self.start = start
+                    self.end = end
+            
+                def __call__(self, value, desc=None):
+                    if desc:
+                        self.base_progress(self.start + (self.end - self.start) * value, desc=desc)
+                    else:
+                        self.base_progress(self.start + (self.end - self.start) * value)
         
-        return f"完整流程完成！\n\n{slice_result}\n\n{asr_result}", slice_output, asr_output
+            if in_memory:
+                # 内存直通时切片和识别同时进行，一起占用两种资源
+                resources = ["slice"] + _asr_resources(asr_model, model_size)
+                with scheduler.slot(job, resources, stage="切片+识别", on_wait=_wait_progress(progress, 0.1)):
+                    return _run_in_memory_pipeline(
+                        input_path=input_path,
+                        slice_output_dir=slice_output_dir or SLICE_OUTPUT,
+                        asr_output_dir=asr_output_dir or ASR_OUTPUT,
+                        asr_model=asr_model,
+                        language=language,
+                        model_size=model_size,
+                        precision=precision,
+                        output_mode=output_mode,
+                        threshold=threshold,
+                        min_length=min_length,
+                        min_interval=min_interval,
+                        hop_size=hop_size,
+                        max_sil_kept=max_sil_kept,
+                        max_val=max_val,
+                        alpha=alpha,
+                        audio_format=audio_format,
+                        filename_template=filename_template,
+                        keep_slices=keep_slices,
+                        profile=profile,
+                        resume=resume,
+                        batch_size=batch_size,
+                        progress=progress,
+                        job=job,
+                    )
         
-    except Exception as e:
-        import traceback
-        return f"流程失败：{str(e)}\n{traceback.format_exc()}", None, None
+            slice_progress = SimpleProgress(progress, 0.1, 0.5)
+            slice_result, slice_output = process_slice(
+                input_path=input_path,
+                output_dir=slice_output_dir,
+                threshold=threshold,
+                min_length=min_length,
+                min_interval=min_interval,
+                hop_size=hop_size,
+                max_sil_kept=max_sil_kept,
+                max_val=max_val,
+                alpha=alpha,
+                workers=workers,
+                audio_format=audio_format,
+                filename_template=filename_template,
+                profile=profile,
+                resume=resume,
+                progress=slice_progress,
+                job=job,
+            )
+        
+            if "失败" in slice_result or slice_output is None:
+                return slice_result, None, None
+        
+            # 步骤2：识别
+            progress(0.6, desc="步骤 2/2: 文本识别...")
+            asr_progress = SimpleProgress(progress, 0.6, 0.95)
+            # 达摩模型只支持中文，强制设置为 zh
+            if asr_model == "达摩 ASR (中文)":
+                language = "zh"
+            asr_result, asr_output = process_asr(
+                input_folder=slice_output,
+                output_dir=asr_output_dir,
+                asr_model=asr_model,
+                language=language,
+                model_size=model_size,
+                precision=precision,
+                output_mode=output_mode,
+                resume=resume,
+                batch_size=batch_size,
+                replicas=replicas,
+                progress=asr_progress,
+                job=job,
+            )
+            if job.cancelled:
+                return f"流程已取消\n\n{slice_result}\n\n{asr_result}", slice_output, None
+        
+            progress(1.0, desc="全部完成！")
+        
+            return f"完整流程完成！\n\n{slice_result}\n\n{asr_result}", slice_output, asr_output
+        
+        except JobCancelled:
+            return "流程已取消（开启断点续跑时已完成的部分记在任务账本中，重新运行即可继续）", None, None
+        except Exception as e:
+            import traceback
+            return f"流程失败：{str(e)}\n{traceback.format_exc()}", None, None
 
 
 # 创建 Gradio 界面
@@ -333,8 +810,39 @@ def create_interface():
                                 value=DEFAULT_SLICE_PARAMS["alpha"],
                                 step=0.05,
                             )
+                            slice_workers = gr.Number(
+                                label="并行进程数（0 表示使用全部 CPU 核心）",
+                                value=DEFAULT_SLICE_PARAMS.get("workers", 1),
+                                precision=0,
+                            )
+                            slice_write_audio = gr.Checkbox(
+                                label="写出切片音频（取消时只生成 slices.jsonl 切片清单）",
+                                value=DEFAULT_SLICE_PARAMS.get("write_audio", True),
+                            )
+                            slice_audio_format = gr.Dropdown(
+                                label="输出格式",
+                                choices=list(AUDIO_FORMATS.keys()),
+                                value=DEFAULT_SLICE_PARAMS.get("audio_format", "wav"),
+                            )
+                            slice_filename_template = gr.Textbox(
+                                label="文件名模板（可用字段：name、stem、start、end、index）",
+                                value=DEFAULT_SLICE_PARAMS.get("filename_template", DEFAULT_FILENAME_TEMPLATE),
+                            )
+                            slice_profile = gr.Dropdown(
+                                label="输出配置（asr-16k-int16：只做识别时采样点减半；float32-archive：仅 wav）",
+                                choices=list(OUTPUT_PROFILES.keys()),
+                                value=DEFAULT_SLICE_PARAMS.get("profile", DEFAULT_PROFILE),
+                            )
+                        
+                        slice_resume = gr.Checkbox(
+                            label="断点续跑（跳过输出目录任务账本中已完成且未改动的文件）",
+                            value=DEFAULT_SLICE_PARAMS.get("resume", False),
+                        )
                         
-                        slice_button = gr.Button("开始切片", variant="primary")
+                        with gr.Row():
+                            slice_preview_button = gr.Button("预览切割点")
+                            slice_button = gr.Button("开始切片", variant="primary")
+                            slice_cancel_button = gr.Button("取消")
                     
                     with gr.Column(scale=1):
                         slice_result = gr.Textbox(
@@ -382,11 +890,21 @@ def create_interface():
                         )
                         
                         asr_precision = gr.Dropdown(
-                            label="精度（仅 Faster Whisper）",
-                            choices=["float32", "float16", "int8"],
+                            label="精度（仅 Faster Whisper，auto 使用 autotune 测得的主机配置）",
+                            choices=["auto", "float32", "float16", "int8"],
                             value=DEFAULT_ASR_CONFIG["default_precision"],
                             visible=True,
                         )
+                        asr_batch_size = gr.Number(
+                            label="批量大小（0 或 1 为逐条识别）",
+                            value=DEFAULT_ASR_CONFIG.get("batch_size", 0),
+                            precision=0,
+                        )
+                        asr_replicas = gr.Number(
+                            label="CPU 模型副本数（仅 Faster Whisper，无 GPU 时多进程并行识别）",
+                            value=DEFAULT_ASR_CONFIG.get("replicas", 1),
+                            precision=0,
+                        )
                         
                         asr_output_mode = gr.CheckboxGroup(
                             label="输出方式",
@@ -395,7 +913,14 @@ def create_interface():
                             info="list: 在输出目录生成.list文件；txt: 在音频同目录生成同名.txt文件；jsonl: 在输出目录生成.jsonl文件（每行一个JSON对象，包含audio、text、duration字段）",
                         )
                         
-                        asr_button = gr.Button("开始识别", variant="primary")
+                        asr_resume = gr.Checkbox(
+                            label="断点续跑（跳过输出目录任务账本中已识别且未改动的切片）",
+                            value=DEFAULT_ASR_CONFIG.get("resume", False),
+                        )
+                        
+                        with gr.Row():
+                            asr_button = gr.Button("开始识别", variant="primary")
+                            asr_cancel_button = gr.Button("取消")
                     
                     with gr.Column(scale=1):
                         asr_result = gr.Textbox(
@@ -407,6 +932,16 @@ def create_interface():
                             label="结果文件路径",
                             visible=False,
                         )
+                        
+                        with gr.Accordion("常驻模型", open=False):
+                            resident_models = gr.Textbox(
+                                label="已加载的模型（多次识别共享，超出上限时卸载最久未用的模型）",
+                                lines=5,
+                                interactive=False,
+                            )
+                            with gr.Row():
+                                resident_refresh_button = gr.Button("刷新")
+                                resident_unload_button = gr.Button("全部卸载")
             
             # 标签页3：完整流程
             with gr.Tab("完整流程"):
@@ -467,6 +1002,33 @@ def create_interface():
                                 value=DEFAULT_SLICE_PARAMS["alpha"],
                                 step=0.05,
                             )
+                            pipeline_workers = gr.Number(
+                                label="并行进程数（0 表示使用全部 CPU 核心）",
+                                value=DEFAULT_SLICE_PARAMS.get("workers", 1),
+                                precision=0,
+                            )
+                            pipeline_audio_format = gr.Dropdown(
+                                label="输出格式",
+                                choices=list(AUDIO_FORMATS.keys()),
+                                value=DEFAULT_SLICE_PARAMS.get("audio_format", "wav"),
+                            )
+                            pipeline_filename_template = gr.Textbox(
+                                label="文件名模板（可用字段：name、stem、start、end、index）",
+                                value=DEFAULT_SLICE_PARAMS.get("filename_template", DEFAULT_FILENAME_TEMPLATE),
+                            )
+                            pipeline_profile = gr.Dropdown(
+                                label="输出配置（asr-16k-int16：只做识别时采样点减半；float32-archive：仅 wav）",
+                                choices=list(OUTPUT_PROFILES.keys()),
+                                value=DEFAULT_SLICE_PARAMS.get("profile", DEFAULT_PROFILE),
+                            )
+                            pipeline_in_memory = gr.Checkbox(
+                                label="内存直通（边切片边识别，切片在内存中直接交给 ASR，不经磁盘读回）",
+                                value=DEFAULT_ASR_CONFIG.get("in_memory_pipeline", False),
+                            )
+                            pipeline_keep_slices = gr.Checkbox(
+                                label="内存直通时同时写出切片音频",
+                                value=DEFAULT_SLICE_PARAMS.get("write_audio", True),
+                            )
                         
                         with gr.Accordion("识别参数", open=False):
                             pipeline_asr_model = gr.Dropdown(
@@ -485,10 +1047,20 @@ def create_interface():
                                 value=DEFAULT_ASR_CONFIG["default_model_size"],
                             )
                             pipeline_precision = gr.Dropdown(
-                                label="精度（仅 Faster Whisper）",
-                                choices=["float32", "float16", "int8"],
+                                label="精度（仅 Faster Whisper，auto 使用 autotune 测得的主机配置）",
+                                choices=["auto", "float32", "float16", "int8"],
                                 value=DEFAULT_ASR_CONFIG["default_precision"],
                             )
+                            pipeline_batch_size = gr.Number(
+                                label="批量大小（0 或 1 为逐条识别）",
+                                value=DEFAULT_ASR_CONFIG.get("batch_size", 0),
+                                precision=0,
+                            )
+                            pipeline_replicas = gr.Number(
+                                label="CPU 模型副本数（仅 Faster Whisper，内存直通时不使用）",
+                                value=DEFAULT_ASR_CONFIG.get("replicas", 1),
+                                precision=0,
+                            )
                             pipeline_output_mode = gr.CheckboxGroup(
                                 label="输出方式",
                                 choices=["list", "txt", "jsonl"],
@@ -496,7 +1068,14 @@ def create_interface():
                                 info="list: 在输出目录生成.list文件；txt: 在音频同目录生成同名.txt文件；jsonl: 在输出目录生成.jsonl文件（每行一个JSON对象，包含audio、text、duration字段）",
                             )
                         
-                        pipeline_button = gr.Button("开始处理", variant="primary", size="lg")
+                        pipeline_resume = gr.Checkbox(
+                            label="断点续跑（切片和识别都跳过任务账本中已完成的部分）",
+                            value=DEFAULT_SLICE_PARAMS.get("resume", False) or DEFAULT_ASR_CONFIG.get("resume", False),
+                        )
+                        
+                        with gr.Row():
+                            pipeline_button = gr.Button("开始处理", variant="primary", size="lg")
+                            pipeline_cancel_button = gr.Button("取消", size="lg")
                     
                     with gr.Column(scale=1):
                         pipeline_result = gr.Textbox(
@@ -513,6 +1092,16 @@ def create_interface():
                             visible=False,
                         )
         
+        with gr.Accordion("任务队列", open=False):
+            job_list = gr.Textbox(
+                label="进行中、排队中和最近结束的任务（切片和识别分别排队，取消在处理完当前文件后生效）",
+                lines=8,
+                interactive=False,
+            )
+            with gr.Row():
+                job_refresh_button = gr.Button("刷新")
+                job_cancel_button = gr.Button("取消本页面的任务")
+        
         # 绑定事件
         slice_button.click(
             fn=process_slice,
@@ -526,10 +1115,29 @@ def create_interface():
                 slice_max_sil_kept,
                 slice_max,
                 slice_alpha,
+                slice_workers,
+                slice_write_audio,
+                slice_audio_format,
+                slice_filename_template,
+                slice_profile,
+                slice_resume,
             ],
             outputs=[slice_result, slice_output_path],
         )
         
+        slice_preview_button.click(
+            fn=process_preview,
+            inputs=[
+                slice_input,
+                slice_threshold,
+                slice_min_length,
+                slice_min_interval,
+                slice_hop_size,
+                slice_max_sil_kept,
+            ],
+            outputs=[slice_result],
+        )
+        
         asr_button.click(
             fn=process_asr,
             inputs=[
@@ -540,10 +1148,42 @@ def create_interface():
                 asr_model_size,
                 asr_precision,
                 asr_output_mode,
+                asr_resume,
+                asr_batch_size,
+                asr_replicas,
             ],
             outputs=[asr_result, asr_output_path],
         )
         
+        resident_refresh_button.click(
+            fn=list_resident_models,
+            outputs=[resident_models],
+        )
+        
+        resident_unload_button.click(
+            fn=unload_resident_models,
+            outputs=[resident_models],
+        )
+        
+        # 取消和刷新不进入 Gradio 队列，任务进行中也能立即响应
+        job_refresh_button.click(
+            fn=list_jobs,
+            outputs=[job_list],
+            queue=False,
+        )
+        
+        for cancel_button, output in (
+            (slice_cancel_button, slice_result),
+            (asr_cancel_button, asr_result),
+            (pipeline_cancel_button, pipeline_result),
+            (job_cancel_button, job_list),
+        ):
+            cancel_button.click(
+                fn=cancel_my_jobs,
+                outputs=[output],
+                queue=False,
+            )
+        
         pipeline_button.click(
             fn=process_full_pipeline,
             inputs=[
@@ -562,6 +1202,15 @@ def create_interface():
                 pipeline_max_sil_kept,
                 pipeline_max,
                 pipeline_alpha,
+                pipeline_workers,
+                pipeline_audio_format,
+                pipeline_filename_template,
+                pipeline_in_memory,
+                pipeline_keep_slices,
+                pipeline_profile,
+                pipeline_resume,
+                pipeline_batch_size,
+                pipeline_replicas,
             ],
             outputs=[pipeline_result, pipeline_slice_path, pipeline_asr_path],
         )
@@ -603,8 +1252,17 @@ def main():
     port = webui_config.get("port", 7860)
     share = webui_config.get("share", False)
     
+    model_registry.configure(
+        max_models=DEFAULT_ASR_CONFIG.get("max_resident_models", 2),
+        memory_budget_mb=DEFAULT_ASR_CONFIG.get("model_memory_budget_mb", 0),
+    )
+    if DEFAULT_ASR_CONFIG.get("warmup", False):
+        # 后台预加载，不阻塞界面启动；期间开始的识别会等待同一个模型加载完成
+        threading.Thread(target=warmup_default_model, daemon=True).start()
+    
     app = create_interface()
-    app.queue().launch(
+    # 切片和识别由任务调度器限制并发，Gradio 只限制同时接受的任务数
+    app.queue(default_concurrency_limit=SCHEDULER_CONFIG.get("max_jobs", 16)).launch(
         server_name=host,
         server_port=port,
         share=share,